@@ -0,0 +1,310 @@
+"""
+Benchmarks for shaping, hyphenation, caching of paragraph items and line breaking.
+
+Run the suite and save results:
+
+    python benchmarks/run.py run --output results.json
+
+Compare two sets of results and exit with a non-zero status if any benchmark slowed down by
+more than the threshold:
+
+    python benchmarks/run.py compare baseline.json results.json
+
+Text is generated from a fixed seed so that results are comparable between runs.
+
+"""
+import argparse
+import dataclasses
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Iterable, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import typesetting  # noqa: E402
+
+FONTS = {
+    "eb-garamond": "EBGaramond-VariableFont_wght.ttf",
+    "raleway": "Raleway-VariableFont_wght.ttf",
+    "libre-baskerville": "LibreBaskerville-Regular.ttf",
+}
+EM_SIZE = 12.0
+
+PARAGRAPH_WORDS = [50, 200, 1000]
+WIDTHS = [150.0, 300.0, 500.0]
+PARAMS = {
+    "default": typesetting.OptimiserParameters(),
+    "loose": typesetting.OptimiserParameters(upper_adjustment_ratio=10.0),
+}
+
+# Syllables from which words of generated text are built.
+_SYLLABLES = (
+    "a an ar ba be bi bo ca ce ci co da de di do el en er es fa fe fi fo ga ge gi go ha he hi "
+    "in is it ka ke la le li lo ma me mi mo na ne ni no on or pa pe pi po ra re ri ro sa se si "
+    "so ta te ti to ul un ur va ve vi vo"
+).split()
+
+
+def generate_text(n_words: int, seed: int) -> str:
+    "Return n_words of pseudo-random prose generated from seed."
+    rng = random.Random(seed)
+    words: list[str] = []
+    for word_idx in range(n_words):
+        word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.choice([1, 1, 2, 2, 3, 4])))
+        if word_idx == 0 or words[-1].endswith("."):
+            word = word.capitalize()
+        if rng.random() < 0.08:
+            word += rng.choice([".", ".", ","])
+        words.append(word)
+    return " ".join(words) + "."
+
+
+@dataclasses.dataclass
+class Result:
+    name: str
+    case: dict[str, Any]
+    times: list[float] = dataclasses.field(default_factory=list)
+    peak_memory: Optional[int] = None
+    active_nodes: Optional[dict[str, float]] = None
+    skipped: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.name + "".join(f" {k}={v}" for k, v in sorted(self.case.items()))
+
+    def as_dict(self) -> dict[str, Any]:
+        d: dict[str, Any] = {"name": self.name, "case": self.case, "key": self.key}
+        if self.skipped is not None:
+            d["skipped"] = self.skipped
+            return d
+        d["time"] = {
+            "min": min(self.times),
+            "median": statistics.median(self.times),
+            "mean": statistics.fmean(self.times),
+            "repeats": len(self.times),
+        }
+        d["peak_memory"] = self.peak_memory
+        if self.active_nodes is not None:
+            d["active_nodes"] = self.active_nodes
+        return d
+
+
+def measure(result: Result, func: Callable[[], Any], repeats: int) -> Result:
+    "Time repeats calls of func and then record peak memory allocated by one more call."
+    # An untimed call warms caches and performs any lazy imports.
+    func()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        result.times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, result.peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result
+
+
+def active_node_counts(
+    items: typesetting.ParagraphItems, width: float, params: typesetting.OptimiserParameters
+) -> dict[str, float]:
+    "Return the maximum and mean number of active nodes over all break points."
+    stats = typesetting.BreakStats()
+    list(typesetting.optimal_line_breaks(items, width, params, stats=stats))
+    return {"max": stats.peak_active_nodes, "mean": stats.mean_active_nodes}
+
+
+def run_benchmarks(
+    fonts: Iterable[str], paragraph_words: Iterable[int], repeats: int, seed: int
+) -> Iterable[Result]:
+    for font_name in fonts:
+        font = typesetting.Font(os.path.join(REPO_ROOT, FONTS[font_name]), (EM_SIZE, EM_SIZE))
+        for n_words in paragraph_words:
+            text = generate_text(n_words, seed)
+            case = {"font": font_name, "words": n_words}
+
+            # The cache of hyphenated words is cleared so that each call hyphenates every word.
+            result = Result("hyphenate", dict(case))
+            try:
+                hyphenator = typesetting.Hyphenator.for_language("en_US")
+            except Exception as e:
+                # pyhyphen downloads dictionaries on first use which may not be possible.
+                result.skipped = f"hyphenation dictionary unavailable: {e!r}"
+                yield result
+            else:
+                yield measure(
+                    result,
+                    lambda: (hyphenator.cache_clear(), typesetting.hyphenate(text)),
+                    repeats,
+                )
+
+            yield measure(
+                Result("text_to_paragraph_items", dict(case)),
+                lambda: typesetting.ParagraphItems.from_text(text, font),
+                repeats,
+            )
+
+            # Items are stored by the untimed first call and then loaded from the cache.
+            with tempfile.TemporaryDirectory() as cache_dir:
+                cache = typesetting.ParagraphItemsCache(cache_dir)
+                yield measure(
+                    Result("cached_paragraph_items", dict(case)),
+                    lambda: cache.items(text, font),
+                    repeats,
+                )
+
+            items = typesetting.ParagraphItems.from_text(text, font)
+            for width in WIDTHS:
+                yield measure(
+                    Result("greedy_line_breaks", dict(case, width=width)),
+                    lambda: list(typesetting.greedy_line_breaks(items, width)),
+                    repeats,
+                )
+                for params_name, params in PARAMS.items():
+                    for vectorized in (False, True):
+                        result = Result(
+                            "optimal_line_breaks",
+                            dict(case, width=width, params=params_name, vectorized=vectorized),
+                        )
+                        measure(
+                            result,
+                            lambda: list(
+                                typesetting.optimal_line_breaks(
+                                    items, width, params, vectorized=vectorized
+                                )
+                            ),
+                            repeats,
+                        )
+                        result.active_nodes = active_node_counts(items, width, params)
+                        yield result
+
+            for render_name in ("fill_glyphs_at", "show_glyphs_at"):
+                yield run_render_benchmark(
+                    Result(render_name, dict(case)), render_name, text, font, repeats
+                )
+
+
+def run_render_benchmark(
+    result: Result, render_name: str, text: str, font: typesetting.Font, repeats: int
+) -> Result:
+    try:
+        import cairo
+
+        from typesetting import cairo as typesetting_cairo
+    except ImportError as e:
+        result.skipped = f"cairo unavailable: {e!r}"
+        return result
+
+    render = getattr(typesetting_cairo, render_name)
+    glyph_run = font.shape(text)
+    surface = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, None)
+    return measure(result, lambda: render(cairo.Context(surface), 0, 0, glyph_run, font), repeats)
+
+
+def metadata(args: argparse.Namespace) -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": sys.version,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "repeats": args.repeats,
+    }
+
+
+def run(args: argparse.Namespace) -> int:
+    results = []
+    for result in run_benchmarks(args.fonts, args.words, args.repeats, args.seed):
+        d = result.as_dict()
+        results.append(d)
+        if "skipped" in d:
+            print(f"{d['key']}: skipped, {d['skipped']}", file=sys.stderr)
+        else:
+            print(
+                f"{d['key']}: {d['time']['median'] * 1e3:.3f} ms,"
+                f" peak {d['peak_memory'] / 1024:.1f} KiB",
+                file=sys.stderr,
+            )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"metadata": metadata(args), "results": results}, f, indent=2)
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    with open(args.baseline) as f:
+        baseline = {r["key"]: r for r in json.load(f)["results"] if "time" in r}
+    with open(args.results) as f:
+        results = {r["key"]: r for r in json.load(f)["results"] if "time" in r}
+
+    # Minimum times are compared since they are least affected by other load on the machine.
+    n_regressions = 0
+    for key in sorted(baseline.keys() & results.keys()):
+        ratio = results[key]["time"]["min"] / baseline[key]["time"]["min"]
+        if ratio > 1.0 + args.threshold:
+            status = "REGRESSION"
+            n_regressions += 1
+        elif ratio < 1.0 - args.threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        print(f"{status:>11} {ratio:6.2f}x {key}")
+
+    for key in sorted(baseline.keys() - results.keys()):
+        print(f"{'missing':>11}         {key}")
+    print(f"{n_regressions} regression(s)")
+    return 1 if n_regressions > 0 else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run benchmarks")
+    run_parser.add_argument("--output", "-o", help="write results as JSON to this file")
+    run_parser.add_argument(
+        "--fonts", nargs="+", choices=sorted(FONTS), default=list(FONTS), help="fonts to use"
+    )
+    run_parser.add_argument(
+        "--words", nargs="+", type=int, default=PARAGRAPH_WORDS, help="paragraph lengths in words"
+    )
+    run_parser.add_argument("--repeats", type=int, default=5, help="timed calls per benchmark")
+    run_parser.add_argument("--seed", type=int, default=0, help="seed for generated text")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = subparsers.add_parser("compare", help="compare two sets of results")
+    compare_parser.add_argument("baseline", help="JSON results to compare against")
+    compare_parser.add_argument("results", help="JSON results to check")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="fractional slow down reported as a regression (default: %(default)s)",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+import pathlib
+
+import pytest
+
+from typesetting import Font
+
+ROOT = pathlib.Path(__file__).parent.parent
+
+WORDS = (
+    "the quick brown fox jumps over lazy dog paragraph line break optimal monotone demerits "
+    "typesetting with fitness classes"
+).split()
+
+
+@pytest.fixture
+def font_path() -> str:
+    return str(ROOT / "LibreBaskerville-Regular.ttf")
+
+
+@pytest.fixture
+def font(font_path: str) -> Font:
+    return Font(font_path, (10.0, 10.0))
+
+
+@pytest.fixture
+def paragraph_text() -> str:
+    "Text of a long paragraph without hyphenation points."
+    return " ".join(WORDS[7 * n % len(WORDS)] for n in range(400))
+
+
+@pytest.fixture
+def hyphenated_text() -> str:
+    "Text with soft hyphens, forced breaks and words too wide for narrow lines."
+    return (
+        "Hy\u00adphen\u00adation al\u00adlows para\u00adgraphs to be set with\u00adout "
+        "loose lines. Sup\u00adercal\u00adi\u00adfrag\u00adilis\u00adtic words are "
+        "wider than nar\u00adrow col\u00adumns.\nA forced break starts a new line.\n"
+    ) * 4
@@ -0,0 +1,100 @@
+import itertools
+
+import pytest
+
+from typesetting import (
+    HyphenationPatterns,
+    Hyphenator,
+    ParagraphItemType,
+    batch,
+    break_paragraph,
+    break_paragraphs,
+    line_adjustment_ratios,
+)
+
+TEXT = "The quick brown fox jumps over the lazy dog. " * 20
+
+# Text with long words which the hyphenator below can hyphenate.
+LONG_WORDS_TEXT = (
+    "Typesetting paragraphs considers every possible breakpoint, and narrow columns "
+    "containing unusually lengthy vocabulary benefit from hyphenation. "
+) * 5
+
+
+def test_in_process_does_not_set_worker_globals(font):
+    broken = list(break_paragraphs([TEXT, TEXT], font, 200, workers=0))
+    assert [b.break_idxs for b in broken] == [break_paragraph(TEXT, font, 200).break_idxs] * 2
+    assert batch._worker_font is None
+    assert batch._worker_hyphenator is None
+
+
+def test_unbounded_texts_are_streamed(font):
+    broken = break_paragraphs(itertools.repeat(TEXT), font, 200, workers=1, chunksize=2)
+    try:
+        first = next(broken)
+    finally:
+        broken.close()
+    assert first.break_idxs == break_paragraph(TEXT, font, 200).break_idxs
+
+
+def test_results_are_in_order(font):
+    texts = [TEXT[: 20 * n + 50] for n in range(11)]
+    expected = [break_paragraph(text, font, 150).break_idxs for text in texts]
+    broken = break_paragraphs(texts, font, 150, workers=2, chunksize=3)
+    assert [b.break_idxs for b in broken] == expected
+
+
+@pytest.fixture
+def hyphenator(tmp_path):
+    # Allow hyphens before every consonant followed by a vowel.
+    dic_path = tmp_path / "hyph_xx.dic"
+    dic_path.write_text(
+        "UTF-8\nLEFTHYPHENMIN 2\nRIGHTHYPHENMIN 2\n"
+        + "\n".join(f"1{consonant}{vowel}" for consonant in "bcdfgklmnprstvz" for vowel in "aeiou")
+        + "\n",
+        encoding="utf-8",
+    )
+    return Hyphenator("xx", patterns=HyphenationPatterns.from_dic(str(dic_path)))
+
+
+def has_hyphens(items):
+    return any(item.item_type is ParagraphItemType.PENALTY and item.flagged for item in items[:-1])
+
+
+@pytest.mark.parametrize("engine", ["optimal", "greedy"])
+def test_first_pass_is_kept_when_lines_fit(font, hyphenator, engine):
+    broken = break_paragraph(
+        LONG_WORDS_TEXT, font, 800, engine=engine, hyphenator=hyphenator, pretolerance=4
+    )
+    assert broken.passes == 1
+    assert not has_hyphens(broken.items)
+    unhyphenated = break_paragraph(LONG_WORDS_TEXT, font, 800, engine=engine)
+    assert broken.break_idxs == unhyphenated.break_idxs
+    assert all(-1.0 <= r < 4 for r in line_adjustment_ratios(broken.items, broken.break_idxs, 800))
+
+
+@pytest.mark.parametrize("engine", ["optimal", "greedy"])
+def test_second_pass_hyphenates(font, hyphenator, engine):
+    broken = break_paragraph(
+        LONG_WORDS_TEXT, font, 120, engine=engine, hyphenator=hyphenator, pretolerance=1
+    )
+    assert broken.passes == 2
+    assert has_hyphens(broken.items)
+    hyphenated = break_paragraph(LONG_WORDS_TEXT, font, 120, engine=engine, hyphenator=hyphenator)
+    assert hyphenated.passes == 1
+    assert list(broken.items) == list(hyphenated.items)
+    assert broken.break_idxs == hyphenated.break_idxs
+
+
+def test_workers_break_in_two_passes(font, hyphenator):
+    texts = [LONG_WORDS_TEXT[: 60 * n + 50] for n in range(6)]
+    expected = [
+        break_paragraph(text, font, 400, hyphenator=hyphenator, pretolerance=2) for text in texts
+    ]
+    assert {b.passes for b in expected} == {1, 2}
+    broken = break_paragraphs(
+        texts, font, 400, hyphenator=hyphenator, pretolerance=2, workers=2, chunksize=2
+    )
+    assert [(b.break_idxs, b.passes) for b in broken] == [
+        (b.break_idxs, b.passes) for b in expected
+    ]
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from typesetting import ParagraphItems, ParagraphItemsCache
+
+TEXT = "The quick brown fox jumps over the lazy dog."
+
+
+def test_items_round_trip(tmp_path, font):
+    cache = ParagraphItemsCache(str(tmp_path))
+    expected = ParagraphItems.from_text(TEXT, font)
+    assert list(cache.items(TEXT, font)) == list(expected)
+    assert list(cache.items(TEXT, font)) == list(expected)
+    info = cache.info()
+    assert (info.hits, info.misses, info.files) == (1, 1, 1)
+
+
+@pytest.mark.parametrize("contents", [b"", b"not a cache file", None])
+def test_bad_files_are_misses(tmp_path, font, contents):
+    cache = ParagraphItemsCache(str(tmp_path))
+    key = cache.key(TEXT, font)
+    cache.items(TEXT, font)
+    path = os.path.join(str(tmp_path), key + ".items")
+    if contents is None:
+        # Truncate a valid file.
+        with open(path, "rb") as f:
+            contents = f.read()[:-10]
+    with open(path, "wb") as f:
+        f.write(contents)
+
+    assert cache.get(key) is None
+    assert not os.path.exists(path)
+    assert cache.info().misses == 2
+
+
+def test_language_key_does_not_build_hyphenator(tmp_path, font, monkeypatch):
+    from typesetting import Hyphenator
+
+    def for_language(language):
+        raise AssertionError("hyphenator built on a hit")
+
+    monkeypatch.setattr(Hyphenator, "for_language", for_language)
+    cache = ParagraphItemsCache(str(tmp_path))
+    items = ParagraphItems.from_text(TEXT, font)
+    cache.put(cache.key(TEXT, font, "en_US"), items)
+    assert cache.key(TEXT, font, "en_US") != cache.key(TEXT, font)
+    assert list(cache.items(TEXT, font, "en_US")) == list(items)
@@ -0,0 +1,34 @@
+import pytest
+
+cairo = pytest.importorskip("cairo")
+
+from typesetting.cairo import fill_glyphs_at, show_glyphs_at  # noqa: E402
+
+
+@pytest.mark.parametrize("draw_glyphs", [fill_glyphs_at, show_glyphs_at])
+def test_draw_glyphs_on_recording_surface(font, draw_glyphs):
+    surface = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, None)
+    ctx = cairo.Context(surface)
+    draw_glyphs(ctx, 10.0, 20.0, font.shape("Hello, world"), font)
+    draw_glyphs(ctx, 10.0, 40.0, font.shape("Hello, world"), font)
+
+    x, y, width, height = surface.ink_extents()
+    assert width > 0 and height > 0
+    assert 0.0 <= x and y < 40.0
+
+
+def test_show_glyphs_at_falls_back_if_freetype_fails(font, monkeypatch):
+    import freetype
+
+    from typesetting import _cairocache
+    from typesetting._lru import LRUCache
+
+    def face(*args, **kwargs):
+        raise freetype.FT_Exception(2)
+
+    monkeypatch.setattr(_cairocache, "font_faces", LRUCache(1))
+    monkeypatch.setattr(freetype, "Face", face)
+    surface = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, None)
+    ctx = cairo.Context(surface)
+    show_glyphs_at(ctx, 10.0, 20.0, font.shape("Hello"), font)
+    assert surface.ink_extents()[2] > 0
@@ -0,0 +1,47 @@
+import pytest
+
+from typesetting import Font, _cairocache
+from typesetting._lru import LRUCache
+
+
+@pytest.fixture(autouse=True)
+def caches(monkeypatch):
+    monkeypatch.setattr(_cairocache, "glyph_paths", LRUCache(3))
+    monkeypatch.setattr(_cairocache, "font_faces", LRUCache(3))
+
+
+def test_glyph_paths_are_keyed_by_file_face_size_and_glyph(font_path):
+    drawn = []
+
+    def draw(font, index):
+        drawn.append((font.em_size, index))
+        return object()
+
+    font = Font(font_path, (10.0, 10.0))
+    path = _cairocache.glyph_path(font, 5, draw)
+    assert _cairocache.glyph_path(font, 5, draw) is path
+    # Fonts differing only in features share outlines.
+    assert (
+        _cairocache.glyph_path(Font(font_path, (10.0, 10.0), features=["-kern"]), 5, draw) is path
+    )
+    assert _cairocache.glyph_path(font, 6, draw) is not path
+    assert _cairocache.glyph_path(Font(font_path, (12.0, 12.0)), 5, draw) is not path
+    assert drawn == [((10.0, 10.0), 5), ((10.0, 10.0), 6), ((12.0, 12.0), 5)]
+
+    info = _cairocache.glyph_paths.info()
+    assert (info.hits, info.misses, info.evictions, info.size) == (2, 3, 0, 3)
+    _cairocache.glyph_path(font, 7, draw)
+    assert _cairocache.glyph_paths.info().evictions == 1
+
+
+def test_font_faces_are_keyed_by_file_and_face(font_path):
+    created = []
+
+    def create(font):
+        created.append(font)
+        return object()
+
+    face = _cairocache.font_face(Font(font_path, (10.0, 10.0)), create)
+    assert _cairocache.font_face(Font(font_path, (20.0, 20.0), language="de"), create) is face
+    assert len(created) == 1
+    assert _cairocache.font_face_key(Font(font_path, (10.0, 10.0))) == (font_path, 0)
@@ -0,0 +1,59 @@
+import uharfbuzz as hb
+
+from typesetting import Font, FontRegistry
+
+
+def glyph_run_fields(glyph_run):
+    return (
+        list(glyph_run.indices),
+        list(glyph_run.clusters),
+        list(glyph_run.x_advances),
+        list(glyph_run.y_advances),
+    )
+
+
+def test_shape_cache(font_path):
+    font = Font(font_path, (10.0, 10.0), shape_cache_size=2)
+    uncached_font = Font(font_path, (10.0, 10.0))
+
+    glyph_run = font.shape("fox")
+    assert font.shape("fox") is glyph_run
+    assert glyph_run_fields(glyph_run) == glyph_run_fields(uncached_font.shape("fox"))
+    info = font.shape_cache_info()
+    assert (info.hits, info.misses, info.evictions, info.size, info.max_size) == (1, 1, 0, 1, 2)
+
+    font.shape("dog")
+    font.shape("jumps")
+    info = font.shape_cache_info()
+    assert (info.misses, info.evictions, info.size) == (3, 1, 2)
+    assert font.shape("fox") is not glyph_run
+
+    font.clear_shape_cache()
+    assert font.shape_cache_info() == (0, 0, 0, 0, 2)
+
+
+def test_shape_cache_disabled(font_path):
+    font = Font(font_path, (10.0, 10.0))
+    font.shape("fox")
+    assert font.shape_cache_info() == (0, 0, 0, 0, 0)
+
+
+def test_language_does_not_change_shaping(font_path):
+    english = Font(font_path, (10.0, 10.0), language="en")
+    turkish = Font(font_path, (10.0, 10.0), language="tr")
+    text = "office fjord"
+    assert glyph_run_fields(english.shape(text)) == glyph_run_fields(turkish.shape(text))
+
+
+def test_registry_warms_up_faces_once(font_path, monkeypatch):
+    registry = FontRegistry()
+    shaped = []
+    shape = hb.shape
+    monkeypatch.setattr(hb, "shape", lambda *args: shaped.append(args) or shape(*args))
+
+    face = registry.face(font_path, warm_up=True)
+    assert len(shaped) == 1
+    assert registry.face(font_path, warm_up=True) is face
+    registry.font(font_path, (10.0, 10.0), warm_up=True)
+    assert len(shaped) == 1
+    assert len(registry) == 1
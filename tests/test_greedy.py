@@ -0,0 +1,77 @@
+import pytest
+
+from typesetting import (
+    ParagraphItems,
+    PreparedParagraph,
+    greedy_line_breaks,
+    greedy_line_breaks_batch,
+)
+
+WIDTHS = [40.0, 150.0, 300.0, 1000.0]
+
+
+@pytest.fixture
+def paragraphs(font, paragraph_text, hyphenated_text):
+    return [ParagraphItems.from_text(text, font) for text in (paragraph_text, hyphenated_text)]
+
+
+@pytest.mark.parametrize("width", WIDTHS)
+def test_engines_match_scalar(paragraphs, width):
+    for items in paragraphs:
+        break_idxs = list(greedy_line_breaks(items, width))
+        prepared = PreparedParagraph(items)
+        assert list(greedy_line_breaks(list(items), width)) == break_idxs
+        assert list(greedy_line_breaks(prepared, width)) == break_idxs
+        assert list(greedy_line_breaks(items, width, vectorized=True)) == break_idxs
+        assert list(greedy_line_breaks(prepared, width, vectorized=True)) == break_idxs
+        assert list(greedy_line_breaks(items, width, streaming=True)) == break_idxs
+        assert list(greedy_line_breaks(iter(items), width, streaming=True)) == break_idxs
+
+
+def test_batch_matches_scalar(paragraphs):
+    batch = [items for items in paragraphs for _ in WIDTHS]
+    widths = WIDTHS * len(paragraphs)
+    expected = [list(greedy_line_breaks(items, width)) for items, width in zip(batch, widths)]
+    assert greedy_line_breaks_batch(batch, widths) == expected
+    assert greedy_line_breaks_batch([PreparedParagraph(items) for items in batch], widths) == (
+        expected
+    )
+    assert greedy_line_breaks_batch(paragraphs, 150.0) == [
+        list(greedy_line_breaks(items, 150.0)) for items in paragraphs
+    ]
+
+    with pytest.raises(ValueError):
+        greedy_line_breaks_batch(paragraphs, WIDTHS)
+
+
+def test_streaming_yields_before_end_of_items(paragraphs):
+    items = paragraphs[0]
+    n_read = 0
+
+    def read_items():
+        nonlocal n_read
+        for item in items:
+            n_read += 1
+            yield item
+
+    break_idxs = greedy_line_breaks(read_items(), 150.0, streaming=True)
+    first_break_idx = next(break_idxs)
+    assert n_read < len(items) // 10
+    assert [first_break_idx, *break_idxs] == list(greedy_line_breaks(items, 150.0))
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"streaming": True, "vectorized": True},
+        {"lines": [], "streaming": True},
+        {"lines": [], "vectorized": True},
+    ],
+)
+def test_invalid_arguments_raise_when_called(kwargs):
+    def items():
+        raise AssertionError("items should not be read")
+        yield
+
+    with pytest.raises(ValueError):
+        greedy_line_breaks(items(), 150.0, **kwargs)
@@ -0,0 +1,129 @@
+import gc
+import json
+import pickle
+import weakref
+
+import pytest
+
+from typesetting import HyphenationPatterns, Hyphenator, hyphenation
+from typesetting._lru import LRUCache
+
+hyphen = pytest.importorskip("hyphen")
+
+# Small libhyphen dictionary so that pyhyphen does not need to download one.
+DIC = """UTF-8
+LEFTHYPHENMIN 2
+RIGHTHYPHENMIN 3
+% test patterns
+.hy3ph
+he2n
+hena4
+hen5at
+1na
+n2at
+1tio
+2io
+o2n
+1ba
+1be
+1ca
+1ci
+1ty
+1ry
+4ic
+a1ab
+1ke
+1ko
+.ab4
+"""
+
+WORDS = [
+    "hyphenation",
+    "HYPHENATION",
+    "Hyphenation",
+    "nation",
+    "ration",
+    "ability",
+    "abacus",
+    "cabinet",
+    "capacity",
+    "kookaburra",
+    "berry",
+    "ionic",
+    "tic",
+    "baby",
+    "bike",
+    "a=bacabe",
+    "retroactive",
+    "unhyphenatable",
+]
+
+
+@pytest.fixture
+def dic_directory(tmp_path, monkeypatch):
+    # Install the dictionary for languages "xx" and "yy" where pyhyphen looks for it.
+    (tmp_path / "hyph_xx.dic").write_text(DIC, encoding="utf-8")
+    (tmp_path / "dictionaries.json").write_text(
+        json.dumps({language: {"file": "hyph_xx.dic", "url": ""} for language in ("xx", "yy")})
+    )
+    pyhyphen_hyphenator = hyphen.Hyphenator
+    monkeypatch.setattr(
+        hyphen,
+        "Hyphenator",
+        lambda language: pyhyphen_hyphenator(language, directory=str(tmp_path)),
+    )
+    monkeypatch.setattr(hyphenation, "_hyphenated_words", LRUCache(1024))
+    return tmp_path
+
+
+def test_patterns_agree_with_pyhyphen(dic_directory, tmp_path):
+    expected = [hyphen.Hyphenator("xx").syllables(word) for word in WORDS]
+    assert any(len(syllables) > 2 for syllables in expected)
+
+    patterns = HyphenationPatterns.from_dic(str(dic_directory / "hyph_xx.dic"))
+    assert [patterns.syllables(word) for word in WORDS] == expected
+
+    patterns.save(str(tmp_path / "xx.pat"))
+    loaded = HyphenationPatterns.load(str(tmp_path / "xx.pat"))
+    assert [loaded.syllables(word) for word in WORDS] == expected
+    assert loaded.digest() == patterns.digest()
+
+
+def test_hyphenators_share_cached_words(dic_directory):
+    patterns = HyphenationPatterns.from_dic(str(dic_directory / "hyph_xx.dic"))
+    hyphenator = Hyphenator("xx", patterns=patterns)
+    text = " ".join(WORDS)
+    hyphenated = Hyphenator("xx").hyphenate(text)
+    assert hyphenator.hyphenate(text) == hyphenated
+    assert hyphenator.cache_key != Hyphenator("xx").cache_key
+
+    # A new hyphenator with the same patterns finds every word in the cache.
+    info = Hyphenator.cache_info()
+    assert Hyphenator("xx", patterns=patterns).hyphenate(text) == hyphenated
+    assert Hyphenator.cache_info().misses == info.misses
+    assert Hyphenator.cache_info().hits == info.hits + len(list(hyphenator._words(text)))
+
+    assert pickle.loads(pickle.dumps(hyphenator)).hyphenate(text) == hyphenated
+    Hyphenator.cache_clear()
+    assert Hyphenator.cache_info().size == 0
+
+
+def test_hyphenators_are_not_kept_alive(dic_directory):
+    patterns = HyphenationPatterns.from_dic(str(dic_directory / "hyph_xx.dic"))
+    hyphenator = Hyphenator("xx", patterns=patterns)
+    hyphenator.hyphenate("hyphenation")
+    ref = weakref.ref(hyphenator)
+    gc.disable()
+    try:
+        del hyphenator
+        assert ref() is None
+    finally:
+        gc.enable()
+
+
+def test_for_language_keeps_recent_languages(dic_directory, monkeypatch):
+    monkeypatch.setattr(hyphenation, "_language_hyphenators", LRUCache(1))
+    hyphenator = Hyphenator.for_language("xx")
+    assert Hyphenator.for_language("xx") is hyphenator
+    Hyphenator.for_language("yy")
+    assert Hyphenator.for_language("xx") is not hyphenator
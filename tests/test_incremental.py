@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from typesetting import IncrementalParagraph, ParagraphItems, optimal_line_breaks
+
+WIDTH = 300.0
+
+EDITS = [
+    # (start, end, replacement) with negative positions counted from the end of the text.
+    (0, 0, "Insert at the start. "),
+    (-1, -1, " and at the end"),
+    (40, 45, ""),
+    (100, 100, "office\u00adaffluent"),
+    (120, 121, "\n"),
+    (200, 260, "a much longer replacement for a deleted range of words"),
+    (10, 11, "-"),
+    (0, -1, "Replace everything but the last character."),
+]
+
+
+def assert_matches_full_recompute(paragraph):
+    items = ParagraphItems.from_text(paragraph.text, paragraph.font)
+    assert list(paragraph.items) == list(items)
+    assert paragraph.line_breaks() == list(optimal_line_breaks(items, WIDTH))
+
+
+@pytest.mark.parametrize("snapshot_interval", [1, 16])
+def test_edits_match_full_recompute(font, paragraph_text, snapshot_interval):
+    paragraph = IncrementalParagraph(
+        paragraph_text[:1000], font, WIDTH, snapshot_interval=snapshot_interval
+    )
+    assert_matches_full_recompute(paragraph)
+    for start, end, replacement in EDITS:
+        start %= len(paragraph.text)
+        end %= len(paragraph.text)
+        break_idxs = paragraph.edit(start, end, replacement)
+        assert break_idxs == paragraph.line_breaks()
+        assert_matches_full_recompute(paragraph)
+
+
+def test_random_edits_match_full_recompute(font, paragraph_text):
+    rng = random.Random(0)
+    paragraph = IncrementalParagraph(paragraph_text[:400], font, WIDTH, snapshot_interval=4)
+    for _ in range(20):
+        start = rng.randrange(len(paragraph.text) + 1)
+        end = min(len(paragraph.text), start + rng.randrange(20))
+        replacement = "".join(rng.choice("abc fi-\u00ad") for _ in range(rng.randrange(12)))
+        paragraph.edit(start, end, replacement)
+        assert_matches_full_recompute(paragraph)
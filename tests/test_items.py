@@ -0,0 +1,100 @@
+import pytest
+import uniseg.linebreak
+
+from typesetting import (
+    ParagraphItem,
+    ParagraphItems,
+    ParagraphItemType,
+    text_to_paragraph_items,
+)
+
+SOFT_HYPHEN = "\u00ad"
+
+TEXT = "The quick brown fox jumps over the lazy dog.\nA second line."
+
+
+def test_from_items_round_trip(font):
+    para_items = list(text_to_paragraph_items(TEXT, font))
+    items = ParagraphItems.from_items(para_items)
+    assert len(items) == len(para_items)
+    assert list(items) == para_items
+    assert [items[idx] for idx in range(-len(items), 0)] == para_items
+    assert list(ParagraphItems.from_text(TEXT, font)) == para_items
+
+    with pytest.raises(IndexError):
+        items[len(items)]
+
+
+def test_slice_and_extend(font):
+    items = ParagraphItems.from_text(TEXT, font)
+    head, tail = items[:10], items[10:]
+    assert isinstance(head, ParagraphItems)
+    assert list(head) == list(items)[:10]
+    assert list(items[1:9:2]) == list(items)[1:9:2]
+
+    # Slices are copies.
+    head.append(ParagraphItemType.GLUE, 1.0, 2.0, 3.0)
+    assert len(items) == len(head) - 1 + len(tail)
+    assert head[-1] == ParagraphItem(ParagraphItemType.GLUE, 1.0, 2.0, 3.0)
+
+    joined = items[:10]
+    joined.extend(tail)
+    assert list(joined) == list(items)
+    assert joined.digest() == items.digest()
+
+
+def test_digest_follows_breaking_fields(font):
+    items = ParagraphItems.from_text(TEXT, font)
+    digest = items.digest()
+    assert items.digest() is digest
+
+    # Text does not affect line breaks and so does not change the digest.
+    renamed = ParagraphItems.from_items(
+        ParagraphItem(
+            item.item_type,
+            item.width,
+            item.stretchability,
+            item.shrinkability,
+            item.penalty,
+            item.flagged,
+            item.text.upper(),
+        )
+        for item in items
+    )
+    assert renamed.digest() == digest
+
+    items.append(ParagraphItemType.PENALTY, penalty=100.0)
+    assert items.digest() != digest
+    assert items[:-1].digest() == digest
+
+
+def baseline_box_widths(text, font):
+    "Box widths found by shaping the growing run of stems after each line break unit."
+    widths, stems, running_width = [], [], 0.0
+    for lb_item in uniseg.linebreak.line_break_units(text):
+        stem = lb_item.rstrip(f" {SOFT_HYPHEN}\n")
+        if len(stem) == 0:
+            stems, running_width = [], 0.0
+            continue
+        stems.append(stem)
+        widths.append(font.shape("".join(stems)).total_advance - running_width)
+        running_width += widths[-1]
+    return widths
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        TEXT,
+        "office affluent fjord waffle",
+        "AVATAR Toyota WAVE yoyo",
+        f"hy{SOFT_HYPHEN}phen{SOFT_HYPHEN}ation well-known e-mail/web (a)-(b) 3.14-2.72",
+        f"Su{SOFT_HYPHEN}per{SOFT_HYPHEN}cal{SOFT_HYPHEN}i{SOFT_HYPHEN}frag-ilis/tic\nff-fi",
+        "שלום-עולם abc-def",
+        "--- ... 123-456",
+    ],
+)
+def test_box_widths_match_shaping_each_run(font, text):
+    items = ParagraphItems.from_text(text, font)
+    widths = [item.width for item in items if item.item_type is ParagraphItemType.BOX]
+    assert widths == baseline_box_widths(text, font)
@@ -0,0 +1,56 @@
+import math
+
+import pytest
+
+from typesetting import (
+    ParagraphItems,
+    PreparedParagraph,
+    greedy_line_breaks,
+    greedy_line_layout,
+    optimal_line_breaks,
+    optimal_line_layout,
+)
+
+WIDTH = 200.0
+
+
+@pytest.mark.parametrize("line_layout", [optimal_line_layout, greedy_line_layout])
+def test_lines_start_after_glue_break(font, paragraph_text, line_layout):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    layout = line_layout(items, WIDTH)
+    assert len(layout.lines) > 2
+
+    line = layout.lines[1]
+    assert line.start_idx == layout.lines[0].end_idx + 1
+    position, _ = next(layout.boxes(1))
+    assert position == 0.0
+
+    # Lines which are not overfull are justified to the width.
+    for line in layout.lines[:-1]:
+        assert math.isfinite(line.adjustment_ratio)
+        if line.adjustment_ratio >= -1.0:
+            assert line.positions[-1] == pytest.approx(WIDTH)
+
+
+def test_optimal_lines_are_recorded_by_engine(font, paragraph_text):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    lines: list = []
+    break_idxs = list(optimal_line_breaks(PreparedParagraph(items), WIDTH, lines=lines))
+    assert [line.end_idx for line in lines] == break_idxs
+    assert lines == optimal_line_layout(items, WIDTH).lines
+
+
+def test_greedy_lines_are_recorded_by_engine(font, paragraph_text):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    lines: list = []
+    break_idxs = list(greedy_line_breaks(items, WIDTH, lines=lines))
+    assert break_idxs == list(greedy_line_breaks(items, WIDTH))
+    assert [line.end_idx for line in lines] == break_idxs
+
+
+def test_lines_need_default_engine(font, paragraph_text):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    with pytest.raises(ValueError):
+        list(optimal_line_breaks(items, WIDTH, vectorized=True, lines=[]))
+    with pytest.raises(ValueError):
+        list(greedy_line_breaks(items, WIDTH, streaming=True, lines=[]))
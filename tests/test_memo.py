@@ -0,0 +1,53 @@
+from typesetting import (
+    LineBreakCache,
+    OptimiserParameters,
+    ParagraphItems,
+    ParagraphItemType,
+    greedy_line_breaks,
+    optimal_line_breaks,
+)
+
+
+def test_hits_and_evictions(font, paragraph_text):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    params = OptimiserParameters()
+    cache = LineBreakCache(max_size=2)
+
+    expected = list(optimal_line_breaks(items, 300, params))
+    assert cache.optimal_line_breaks(items, 300, params) == expected
+    assert cache.optimal_line_breaks(items, 300, params) == expected
+    info = cache.info()
+    assert (info.hits, info.misses, info.evictions, info.size) == (1, 1, 0, 1)
+
+    assert cache.greedy_line_breaks(items, 300) == list(greedy_line_breaks(items, 300))
+    cache.optimal_line_breaks(items, 500, params)
+    info = cache.info()
+    assert (info.misses, info.evictions, info.size, info.max_size) == (3, 1, 2, 2)
+
+    # The least recently used result, the first, was evicted.
+    cache.optimal_line_breaks(items, 300, params)
+    assert cache.info().misses == 4
+
+    cache.clear()
+    assert cache.info() == (0, 0, 0, 0, 2)
+
+
+def test_equal_items_share_entries(font, paragraph_text):
+    cache = LineBreakCache()
+    cache.optimal_line_breaks(ParagraphItems.from_text(paragraph_text, font), 300)
+    cache.optimal_line_breaks(list(ParagraphItems.from_text(paragraph_text, font)), 300)
+    assert cache.info().hits == 1
+
+
+def test_digest_is_reset_when_items_are_added(font, paragraph_text):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    digest = items.digest()
+    assert items.digest() is digest
+    assert items[:].digest() == digest
+
+    items.append(ParagraphItemType.BOX, 10.0)
+    assert items.digest() != digest
+    extended = items[:-1]
+    assert extended.digest() == digest
+    extended.extend(items[-1:])
+    assert extended.digest() == items.digest()
@@ -0,0 +1,63 @@
+import pytest
+
+from typesetting import (
+    OptimiserParameters,
+    ParagraphItems,
+    monotone_line_breaks,
+    optimal_line_breaks,
+)
+from typesetting.layout import _monotone, _optimal
+
+
+def total_demerits(
+    items: ParagraphItems, break_idxs: list[int], width: float, params: OptimiserParameters
+) -> float:
+    break_points = {bp.item_idx: bp for bp in _optimal.potential_breaks(items)}
+    prev_break_point, prev_fitness_class, total = None, _optimal.FitnessClass.NORMAL, 0.0
+    for break_idx in break_idxs:
+        break_point = break_points[break_idx]
+        ratio = _optimal.adjustment_ratio_for_line(prev_break_point, break_point, width)
+        fitness_class = _optimal.fitness_class_for_adjustment_ratio(ratio)
+        total += _optimal.line_demerit(
+            params, prev_break_point, break_point, ratio, prev_fitness_class, fitness_class
+        )
+        prev_break_point, prev_fitness_class = break_point, fitness_class
+    return total
+
+
+@pytest.mark.parametrize("width", [150, 300, 1000])
+def test_default_parameters_take_fast_path(font, paragraph_text, width):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    params = OptimiserParameters()
+    assert params.mismatched_fitness_penalty > 0
+
+    result = monotone_line_breaks(items, width, params)
+    assert result.engine == "monotone"
+    assert result.fallback_reason == ""
+
+    expected = list(optimal_line_breaks(items, width, params))
+    assert total_demerits(items, result.break_idxs, width, params) == pytest.approx(
+        total_demerits(items, expected, width, params)
+    )
+
+
+@pytest.mark.parametrize("upper_adjustment_ratio", [1.0, 4.0, 10.0])
+@pytest.mark.parametrize("width", [150, 300, 1000])
+def test_matches_optimal_line_breaks(font, paragraph_text, width, upper_adjustment_ratio):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    params = OptimiserParameters(
+        upper_adjustment_ratio=upper_adjustment_ratio, mismatched_fitness_penalty=0
+    )
+    result = monotone_line_breaks(items, width, params)
+    expected = list(optimal_line_breaks(items, width, params))
+    assert total_demerits(items, result.break_idxs, width, params) == pytest.approx(
+        total_demerits(items, expected, width, params)
+    )
+
+
+def test_rows_are_found_in_blocks(font, paragraph_text, monkeypatch):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    params = OptimiserParameters()
+    expected = monotone_line_breaks(items, 300, params)
+    monkeypatch.setattr(_monotone, "_BLOCK_SIZE", 1)
+    assert monotone_line_breaks(items, 300, params) == expected
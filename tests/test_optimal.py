@@ -0,0 +1,172 @@
+import pytest
+
+from typesetting import (
+    MAX_PENALTY,
+    BreakStats,
+    OptimiserParameters,
+    ParagraphItem,
+    ParagraphItems,
+    ParagraphItemType,
+    optimal_line_breaks,
+)
+from typesetting.layout import _optimal
+from typesetting.layout._optimal import BreakPoint, FitnessClass, NodeArena, RunningSum
+from typesetting.layout._types import MAX_STRETCH
+
+
+@pytest.mark.parametrize("width", [60, 150, 500, 2000])
+@pytest.mark.parametrize(
+    "params",
+    [OptimiserParameters(), OptimiserParameters(upper_adjustment_ratio=20.0, line_penalty=50)],
+)
+def test_vectorized_matches_scalar(font, paragraph_text, hyphenated_text, width, params):
+    for text in (paragraph_text, hyphenated_text):
+        items = ParagraphItems.from_text(text, font)
+        stats, vectorized_stats = BreakStats(), BreakStats()
+        break_idxs = optimal_line_breaks(items, width, params, stats=stats)
+        vectorized_break_idxs = optimal_line_breaks(
+            items, width, params, vectorized=True, stats=vectorized_stats
+        )
+        assert list(vectorized_break_idxs) == list(break_idxs)
+        assert vectorized_stats.demerits == stats.demerits
+        assert vectorized_stats.fallback_breaks == stats.fallback_breaks
+        assert vectorized_stats.candidates == stats.candidates
+
+
+def test_narrow_beam_reports_optimality_gap(font, paragraph_text):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    optimal_stats, beam_stats = BreakStats(), BreakStats()
+    optimal = list(optimal_line_breaks(items, 500, stats=optimal_stats))
+    pruned = list(optimal_line_breaks(items, 500, beam_width=2, stats=beam_stats))
+
+    assert pruned != optimal
+    assert beam_stats.pruned_nodes > 0
+    assert beam_stats.fallback_breaks == 0
+    assert beam_stats.optimality_gap is not None and beam_stats.optimality_gap > 0
+    assert beam_stats.optimality_gap == beam_stats.demerits - optimal_stats.demerits
+    assert optimal_stats.optimality_gap == 0.0
+
+
+def test_budgeted_beam_gap_is_unknown(font, paragraph_text):
+    items = ParagraphItems.from_text(paragraph_text, font)
+    stats = BreakStats()
+    list(optimal_line_breaks(items, 500, beam_width=2, work_budget=10**9, stats=stats))
+    assert stats.pruned_nodes > 0
+    assert stats.optimality_gap is None
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"time_budget": 1.0},
+        {"work_budget": 100},
+        {"beam_width": 0},
+        {"beam_width": 2, "vectorized": True},
+        {"beam_width": 2, "streaming": True},
+        {"streaming": True, "vectorized": True},
+        {"lines": [], "vectorized": True},
+        {"lines": [], "streaming": True},
+        {"lines": [], "beam_width": 2},
+    ],
+)
+def test_invalid_arguments_raise_when_called(kwargs):
+    def items():
+        raise AssertionError("items should not be read")
+        yield
+
+    with pytest.raises(ValueError):
+        optimal_line_breaks(items(), 500, **kwargs)
+
+
+@pytest.mark.parametrize("width", [60, 300, 2000])
+def test_streaming_matches_default(font, paragraph_text, hyphenated_text, width):
+    for text in (paragraph_text, hyphenated_text):
+        items = ParagraphItems.from_text(text, font)
+        stats, streaming_stats = BreakStats(), BreakStats()
+        break_idxs = list(optimal_line_breaks(items, width, stats=stats))
+        assert list(optimal_line_breaks(items, width, streaming=True)) == break_idxs
+        assert (
+            list(optimal_line_breaks(items, width, streaming=True, stats=streaming_stats))
+            == break_idxs
+        )
+        assert streaming_stats.demerits == stats.demerits
+
+
+def test_streaming_yields_before_end_of_items(font, paragraph_text, hyphenated_text):
+    items = ParagraphItems.from_text(hyphenated_text + paragraph_text, font)
+    n_read = 0
+
+    def read_items():
+        nonlocal n_read
+        for item in items:
+            n_read += 1
+            yield item
+
+    break_idxs = optimal_line_breaks(read_items(), 300, streaming=True)
+    first_break_idx = next(break_idxs)
+    assert n_read < len(items) // 2
+    assert [first_break_idx, *break_idxs] == list(optimal_line_breaks(items, 300))
+    assert n_read == len(items)
+
+
+def test_arena_reclaims_released_paths():
+    arena = NodeArena()
+    start_idx = arena.add(None)
+    break_point = BreakPoint(3, 0.0, 0.0, False, RunningSum(10.0, 1.0, 1.0))
+    first_idx = arena.add(break_point, FitnessClass.LOOSE, 5.0, start_idx)
+    second_idx = arena.add(break_point._replace(item_idx=7), previous=first_idx)
+    arena.release(first_idx)
+    assert len(arena) == 3
+    assert arena.path_item_idxs(second_idx) == [3, 7]
+    assert arena.path_node_idxs(second_idx) == [start_idx, first_idx, second_idx]
+
+    # Releasing the start node leaves it referenced by the path.
+    arena.release(start_idx)
+    assert len(arena) == 3
+    arena.release(second_idx)
+    assert len(arena) == 0
+
+    # Entries are reused rather than growing the arena.
+    assert arena.add(None) in (start_idx, first_idx, second_idx)
+    assert len(arena.item_idxs) == 3
+
+
+def test_arena_keeps_only_surviving_paths(font, paragraph_text, monkeypatch):
+    arenas = []
+
+    class RecordingArena(NodeArena):
+        def __init__(self):
+            super().__init__()
+            arenas.append(self)
+
+    monkeypatch.setattr(_optimal, "NodeArena", RecordingArena)
+    items = ParagraphItems.from_text(paragraph_text * 4, font)
+    stats = BreakStats()
+    break_idxs = list(optimal_line_breaks(items, 300, stats=stats))
+    assert break_idxs == list(optimal_line_breaks(items, 300, vectorized=True))
+
+    # Nodes off the surviving paths are reclaimed and their entries reused.
+    (arena,) = arenas
+    assert len(arena.item_idxs) < stats.feasible_breaks // 2
+    assert len(arena) <= len(break_idxs) + stats.peak_active_nodes
+
+
+def test_overfull_line_after_forced_break():
+    # The second line holds a box wider than the line and so needs a break of last resort. The
+    # first line should end only at its forced break rather than also at the glue before it,
+    # which would add an empty line.
+    box, glue, penalty = ParagraphItemType.BOX, ParagraphItemType.GLUE, ParagraphItemType.PENALTY
+    items = [
+        ParagraphItem(box, 20.0),
+        ParagraphItem(glue, 4.0, 2.0, 1.0),
+        ParagraphItem(box, 15.0),
+        ParagraphItem(glue, 0.0, MAX_STRETCH),
+        ParagraphItem(penalty, penalty=-MAX_PENALTY, flagged=True),
+        ParagraphItem(box, 45.0),
+        ParagraphItem(glue, 0.0, MAX_STRETCH),
+        ParagraphItem(penalty, penalty=-MAX_PENALTY, flagged=True),
+    ]
+    for kwargs in ({}, {"vectorized": True}, {"streaming": True}):
+        stats = BreakStats()
+        assert list(optimal_line_breaks(items, 40, stats=stats, **kwargs)) == [4, 7]
+        assert stats.fallback_breaks == 1
@@ -0,0 +1,133 @@
+import asyncio
+import socket
+import struct
+import threading
+import warnings
+
+import pytest
+
+from typesetting import (
+    Font,
+    LayoutClient,
+    LayoutServer,
+    LayoutServerError,
+    break_paragraph,
+)
+from typesetting._protocol import MAX_MESSAGE_SIZE, encode_message, recv_message
+
+TEXTS = ["The quick brown fox jumps over the lazy dog. " * n for n in (1, 3, 8, 20)]
+
+
+class ServerThread:
+    "LayoutServer listening on TCP with its event loop running in a background thread."
+
+    def __init__(self, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self.server = LayoutServer(workers=0, **kwargs)
+        tcp_server = self.run(self.server.start_tcp())
+        self.port = tcp_server.sockets[0].getsockname()[1]
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout=30)
+
+    def client(self) -> LayoutClient:
+        return LayoutClient(port=self.port, timeout=30)
+
+    def close(self):
+        self.run(self.server.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+@pytest.fixture
+def server_thread(font_path):
+    server_thread = ServerThread(font_paths=[font_path], max_batch_delay=0.01)
+    yield server_thread
+    server_thread.close()
+
+
+def test_results_match_break_paragraph(server_thread, font_path):
+    font = Font(font_path, (12.0, 12.0))
+    with server_thread.client() as client:
+        results = client.break_paragraphs(TEXTS, font_path, 12.0, 200)
+        greedy_result = client.break_paragraph(TEXTS[-1], font_path, 12.0, 200, engine="greedy")
+    for text, result in zip(TEXTS, results):
+        broken = break_paragraph(text, font, 200)
+        assert result.break_idxs == broken.break_idxs
+        assert result.passes == broken.passes
+    assert (
+        greedy_result.break_idxs
+        == break_paragraph(TEXTS[-1], font, 200, engine="greedy").break_idxs
+    )
+
+
+def test_responses_are_matched_by_id(server_thread, font_path):
+    request = {"text": TEXTS[0], "font": font_path, "em_size": 12.0, "width": 200}
+    with server_thread.client() as client:
+        # Metrics are returned at once whereas breaks wait for a batch, so the responses arrive
+        # in the opposite order to the requests.
+        client._sock.sendall(
+            encode_message({"id": 100, **request}) + encode_message({"id": 101, "type": "metrics"})
+        )
+        assert [recv_message(client._sock)["id"] for _ in range(2)] == [101, 100]
+
+        client._sock.sendall(
+            encode_message({"id": 102, **request}) + encode_message({"id": 103, "type": "metrics"})
+        )
+        break_response, metrics_response = client._receive([102, 103])
+        assert "break_idxs" in break_response
+        assert "metrics" in metrics_response
+
+
+def test_fonts_not_served_are_errors(server_thread, tmp_path):
+    other_path = tmp_path / "other.ttf"
+    other_path.write_bytes(b"")
+    with server_thread.client() as client:
+        for path in ("/does/not/exist.ttf", str(other_path)):
+            with pytest.raises(LayoutServerError, match="is not served"):
+                client.break_paragraph(TEXTS[0], path, 12.0, 200)
+
+        # The connection remains usable after an error.
+        assert client.metrics()["errors"] == 2
+
+
+def test_oversized_frame_is_an_error(server_thread):
+    with socket.create_connection(("127.0.0.1", server_thread.port), timeout=30) as sock:
+        sock.sendall(struct.pack(">I", MAX_MESSAGE_SIZE + 1))
+        response = recv_message(sock)
+        assert response["id"] is None
+        assert "exceeds maximum" in response["error"]
+        # The server closes the connection.
+        assert sock.recv(1) == b""
+
+
+def test_metrics(server_thread, font_path):
+    with server_thread.client() as client:
+        client.break_paragraphs(TEXTS, font_path, 12.0, 200)
+        metrics = client.metrics()
+    assert metrics == server_thread.server.metrics()._asdict() | {
+        "uptime": metrics["uptime"],
+        "throughput": metrics["throughput"],
+    }
+    assert metrics["requests"] == len(TEXTS)
+    assert metrics["errors"] == 0
+    assert metrics["batches"] >= 1
+    assert metrics["mean_batch_size"] == len(TEXTS) / metrics["batches"]
+    assert metrics["throughput"] > 0
+    assert 0 < metrics["latency_p50"] <= metrics["latency_p95"] <= metrics["latency_p99"]
+
+
+def test_close_closes_open_connections(font_path):
+    server_thread = ServerThread(font_paths=[font_path])
+    client = LayoutClient(port=server_thread.port, timeout=5)
+    client.break_paragraph(TEXTS[0], font_path, 12.0, 200)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        server_thread.close()
+    assert len(server_thread.server._tasks) == 0
+    with pytest.raises(ConnectionError):
+        client.metrics()
+    client.close()
@@ -1,3 +1,49 @@
-from .font import *  # noqa: F401, F403
-from .hyphenation import *  # noqa: F401, F403
-from .layout import *  # noqa: F401, F403
+from typing import TYPE_CHECKING
+
+from ._lazy import lazy_exports
+
+# Submodules are imported on first access to one of their names.
+__all__, __getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "batch": ["BrokenParagraph", "break_paragraph", "break_paragraphs"],
+        "cache": ["ParagraphItemsCache", "ParagraphItemsCacheInfo"],
+        "client": ["LayoutClient", "LayoutResult", "LayoutServerError"],
+        "font": ["Font", "FontRegistry", "Glyph", "GlyphRun", "ShapeCacheInfo"],
+        "hyphenation": ["hyphenate", "Hyphenator", "HyphenationPatterns"],
+        "layout": [
+            "BreakStats",
+            "BreakTraceEntry",
+            "IncrementalParagraph",
+            "Line",
+            "LineBreakCache",
+            "LineBreakCacheInfo",
+            "LineLayout",
+            "MAX_PENALTY",
+            "MonotoneLineBreaks",
+            "OptimiserParameters",
+            "ParagraphItem",
+            "ParagraphItemType",
+            "ParagraphItems",
+            "PreparedParagraph",
+            "greedy_line_breaks",
+            "greedy_line_breaks_batch",
+            "greedy_line_layout",
+            "line_adjustment_ratios",
+            "monotone_line_breaks",
+            "optimal_line_breaks",
+            "optimal_line_layout",
+            "text_to_paragraph_items",
+        ],
+        "server": ["LayoutServer", "LayoutServerMetrics"],
+    },
+)
+
+if TYPE_CHECKING:
+    from .batch import *  # noqa: F401, F403
+    from .cache import *  # noqa: F401, F403
+    from .client import *  # noqa: F401, F403
+    from .font import *  # noqa: F401, F403
+    from .hyphenation import *  # noqa: F401, F403
+    from .layout import *  # noqa: F401, F403
+    from .server import *  # noqa: F401, F403
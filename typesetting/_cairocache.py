@@ -0,0 +1,56 @@
+"""
+Caches of glyph outlines and font faces drawn by typesetting.cairo. They do not depend on pycairo
+and so are kept apart from it.
+
+Entries are keyed by font file, face index and, for glyph outlines, em size and glyph index
+rather than by font so that the caches do not keep fonts alive.
+
+"""
+from typing import TYPE_CHECKING, Any, Callable, Hashable, TypeVar
+
+from ._lru import LRUCache
+
+if TYPE_CHECKING:
+    from .font import Font
+
+# Maximum number of glyph outlines cached as cairo paths.
+GLYPH_PATH_CACHE_SIZE = 65536
+
+# Maximum number of cairo font faces cached for show_glyphs_at().
+FONT_FACE_CACHE_SIZE = 64
+
+_V = TypeVar("_V")
+
+glyph_paths: LRUCache[Any] = LRUCache(GLYPH_PATH_CACHE_SIZE)
+
+# Each font face keeps its FreeType face alive until cairo destroys it and so faces can be
+# evicted while still in use.
+font_faces: LRUCache[Any] = LRUCache(FONT_FACE_CACHE_SIZE)
+
+
+def glyph_path_key(font: "Font", index: int) -> Hashable:
+    return (font.path, font.face_index, font.em_size, index)
+
+
+def font_face_key(font: "Font") -> Hashable:
+    return (font.path, font.face_index)
+
+
+def glyph_path(font: "Font", index: int, draw: Callable[["Font", int], _V]) -> _V:
+    "Return the cached outline of a glyph, drawing it with draw(font, index) if needed."
+    key = glyph_path_key(font, index)
+    path = glyph_paths.get(key)
+    if path is None:
+        path = draw(font, index)
+        glyph_paths.put(key, path)
+    return path
+
+
+def font_face(font: "Font", create: Callable[["Font"], _V]) -> _V:
+    "Return the cached font face for a font, creating it with create(font) if needed."
+    key = font_face_key(font)
+    face = font_faces.get(key)
+    if face is None:
+        face = create(font)
+        font_faces.put(key, face)
+    return face
@@ -1,32 +1,60 @@
 import ctypes as ct
+import functools
+import itertools
+import threading
 
 import cairo
-from freetype import FT_Face
+import freetype
 
 CAIRO_STATUS_SUCCESS = 0
 FT_Err_Ok = 0
 
-_freetype_so = ct.CDLL("libfreetype.so.6")
-_cairo_so = ct.CDLL("libcairo.so.2")
-_cairo_so.cairo_ft_font_face_create_for_ft_face.restype = ct.c_void_p
-_cairo_so.cairo_ft_font_face_create_for_ft_face.argtypes = [ct.c_void_p, ct.c_int]
-_cairo_so.cairo_font_face_get_user_data.restype = ct.c_void_p
-_cairo_so.cairo_font_face_get_user_data.argtypes = (ct.c_void_p, ct.c_void_p)
-_cairo_so.cairo_font_face_set_user_data.argtypes = (
-    ct.c_void_p,
-    ct.c_void_p,
-    ct.c_void_p,
-    ct.c_void_p,
-)
-_cairo_so.cairo_set_font_face.argtypes = [ct.c_void_p, ct.c_void_p]
-_cairo_so.cairo_font_face_status.argtypes = [ct.c_void_p]
-_cairo_so.cairo_font_face_destroy.argtypes = (ct.c_void_p,)
-_cairo_so.cairo_status.argtypes = [ct.c_void_p]
-
-_ft_lib = ct.c_void_p()
-status = _freetype_so.FT_Init_FreeType(ct.byref(_ft_lib))
-if status != FT_Err_Ok:
-    raise RuntimeError("Error %d initializing FreeType library." % status)
+_destroy_func_t = ct.CFUNCTYPE(None, ct.c_void_p)
+
+# FreeType faces used by cairo font faces, keyed by the token stored as user data of the cairo
+# font face. cairo does not take ownership of FreeType faces and so each is kept here until cairo
+# destroys the font face using it.
+_ft_faces: dict[int, freetype.Face] = {}
+_ft_face_tokens = itertools.count(1)
+_ft_faces_lock = threading.Lock()
+_ft_face_key = ct.c_int()
+
+
+def _release_ft_face(token: int):
+    with _ft_faces_lock:
+        _ft_faces.pop(token, None)
+
+
+# Kept at module level so that the callback outlives every font face which may call it.
+_release_ft_face_callback = _destroy_func_t(_release_ft_face)
+
+
+@functools.lru_cache(maxsize=None)
+def _cairo_library() -> ct.CDLL:
+    # FreeType and cairo are loaded and FreeType initialised on first use rather than when this
+    # module is imported.
+    freetype_so = ct.CDLL("libfreetype.so.6")
+    ft_lib = ct.c_void_p()
+    status = freetype_so.FT_Init_FreeType(ct.byref(ft_lib))
+    if status != FT_Err_Ok:
+        raise RuntimeError("Error %d initializing FreeType library." % status)
+
+    cairo_so = ct.CDLL("libcairo.so.2")
+    cairo_so.cairo_ft_font_face_create_for_ft_face.restype = ct.c_void_p
+    cairo_so.cairo_ft_font_face_create_for_ft_face.argtypes = [ct.c_void_p, ct.c_int]
+    cairo_so.cairo_font_face_get_user_data.restype = ct.c_void_p
+    cairo_so.cairo_font_face_get_user_data.argtypes = (ct.c_void_p, ct.c_void_p)
+    cairo_so.cairo_font_face_set_user_data.argtypes = (
+        ct.c_void_p,
+        ct.c_void_p,
+        ct.c_void_p,
+        ct.c_void_p,
+    )
+    cairo_so.cairo_set_font_face.argtypes = [ct.c_void_p, ct.c_void_p]
+    cairo_so.cairo_font_face_status.argtypes = [ct.c_void_p]
+    cairo_so.cairo_font_face_destroy.argtypes = (ct.c_void_p,)
+    cairo_so.cairo_status.argtypes = [ct.c_void_p]
+    return cairo_so
 
 
 class PycairoContext(ct.Structure):
@@ -37,18 +65,44 @@ class PycairoContext(ct.Structure):
     ]
 
 
-def create_cairo_font_face_for_ft_face(cairo_ctx: cairo.Context, ft_face: FT_Face, loadoptions=0):
+def create_cairo_font_face_for_ft_face(
+    cairo_ctx: cairo.Context, ft_face: freetype.Face, loadoptions=0
+) -> cairo.FontFace:
+    """
+    Return a cairo font face for a FreeType face. The FreeType face is kept alive until cairo
+    destroys the font face.
+
+    """
+    cairo_so = _cairo_library()
+
     # create Cairo font face for freetype face
-    cr_face = _cairo_so.cairo_ft_font_face_create_for_ft_face(ft_face, loadoptions)
-    status = _cairo_so.cairo_font_face_status(cr_face)
+    cr_face = cairo_so.cairo_ft_font_face_create_for_ft_face(ft_face._FT_Face, loadoptions)
+    status = cairo_so.cairo_font_face_status(cr_face)
     if status != CAIRO_STATUS_SUCCESS:
+        cairo_so.cairo_font_face_destroy(cr_face)
+        raise RuntimeError("Error %d creating cairo font face" % status)
+
+    # Release the FreeType face when cairo destroys the font face.
+    with _ft_faces_lock:
+        token = next(_ft_face_tokens)
+        _ft_faces[token] = ft_face
+    status = cairo_so.cairo_font_face_set_user_data(
+        cr_face, ct.byref(_ft_face_key), token, _release_ft_face_callback
+    )
+    if status != CAIRO_STATUS_SUCCESS:
+        _release_ft_face(token)
+        cairo_so.cairo_font_face_destroy(cr_face)
         raise RuntimeError("Error %d creating cairo font face" % status)
 
     # set Cairo font face into Cairo context
     cairo_t = PycairoContext.from_address(id(cairo_ctx)).ctx
     cairo_ctx.save()
-    _cairo_so.cairo_set_font_face(cairo_t, cr_face)
-    status = _cairo_so.cairo_font_face_status(cairo_t)
+    cairo_so.cairo_set_font_face(cairo_t, cr_face)
+
+    # The context now holds a reference to the font face and so the one from creating it is
+    # released.
+    cairo_so.cairo_font_face_destroy(cr_face)
+    status = cairo_so.cairo_status(cairo_t)
     if status != CAIRO_STATUS_SUCCESS:
         cairo_ctx.restore()
         raise RuntimeError("Error %d creating cairo font face" % status)
@@ -56,6 +110,4 @@ def create_cairo_font_face_for_ft_face(cairo_ctx: cairo.Context, ft_face: FT_Fac
     # get back Cairo font face as a Python object
     face = cairo_ctx.get_font_face()
     cairo_ctx.restore()
-
-    # TODO: does this take a reference to the underlying FT_Face?
     return face
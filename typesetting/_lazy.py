@@ -0,0 +1,38 @@
+"""
+Lazy loading of the names a package re-exports from its submodules, following PEP 562. A
+submodule is only imported when one of its names is first accessed so that, e.g., line breaking
+does not load HarfBuzz or hyphenation dictionaries.
+
+"""
+import importlib
+import sys
+from typing import Any, Callable
+
+
+def lazy_exports(
+    package: str, exports: dict[str, list[str]]
+) -> tuple[list[str], Callable[[str], Any], Callable[[], list[str]]]:
+    """
+    Return __all__, __getattr__ and __dir__ for package which exports the names listed for each
+    of its submodules. Submodules can also be accessed as attributes of package.
+
+    """
+    submodules = {name: submodule for submodule, names in exports.items() for name in names}
+    all_names = list(submodules)
+
+    def __getattr__(name: str) -> Any:
+        if name in submodules:
+            value = getattr(importlib.import_module(f".{submodules[name]}", package), name)
+        elif name in exports:
+            value = importlib.import_module(f".{name}", package)
+        else:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+
+        # Later accesses find the name without calling __getattr__.
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__() -> list[str]:
+        return sorted(set(vars(sys.modules[package])) | set(all_names) | set(exports))
+
+    return all_names, __getattr__, __dir__
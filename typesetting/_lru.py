@@ -0,0 +1,75 @@
+"""
+Bounded least recently used cache shared by the in-memory caches of the package: shaping
+results, glyph outlines, cairo font faces, hyphenated words and line breaks.
+
+"""
+import collections
+import threading
+from typing import Generic, Hashable, NamedTuple, Optional, TypeVar
+
+_V = TypeVar("_V")
+
+
+class LRUCacheInfo(NamedTuple):
+    "Statistics for an LRUCache."
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+
+
+class LRUCache(Generic[_V]):
+    """
+    Least recently used cache with a bounded number of entries which counts hits, misses and
+    evictions. A lock guards the entries and counters so that a cache may be shared by several
+    threads. Values are computed by callers outside the lock and so two threads missing on the
+    same key may both store a value.
+
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._hits, self._misses, self._evictions = 0, 0, 0
+        self._entries: collections.OrderedDict[Hashable, _V] = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[_V]:
+        "Return the value stored under key, marking it as most recently used, or None."
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: _V):
+        "Store value under key and evict the least recently used entries beyond max_size."
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        "Remove all entries and reset statistics."
+        with self._lock:
+            self._entries.clear()
+            self._hits, self._misses, self._evictions = 0, 0, 0
+
+    def info(self) -> LRUCacheInfo:
+        "Return statistics for the cache."
+        with self._lock:
+            return LRUCacheInfo(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                size=len(self._entries),
+                max_size=self.max_size,
+            )
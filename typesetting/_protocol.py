@@ -0,0 +1,65 @@
+"""
+Messages exchanged by LayoutServer and LayoutClient. Each message is a JSON object encoded as
+UTF-8 and preceded by its length as a four byte big-endian unsigned integer.
+
+"""
+import asyncio
+import json
+import socket
+import struct
+from typing import Any, Optional
+
+_HEADER = struct.Struct(">I")
+
+# Largest message accepted in bytes.
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+Message = dict[str, Any]
+
+
+def encode_message(message: Message) -> bytes:
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return _HEADER.pack(len(body)) + body
+
+
+def _decode_body(body: bytes) -> Message:
+    message = json.loads(body)
+    if not isinstance(message, dict):
+        raise ValueError("message is not a JSON object")
+    return message
+
+
+def _check_size(size: int):
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"message of {size} bytes exceeds maximum of {MAX_MESSAGE_SIZE} bytes")
+
+
+async def read_message(reader: asyncio.StreamReader) -> Optional[Message]:
+    "Read a message from reader. Return None if the stream ends before a message starts."
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if len(e.partial) == 0:
+            return None
+        raise
+    (size,) = _HEADER.unpack(header)
+    _check_size(size)
+    return _decode_body(await reader.readexactly(size))
+
+
+def recv_message(sock: socket.socket) -> Message:
+    "Read a message from a blocking socket."
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    _check_size(size)
+    return _decode_body(_recv_exactly(sock, size))
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view, n_received = memoryview(buffer), 0
+    while n_received < size:
+        n = sock.recv_into(view[n_received:])
+        if n == 0:
+            raise ConnectionError("connection closed by layout server")
+        n_received += n
+    return bytes(buffer)
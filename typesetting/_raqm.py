@@ -1,4 +1,5 @@
 import ctypes
+import functools
 
 
 class RaqmGlyph(ctypes.Structure):
@@ -13,46 +14,51 @@ class RaqmGlyph(ctypes.Structure):
     ]
 
 
-_raqm = ctypes.cdll.LoadLibrary("libraqm.so.0")
-_raqm.raqm_create.restype = ctypes.c_void_p
-_raqm.raqm_destroy.argtypes = [ctypes.c_void_p]
-_raqm.raqm_set_text_utf8.restype = ctypes.c_bool
-_raqm.raqm_set_text_utf8.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t]
-_raqm.raqm_set_freetype_face.restype = ctypes.c_bool
-_raqm.raqm_set_freetype_face.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
-_raqm.raqm_layout.restype = ctypes.c_bool
-_raqm.raqm_layout.argtypes = [ctypes.c_void_p]
-_raqm.raqm_get_glyphs.restype = ctypes.c_void_p
-_raqm.raqm_get_glyphs.argtypes = [ctypes.c_void_p]
-_raqm.raqm_add_font_feature.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
-_raqm.raqm_add_font_feature.restype = ctypes.c_bool
+@functools.lru_cache(maxsize=None)
+def _library() -> ctypes.CDLL:
+    # libraqm is loaded on first use rather than when this module is imported.
+    raqm = ctypes.cdll.LoadLibrary("libraqm.so.0")
+    raqm.raqm_create.restype = ctypes.c_void_p
+    raqm.raqm_destroy.argtypes = [ctypes.c_void_p]
+    raqm.raqm_set_text_utf8.restype = ctypes.c_bool
+    raqm.raqm_set_text_utf8.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t]
+    raqm.raqm_set_freetype_face.restype = ctypes.c_bool
+    raqm.raqm_set_freetype_face.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+    raqm.raqm_layout.restype = ctypes.c_bool
+    raqm.raqm_layout.argtypes = [ctypes.c_void_p]
+    raqm.raqm_get_glyphs.restype = ctypes.c_void_p
+    raqm.raqm_get_glyphs.argtypes = [ctypes.c_void_p]
+    raqm.raqm_add_font_feature.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+    raqm.raqm_add_font_feature.restype = ctypes.c_bool
+    return raqm
 
 
 class Raqm:
     def __init__(self):
-        self._raqm = _raqm.raqm_create()
+        self._lib = _library()
+        self._raqm = self._lib.raqm_create()
 
     def set_text(self, text):
         return self.set_text_utf8(text.encode("utf8"))
 
     def set_text_utf8(self, encoded_text):
-        return _raqm.raqm_set_text_utf8(self._raqm, encoded_text, len(encoded_text))
+        return self._lib.raqm_set_text_utf8(self._raqm, encoded_text, len(encoded_text))
 
     def set_freetype_face(self, face):
         if hasattr(face, "_FT_Face"):
             face = face._FT_Face
-        return _raqm.raqm_set_freetype_face(self._raqm, face)
+        return self._lib.raqm_set_freetype_face(self._raqm, face)
 
     def add_font_feature(self, feature):
         encoded_feature = feature.encode("utf8")
-        return _raqm.raqm_add_font_feature(self._raqm, encoded_feature, len(encoded_feature))
+        return self._lib.raqm_add_font_feature(self._raqm, encoded_feature, len(encoded_feature))
 
     def layout(self):
-        return _raqm.raqm_layout(self._raqm)
+        return self._lib.raqm_layout(self._raqm)
 
     def get_glyphs(self):
         length = ctypes.c_size_t(0)
-        glyphs = _raqm.raqm_get_glyphs(self._raqm, ctypes.byref(length))
+        glyphs = self._lib.raqm_get_glyphs(self._raqm, ctypes.byref(length))
 
         if glyphs is not None:
             return (RaqmGlyph * length.value).from_buffer_copy(
@@ -61,5 +67,5 @@ class Raqm:
         return None
 
     def __del__(self):
-        if self._raqm:
-            _raqm.raqm_destroy(self._raqm)
+        if getattr(self, "_raqm", None):
+            self._lib.raqm_destroy(self._raqm)
@@ -0,0 +1,199 @@
+import collections
+import concurrent.futures
+import dataclasses
+import itertools
+import os
+from typing import TYPE_CHECKING, Iterable, Iterator, Literal, NamedTuple, Optional
+
+from .font import Font
+from .layout import (
+    OptimiserParameters,
+    ParagraphItems,
+    greedy_line_breaks,
+    line_adjustment_ratios,
+    optimal_line_breaks,
+)
+
+if TYPE_CHECKING:
+    from .hyphenation import Hyphenator
+
+__all__ = ["BrokenParagraph", "break_paragraph", "break_paragraphs"]
+
+# Size of shaping cache used by fonts in worker processes if the font passed to
+# break_paragraphs() does not specify one.
+DEFAULT_WORKER_SHAPE_CACHE_SIZE = 4096
+
+
+class BrokenParagraph(NamedTuple):
+    "Paragraph items for a paragraph and indices of the items at which lines are broken."
+    items: ParagraphItems
+    break_idxs: list[int]
+
+    # Number of passes made to break the paragraph. See break_paragraph().
+    passes: int = 1
+
+
+def break_paragraph(
+    text: str,
+    font: Font,
+    width: float,
+    *,
+    engine: Literal["optimal", "greedy"] = "optimal",
+    params: Optional[OptimiserParameters] = None,
+    hyphenator: Optional["Hyphenator"] = None,
+    pretolerance: Optional[float] = None,
+) -> BrokenParagraph:
+    """
+    Convert a paragraph of text to paragraph items and break it into lines of the given width
+    using either the "optimal" or "greedy" engine. If hyphenator is passed, text is hyphenated
+    first.
+
+    If pretolerance is also passed, breaking follows TeX's two passes. The first pass breaks the
+    text without hyphenation. For the optimal engine, it only considers lines with adjustment
+    ratios below pretolerance rather than params.upper_adjustment_ratio. The first pass's breaks
+    are kept if every line's adjustment ratio is at least -1 and below pretolerance. Otherwise
+    the text is hyphenated and broken again as if pretolerance were not passed. The result's
+    passes gives the number of passes made.
+
+    """
+    if engine not in ("optimal", "greedy"):
+        raise ValueError(f"Unknown line breaking engine: {engine!r}")
+    params = params if params is not None else OptimiserParameters()
+
+    if hyphenator is not None and pretolerance is not None:
+        items = ParagraphItems.from_text(text, font)
+        break_idxs = _line_breaks(
+            items, width, engine, params._replace(upper_adjustment_ratio=pretolerance)
+        )
+        if all(
+            -1.0 <= adjustment_ratio < pretolerance
+            for adjustment_ratio in line_adjustment_ratios(items, break_idxs, width)
+        ):
+            return BrokenParagraph(items=items, break_idxs=break_idxs, passes=1)
+
+    if hyphenator is not None:
+        text = hyphenator.hyphenate(text)
+    items = ParagraphItems.from_text(text, font)
+    return BrokenParagraph(
+        items=items,
+        break_idxs=_line_breaks(items, width, engine, params),
+        passes=2 if hyphenator is not None and pretolerance is not None else 1,
+    )
+
+
+def _line_breaks(
+    items: ParagraphItems,
+    width: float,
+    engine: Literal["optimal", "greedy"],
+    params: OptimiserParameters,
+) -> list[int]:
+    if engine == "greedy":
+        return list(greedy_line_breaks(items, width))
+    return list(optimal_line_breaks(items, width, params))
+
+
+# Font and hyphenator used by paragraphs broken in this process. Set by _init_worker().
+_worker_font: Optional[Font] = None
+_worker_hyphenator: Optional["Hyphenator"] = None
+
+
+def _init_worker(font: Font, hyphenator: Optional["Hyphenator"] = None):
+    global _worker_font, _worker_hyphenator
+    _worker_font = font
+    _worker_hyphenator = hyphenator
+
+
+def _break_chunk(
+    texts: list[str],
+    width: float,
+    engine: Literal["optimal", "greedy"],
+    params: Optional[OptimiserParameters],
+    pretolerance: Optional[float],
+) -> list[BrokenParagraph]:
+    assert _worker_font is not None
+    return [
+        break_paragraph(
+            text,
+            _worker_font,
+            width,
+            engine=engine,
+            params=params,
+            hyphenator=_worker_hyphenator,
+            pretolerance=pretolerance,
+        )
+        for text in texts
+    ]
+
+
+def break_paragraphs(
+    texts: Iterable[str],
+    font: Font,
+    width: float,
+    *,
+    engine: Literal["optimal", "greedy"] = "optimal",
+    params: Optional[OptimiserParameters] = None,
+    hyphenator: Optional["Hyphenator"] = None,
+    pretolerance: Optional[float] = None,
+    workers: Optional[int] = None,
+    chunksize: int = 16,
+) -> Iterator[BrokenParagraph]:
+    """
+    Break each paragraph of text as break_paragraph() does. Results are yielded in the same order
+    as texts.
+
+    Paragraphs are broken in a pool of worker processes, sent in chunks of chunksize paragraphs.
+    At most two chunks per worker are in flight and texts is only read as chunks are sent, so
+    that texts may be an unbounded stream and results are yielded as soon as their chunk is
+    broken. If workers is None, one worker is used per CPU. If workers is 0, paragraphs are
+    broken in this process. Each worker re-creates font once and keeps its shaping cache warm
+    between paragraphs.
+
+    """
+    if engine not in ("optimal", "greedy"):
+        raise ValueError(f"Unknown line breaking engine: {engine!r}")
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least one")
+    if font.shape_cache_size == 0:
+        font = dataclasses.replace(font, shape_cache_size=DEFAULT_WORKER_SHAPE_CACHE_SIZE)
+
+    if workers == 0:
+        for text in texts:
+            yield break_paragraph(
+                text,
+                font,
+                width,
+                engine=engine,
+                params=params,
+                hyphenator=hyphenator,
+                pretolerance=pretolerance,
+            )
+        return
+
+    n_workers = workers if workers is not None else os.cpu_count() or 1
+    text_iter = iter(texts)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=n_workers, initializer=_init_worker, initargs=(font, hyphenator)
+    ) as executor:
+        pending: collections.deque[concurrent.futures.Future] = collections.deque()
+
+        def submit_chunk() -> bool:
+            chunk = list(itertools.islice(text_iter, chunksize))
+            if len(chunk) == 0:
+                return False
+            pending.append(
+                executor.submit(_break_chunk, chunk, width, engine, params, pretolerance)
+            )
+            return True
+
+        while len(pending) < 2 * n_workers and submit_chunk():
+            pass
+        try:
+            while len(pending) > 0:
+                results = pending.popleft().result()
+                submit_chunk()
+                yield from results
+        finally:
+            # Do not wait for chunks whose results will not be read, e.g. if the caller stops
+            # iterating early.
+            for future in pending:
+                future.cancel()
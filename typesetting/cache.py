@@ -0,0 +1,328 @@
+"""
+On-disk cache of paragraph items.
+
+Items are stored in one file per paragraph, named by a digest of everything that determines
+them: the text, the contents of the font file, the font's size, features, language and face and
+the hyphenator's language and patterns. A warm lookup therefore neither shapes nor hyphenates.
+
+Files hold the columns of ParagraphItems back to back and are memory-mapped on load so that the
+loaded columns are views of the file rather than copies. The total size of the files is bounded
+and the least recently used files are removed first.
+
+"""
+import array
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from typing import TYPE_CHECKING, NamedTuple, Optional, Sequence, Union, overload
+
+from .layout import ParagraphItems
+
+if TYPE_CHECKING:
+    from .font import Font
+    from .hyphenation import Hyphenator
+
+__all__ = ["ParagraphItemsCache", "ParagraphItemsCacheInfo"]
+
+# Default bound on the total size of cache files in bytes.
+DEFAULT_MAX_CACHE_SIZE = 256 * 1024 * 1024
+
+# Header of cache files: magic number, which also identifies byte order, version, number of
+# items and length of the encoded item text.
+_ITEMS_MAGIC = 0x4D455449
+_ITEMS_VERSION = 1
+_ITEMS_HEADER_LENGTH = 4
+
+_ITEMS_SUFFIX = ".items"
+
+
+class ParagraphItemsCacheInfo(NamedTuple):
+    "Statistics for a ParagraphItemsCache. Sizes are in bytes."
+    hits: int
+    misses: int
+    evictions: int
+    files: int
+    size: int
+    max_size: int
+
+
+class _MappedTexts(Sequence[str]):
+    "Item text decoded on access from UTF-8 text and the offset at which each item's text ends."
+
+    def __init__(self, text: memoryview, ends: memoryview):
+        self._text = text
+        self._ends = ends
+
+    def __len__(self) -> int:
+        return len(self._ends)
+
+    @overload
+    def __getitem__(self, idx: int) -> str:
+        ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> list[str]:
+        ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[str, list[str]]:
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        start = self._ends[idx - 1] if idx > 0 else 0
+        return str(self._text[start : self._ends[idx]], "utf-8", "surrogatepass")
+
+
+class ParagraphItemsCache:
+    """
+    Content-addressed cache of paragraph items in a directory. The directory may be shared by
+    several processes. Files are replaced atomically and so a reader sees either a whole file or
+    none.
+
+    Items returned by get() are memory-mapped and read-only.
+
+    """
+
+    def __init__(self, directory: str, *, max_size: int = DEFAULT_MAX_CACHE_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        os.makedirs(directory, exist_ok=True)
+
+        # Digests of font files keyed by path, size and modification time.
+        self._font_digests: dict[tuple[str, int, int], str] = {}
+
+        # Total size of cache files or None if the directory has not been scanned.
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def key(
+        self, text: str, font: "Font", hyphenator: Optional[Union["Hyphenator", str]] = None
+    ) -> str:
+        """
+        Return the key of the items for text, hyphenated by hyphenator if given, in font. The
+        hyphenator may be given by its language, as for items().
+
+        """
+        if isinstance(hyphenator, str):
+            from .hyphenation import Hyphenator
+
+            hyphenation_key = Hyphenator.language_cache_key(hyphenator)
+        else:
+            hyphenation_key = hyphenator.cache_key if hyphenator is not None else ""
+        hash = hashlib.sha256()
+        for field in (
+            str(_ITEMS_VERSION),
+            self._font_digest(font.path),
+            repr(tuple(font.em_size)),
+            repr(tuple(font.dpi)),
+            repr(tuple(font.features)),
+            font.language,
+            str(font.face_index),
+            hyphenation_key,
+            text,
+        ):
+            hash.update(field.encode("utf-8", "surrogatepass"))
+            hash.update(b"\0")
+        return hash.hexdigest()
+
+    def items(
+        self, text: str, font: "Font", hyphenator: Optional[Union["Hyphenator", str]] = None
+    ) -> ParagraphItems:
+        """
+        Return items for text in font as ParagraphItems.from_text() would, hyphenating text with
+        hyphenator first if given. Items are loaded from the cache if present and otherwise
+        generated and stored.
+
+        hyphenator may be a language, in which case the shared Hyphenator.for_language() is only
+        created, and its dictionary loaded, on a miss.
+
+        """
+        key = self.key(text, font, hyphenator)
+        items = self.get(key)
+        if items is None:
+            if isinstance(hyphenator, str):
+                from .hyphenation import Hyphenator
+
+                hyphenator = Hyphenator.for_language(hyphenator)
+            if hyphenator is not None:
+                text = hyphenator.hyphenate(text)
+            items = ParagraphItems.from_text(text, font)
+            self.put(key, items)
+        return items
+
+    def get(self, key: str) -> Optional[ParagraphItems]:
+        """
+        Return the items stored under key or None if there are none. A file which is truncated or
+        not a cache file is removed and counted as a miss.
+
+        """
+        path = self._path(key)
+        items = None
+        try:
+            with open(path, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Files are ordered by modification time for eviction.
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            # mmap raises ValueError for an empty file.
+            _remove(path)
+        else:
+            items = _mapped_items(mapped)
+            if items is None:
+                mapped.close()
+                _remove(path)
+        with self._lock:
+            if items is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return items
+
+    def put(self, key: str, items: ParagraphItems):
+        "Store items under key and evict files if the cache is too large."
+        texts = [text.encode("utf-8", "surrogatepass") for text in items.texts]
+        text_ends, end = array.array("Q"), 0
+        for text in texts:
+            end += len(text)
+            text_ends.append(end)
+        header = array.array(
+            "Q", [_ITEMS_MAGIC, _ITEMS_VERSION, len(items), text_ends[-1] if texts else 0]
+        )
+
+        # Write to a temporary file in the cache directory and rename it into place.
+        fd, temp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for column in (
+                    header,
+                    items.widths,
+                    items.stretchabilities,
+                    items.shrinkabilities,
+                    items.penalties,
+                    text_ends,
+                ):
+                    f.write(column)
+                f.write(bytes(items.item_types))
+                f.write(bytes(items.flags))
+                for text in texts:
+                    f.write(text)
+                file_size = f.tell()
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        with self._lock:
+            if self._size is not None:
+                self._size += file_size
+            if self._size is None or self._size > self.max_size:
+                self._evict()
+
+    def clear(self):
+        "Remove all cache files and reset statistics."
+        with self._lock:
+            for entry in self._entries():
+                _remove(entry.path)
+            self._size = 0
+            self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def info(self) -> ParagraphItemsCacheInfo:
+        "Return statistics for the cache. The number and size of files are found by a scan."
+        entries = self._entries()
+        with self._lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        return ParagraphItemsCacheInfo(
+            hits=hits,
+            misses=misses,
+            evictions=evictions,
+            files=len(entries),
+            size=sum(entry.stat().st_size for entry in entries),
+            max_size=self.max_size,
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _ITEMS_SUFFIX)
+
+    def _entries(self) -> list[os.DirEntry]:
+        with os.scandir(self.directory) as it:
+            return [entry for entry in it if entry.name.endswith(_ITEMS_SUFFIX)]
+
+    def _evict(self):
+        # Rescan the directory since other processes may have added or removed files and remove
+        # the least recently used files until the total size is within bounds.
+        files = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        files.sort()
+
+        size = sum(file_size for _, file_size, _ in files)
+        for _, file_size, path in files:
+            if size <= self.max_size:
+                break
+            _remove(path)
+            size -= file_size
+            self.evictions += 1
+        self._size = size
+
+    def _font_digest(self, path: str) -> str:
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        stat_key = (path, stat.st_size, stat.st_mtime_ns)
+        digest = self._font_digests.get(stat_key)
+        if digest is None:
+            hash = hashlib.sha256()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    hash.update(block)
+            digest = self._font_digests[stat_key] = hash.hexdigest()
+        return digest
+
+
+def _mapped_items(mapped: mmap.mmap) -> Optional[ParagraphItems]:
+    # Return items viewing the columns of a memory-mapped cache file or None if it is not one.
+    words = memoryview(mapped)[: 8 * _ITEMS_HEADER_LENGTH]
+    if len(words) != 8 * _ITEMS_HEADER_LENGTH:
+        return None
+    words = words.cast("Q")
+    if words[0] != _ITEMS_MAGIC or words[1] != _ITEMS_VERSION:
+        return None
+    n_items, n_text_bytes = words[2:_ITEMS_HEADER_LENGTH]
+    if len(mapped) != 8 * _ITEMS_HEADER_LENGTH + 42 * n_items + n_text_bytes:
+        return None
+
+    # Columns of eight-byte values are followed by columns of single bytes and the text.
+    offset = 8 * _ITEMS_HEADER_LENGTH
+    float_columns = []
+    for _ in range(4):
+        float_columns.append(memoryview(mapped)[offset : offset + 8 * n_items].cast("d"))
+        offset += 8 * n_items
+    text_ends = memoryview(mapped)[offset : offset + 8 * n_items].cast("Q")
+    offset += 8 * n_items
+    byte_columns = []
+    for _ in range(2):
+        byte_columns.append(memoryview(mapped)[offset : offset + n_items])
+        offset += n_items
+    text = memoryview(mapped)[offset : offset + n_text_bytes]
+
+    items = ParagraphItems()
+    items.widths, items.stretchabilities, items.shrinkabilities, items.penalties = float_columns
+    items.item_types, items.flags = byte_columns
+    items.texts = _MappedTexts(text, text_ends)
+    return items
+
+
+def _remove(path: str):
+    # Files may already have been removed by another process.
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
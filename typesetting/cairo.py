@@ -1,11 +1,14 @@
-from typing import Iterable
+import functools
+from typing import Callable, Iterable, Iterator
 
 import cairo
 import uharfbuzz as hb
 
-from .font import Font, Glyph
+from . import _cairocache
+from .font import Font, Glyph, GlyphRun
+from .layout import LineLayout
 
-__all__ = ["fill_glyphs_at"]
+__all__ = ["draw_line_layout_at", "fill_glyphs_at", "show_glyphs_at"]
 
 
 def make_hb_cairo_drawfuncs():
@@ -53,20 +56,137 @@ hb_cairo_drawfuncs = make_hb_cairo_drawfuncs()
 
 
 def glyph_at(ctx: cairo.Context, x: float, y: float, glyph: Glyph, font: Font):
+    _glyph_index_at(ctx, x + glyph.x_offset, y + glyph.y_offset, glyph.index, font)
+
+
+def _glyph_index_at(ctx: cairo.Context, x: float, y: float, index: int, font: Font):
     ctx.save()
     ctx.translate(x, y)
-    ctx.translate(glyph.x_offset, glyph.y_offset)
     ctx.scale(font.em_size[0] * 1e-3, -font.em_size[1] * 1e-3)
-    font.harfbuzz_font.draw_glyph(glyph.index, hb_cairo_drawfuncs, ctx)
+    font.harfbuzz_font.draw_glyph(index, hb_cairo_drawfuncs, ctx)
     ctx.restore()
 
 
+def _glyph_positions(
+    glyphs: Iterable[Glyph],
+) -> Iterator[tuple[int, float, float, float, float]]:
+    "Yield index, x and y offset and x and y advance for each glyph."
+    if isinstance(glyphs, GlyphRun):
+        yield from zip(
+            glyphs.indices,
+            glyphs.x_offsets,
+            glyphs.y_offsets,
+            glyphs.x_advances,
+            glyphs.y_advances,
+        )
+    else:
+        for glyph in glyphs:
+            yield glyph.index, glyph.x_offset, glyph.y_offset, glyph.x_advance, glyph.y_advance
+
+
+def _glyph_path(font: Font, index: int) -> cairo.Path:
+    "Return the outline of a glyph drawn at the origin as a cairo path in device units."
+    return _cairocache.glyph_path(font, index, _draw_glyph_path)
+
+
+def _draw_glyph_path(font: Font, index: int) -> cairo.Path:
+    ctx = cairo.Context(cairo.RecordingSurface(cairo.CONTENT_ALPHA, None))
+    ctx.scale(font.em_size[0] * 1e-3, -font.em_size[1] * 1e-3)
+    font.harfbuzz_font.draw_glyph(index, hb_cairo_drawfuncs, ctx)
+    ctx.identity_matrix()
+    return ctx.copy_path()
+
+
 def fill_glyphs_at(ctx: cairo.Context, x: float, y: float, glyphs: Iterable[Glyph], font: Font):
+    """
+    Fill the outlines of glyphs starting at (x, y). Outlines are drawn once per font and glyph
+    and then cached as cairo paths so that each glyph only costs a translation and an
+    append_path() call. The whole run is filled at once.
+
+    """
     ctx.save()
     ctx.set_fill_rule(cairo.FILL_RULE_WINDING)
-    for glyph in glyphs:
-        glyph_at(ctx, x, y, glyph, font)
-        x += glyph.x_advance
-        y += glyph.y_advance
-        ctx.fill()
+    ctx.new_path()
+    for index, x_offset, y_offset, x_advance, y_advance in _glyph_positions(glyphs):
+        path = _glyph_path(font, index)
+        ctx.save()
+        ctx.translate(x + x_offset, y + y_offset)
+        ctx.append_path(path)
+        ctx.restore()
+        x += x_advance
+        y += y_advance
+    ctx.fill()
+    ctx.restore()
+
+
+# Glyph outlines are drawn as given by the font so that they match those of fill_glyphs_at().
+_font_options = cairo.FontOptions()
+_font_options.set_hint_style(cairo.HINT_STYLE_NONE)
+_font_options.set_hint_metrics(cairo.HINT_METRICS_OFF)
+
+
+def _cairo_font_face(ctx: cairo.Context, font: Font) -> cairo.FontFace:
+    return _cairocache.font_face(font, functools.partial(_create_cairo_font_face, ctx))
+
+
+def _create_cairo_font_face(ctx: cairo.Context, font: Font) -> cairo.FontFace:
+    import freetype
+
+    from ._cairofontface import create_cairo_font_face_for_ft_face
+
+    try:
+        ft_face = freetype.Face(font.path, index=font.face_index)
+    except freetype.FT_Exception as e:
+        # E.g. a format FreeType does not support. FreeType errors are not OSErrors.
+        raise OSError(f"FreeType cannot load {font.path!r}: {e}") from e
+    return create_cairo_font_face_for_ft_face(ctx, ft_face)
+
+
+def show_glyphs_at(ctx: cairo.Context, x: float, y: float, glyphs: Iterable[Glyph], font: Font):
+    """
+    Draw glyphs starting at (x, y) with a single cairo show_glyphs() call using a FreeType font
+    face for the font. This leaves rasterising and caching glyphs to cairo and is much faster
+    than fill_glyphs_at(). If a FreeType font face cannot be created, e.g. because cairo was
+    built without FreeType support, glyphs are drawn by fill_glyphs_at() instead.
+
+    """
+    try:
+        font_face = _cairo_font_face(ctx, font)
+    except (ImportError, OSError, RuntimeError):
+        fill_glyphs_at(ctx, x, y, glyphs, font)
+        return
+
+    cairo_glyphs = []
+    for index, x_offset, y_offset, x_advance, y_advance in _glyph_positions(glyphs):
+        cairo_glyphs.append(cairo.Glyph(index, x + x_offset, y + y_offset))
+        x += x_advance
+        y += y_advance
+
+    ctx.save()
+    ctx.set_font_face(font_face)
+    ctx.set_font_matrix(cairo.Matrix(xx=font.em_size[0], yy=font.em_size[1]))
+    ctx.set_font_options(_font_options)
+    ctx.show_glyphs(cairo_glyphs)
     ctx.restore()
+
+
+def draw_line_layout_at(
+    ctx: cairo.Context,
+    x: float,
+    y: float,
+    layout: LineLayout,
+    font: Font,
+    line_height: float,
+    *,
+    draw_glyphs: Callable[[cairo.Context, float, float, GlyphRun, Font], None] = fill_glyphs_at,
+):
+    """
+    Draw the lines of layout with the first baseline starting at (x, y) and each following
+    baseline line_height below. Each box is shaped and drawn by draw_glyphs, e.g.
+    fill_glyphs_at() or show_glyphs_at(), at its position in the layout.
+
+    """
+    for line_idx in range(len(layout.lines)):
+        for position, text in layout.boxes(line_idx):
+            draw_glyphs(ctx, x + position, y, font.shape(text), font)
+        y += line_height
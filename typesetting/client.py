@@ -0,0 +1,148 @@
+import itertools
+import socket
+from typing import TYPE_CHECKING, Any, Iterable, Literal, NamedTuple, Optional, Union
+
+from ._protocol import Message, encode_message, recv_message
+
+if TYPE_CHECKING:
+    from .layout import OptimiserParameters
+
+__all__ = ["LayoutClient", "LayoutResult", "LayoutServerError"]
+
+
+class LayoutServerError(Exception):
+    "Error reported by a layout server for a request."
+
+
+class LayoutResult(NamedTuple):
+    "Line breaks for a paragraph broken by a layout server. See BrokenParagraph."
+    break_idxs: list[int]
+    passes: int
+
+
+class LayoutClient:
+    """
+    Blocking client for a LayoutServer listening on a Unix socket at path or on host and port.
+    The client only imports the standard library and so starts quickly.
+
+    Each request is a message with the paragraph's text, the font's path, em size, features and
+    language, the width, the engine, the fields of OptimiserParameters which differ from the
+    defaults and, optionally, the language of the hyphenator and the pretolerance. See
+    break_paragraph(). The response holds the indices of the breaks in the paragraph items and
+    the number of passes made.
+
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        *,
+        host: str = "127.0.0.1",
+        port: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        if (path is None) == (port is None):
+            raise ValueError("exactly one of path and port must be given")
+        if path is not None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address: Any = path
+        else:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            address = (host, port)
+        self._sock.settimeout(timeout)
+        self._sock.connect(address)
+        self._ids = itertools.count()
+
+    def break_paragraph(
+        self,
+        text: str,
+        font_path: str,
+        em_size: Union[float, tuple[float, float]],
+        width: float,
+        **options: Any,
+    ) -> LayoutResult:
+        "Break a paragraph. options are as for break_paragraphs()."
+        return self.break_paragraphs([text], font_path, em_size, width, **options)[0]
+
+    def break_paragraphs(
+        self,
+        texts: Iterable[str],
+        font_path: str,
+        em_size: Union[float, tuple[float, float]],
+        width: float,
+        *,
+        features: Iterable[str] = (),
+        language: str = "en",
+        engine: Literal["optimal", "greedy"] = "optimal",
+        params: Optional["OptimiserParameters"] = None,
+        hyphenation_language: Optional[str] = None,
+        pretolerance: Optional[float] = None,
+    ) -> list[LayoutResult]:
+        """
+        Break each paragraph of texts. All requests are sent before any response is read so that
+        the server can break them as a batch. Raise LayoutServerError if any request fails.
+
+        """
+        request: Message = {
+            "font": font_path,
+            "em_size": em_size,
+            "width": width,
+            "engine": engine,
+        }
+        if tuple(features) != ():
+            request["features"] = list(features)
+        if language != "en":
+            request["language"] = language
+        if params is not None:
+            defaults = type(params)()
+            request["params"] = {
+                name: value
+                for name, value in params._asdict().items()
+                if value != getattr(defaults, name)
+            }
+        if hyphenation_language is not None:
+            request["hyphenation_language"] = hyphenation_language
+        if pretolerance is not None:
+            request["pretolerance"] = pretolerance
+
+        request_ids = []
+        messages = []
+        for text in texts:
+            request_id = next(self._ids)
+            request_ids.append(request_id)
+            messages.append(encode_message({"id": request_id, "text": text, **request}))
+        self._sock.sendall(b"".join(messages))
+
+        responses = self._receive(request_ids)
+        return [
+            LayoutResult(break_idxs=response["break_idxs"], passes=response["passes"])
+            for response in responses
+        ]
+
+    def metrics(self) -> dict[str, Any]:
+        "Return the server's metrics as the fields of LayoutServerMetrics."
+        request_id = next(self._ids)
+        self._sock.sendall(encode_message({"id": request_id, "type": "metrics"}))
+        return self._receive([request_id])[0]["metrics"]
+
+    def close(self):
+        self._sock.close()
+
+    def __enter__(self) -> "LayoutClient":
+        return self
+
+    def __exit__(self, *exc_info: Any):
+        self.close()
+
+    def _receive(self, request_ids: list[int]) -> list[Message]:
+        # Responses may arrive in any order. All are read, even if one is an error, so that the
+        # connection is left ready for the next request.
+        responses: dict[int, Message] = {}
+        while len(responses) < len(request_ids):
+            response = recv_message(self._sock)
+            responses[response["id"]] = response
+        for response in responses.values():
+            if "error" in response:
+                raise LayoutServerError(response["error"])
+        return [responses[request_id] for request_id in request_ids]
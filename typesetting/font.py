@@ -1,11 +1,32 @@
+import array
+import bisect
 import dataclasses
+import functools
+import itertools
+import operator
+import os
+import threading
 import typing
-from collections.abc import Generator
+from collections.abc import Iterator
 
 import uharfbuzz as hb
-import uniseg.graphemecluster
 
-__all__ = ["Font", "Glyph"]
+from ._lru import LRUCache
+
+__all__ = ["Font", "FontRegistry", "Glyph", "GlyphRun", "ShapeCacheInfo"]
+
+# Text shaped to warm up a font. Shaping loads the character map, glyph metrics and layout
+# tables and pages in the parts of the font file they occupy.
+_WARM_UP_TEXT = "Hamburgefonstiv HAMBURGEFONSTIV 0123456789 fi fl \N{EM DASH}"
+
+
+class ShapeCacheInfo(typing.NamedTuple):
+    "Statistics for the shaping cache of a Font."
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
 
 
 @dataclasses.dataclass(frozen=True)
@@ -13,6 +34,10 @@ class Font:
     """
     Representation of a given font backed by a FreeType face.
 
+    If registry is passed, the HarfBuzz face is shared with all other fonts created from the same
+    file and face index with that registry. Otherwise the font file is loaded for this font
+    alone.
+
     """
 
     path: str
@@ -20,46 +45,268 @@ class Font:
     dpi: tuple[int, int] = (72, 72)
     features: typing.Sequence[str] = ()
     language: str = "en"
+
+    # Maximum number of shaping results to cache. The cache is disabled if this is zero.
+    shape_cache_size: int = 0
+
+    # Index of the face within the font file, e.g. for TrueType collections.
+    face_index: int = 0
+
+    registry: typing.Optional["FontRegistry"] = dataclasses.field(
+        default=None, repr=False, compare=False
+    )
+
     harfbuzz_font: hb.Font = dataclasses.field(init=False)
+    _shape_cache: typing.Optional[LRUCache["GlyphRun"]] = dataclasses.field(
+        init=False, repr=False, compare=False
+    )
 
     def __post_init__(self):
-        blob = hb.Blob.from_file_path(self.path)
-        face = hb.Face(blob)
+        object.__setattr__(
+            self,
+            "_shape_cache",
+            LRUCache(self.shape_cache_size) if self.shape_cache_size > 0 else None,
+        )
+        if self.registry is not None:
+            face = self.registry.face(self.path, self.face_index)
+        else:
+            face = hb.Face(hb.Blob.from_file_path(self.path), self.face_index)
         object.__setattr__(self, "harfbuzz_font", hb.Font(face))
         self.harfbuzz_font.ptem = self.em_size[1]
         self.harfbuzz_font.ppem = tuple(self.em_size[i] * self.dpi[i] / 72.0 for i in range(2))
 
-    def shape(self, text: str) -> Generator["Glyph", None, None]:
-        # Split text into grapheme clusters.
-        clusters_by_idx, cluster_code_point_indices_by_idx = {}, {}
-        idx, cp_idx = 0, 0
-        for cluster in uniseg.graphemecluster.grapheme_clusters(text):
-            clusters_by_idx[idx] = cluster
-            cluster_code_point_indices_by_idx[idx] = cp_idx
-            idx += len(cluster.encode("utf8"))
-            cp_idx += len(cluster)
+    def __reduce__(self):
+        # The HarfBuzz font cannot be pickled and so is re-created from the font's parameters.
+        # The registry is not pickled and so the unpickled font loads the font file itself.
+        return (
+            Font,
+            (
+                self.path,
+                self.em_size,
+                self.dpi,
+                tuple(self.features),
+                self.language,
+                self.shape_cache_size,
+                self.face_index,
+            ),
+        )
+
+    def shape_cache_info(self) -> ShapeCacheInfo:
+        "Return statistics for the shaping cache."
+        if self._shape_cache is None:
+            return ShapeCacheInfo(hits=0, misses=0, evictions=0, size=0, max_size=0)
+        return ShapeCacheInfo(*self._shape_cache.info())
+
+    def clear_shape_cache(self):
+        "Remove all entries from the shaping cache and reset its statistics."
+        if self._shape_cache is not None:
+            self._shape_cache.clear()
 
+    def shape(self, text: str) -> "GlyphRun":
+        if self._shape_cache is None:
+            return self._shape(text)
+
+        # Features and language are fixed for a font and so results are keyed by text alone.
+        glyph_run = self._shape_cache.get(text)
+        if glyph_run is None:
+            glyph_run = self._shape(text)
+            self._shape_cache.put(text, glyph_run)
+        return glyph_run
+
+    def _shape(self, text: str) -> "GlyphRun":
+        # Add text by code point so that glyph clusters are code point indices.
         buf = hb.Buffer()
-        buf.add_str(text)
+        buf.add_codepoints([ord(c) for c in text])
         buf.guess_segment_properties()
 
         hb.shape(self.harfbuzz_font, buf, {f: True for f in self.features})
+        glyph_run = GlyphRun(text)
         infos = buf.glyph_infos
         positions = buf.glyph_positions
         if infos is None or positions is None:
-            return
+            return glyph_run
 
         upem_scale = 1.0 / self.harfbuzz_font.face.upem
         for info, pos in zip(infos, positions):
-            yield Glyph(
-                index=info.codepoint,
-                cluster=clusters_by_idx[info.cluster],
-                cluster_code_point_index=cluster_code_point_indices_by_idx[info.cluster],
-                x_advance=pos.x_advance * upem_scale * self.em_size[0],
-                y_advance=pos.y_advance * upem_scale * self.em_size[1],
-                x_offset=pos.x_offset * upem_scale * self.em_size[0],
-                y_offset=pos.y_offset * upem_scale * self.em_size[1],
+            glyph_run.indices.append(info.codepoint)
+            glyph_run.clusters.append(info.cluster)
+            glyph_run.x_advances.append(pos.x_advance * upem_scale * self.em_size[0])
+            glyph_run.y_advances.append(pos.y_advance * upem_scale * self.em_size[1])
+            glyph_run.x_offsets.append(pos.x_offset * upem_scale * self.em_size[0])
+            glyph_run.y_offsets.append(pos.y_offset * upem_scale * self.em_size[1])
+            glyph_run.unsafe_to_break.append(info.flags & hb.GlyphFlags.UNSAFE_TO_BREAK != 0)
+        return glyph_run
+
+
+class FontRegistry:
+    """
+    Registry of font files shared between fonts. Each font file is loaded once, memory-mapped by
+    HarfBuzz rather than read, and one HarfBuzz face is kept for each file and face index. Fonts
+    returned by font() are lightweight views of the shared face with their own size, features
+    and shaping cache.
+
+    """
+
+    def __init__(self):
+        self._faces: dict[tuple[str, int], hb.Face] = {}
+        self._lock = threading.Lock()
+
+    def face(self, path: str, face_index: int = 0, *, warm_up: bool = False) -> hb.Face:
+        """
+        Return the shared HarfBuzz face for a font file, loading it if needed. If warm_up is
+        True and the face is loaded, text is shaped with the face so that later shaping does not
+        pay for loading tables.
+
+        """
+        key = (os.path.realpath(path), face_index)
+        with self._lock:
+            face = self._faces.get(key)
+            loaded = face is None
+            if face is None:
+                face = hb.Face(hb.Blob.from_file_path(path), face_index)
+                self._faces[key] = face
+        if warm_up and loaded:
+            buf = hb.Buffer()
+            buf.add_str(_WARM_UP_TEXT)
+            buf.guess_segment_properties()
+            hb.shape(hb.Font(face), buf)
+        return face
+
+    def font(
+        self,
+        path: str,
+        em_size: tuple[float, float],
+        *,
+        dpi: tuple[int, int] = (72, 72),
+        features: typing.Sequence[str] = (),
+        language: str = "en",
+        shape_cache_size: int = 0,
+        face_index: int = 0,
+        warm_up: bool = False,
+    ) -> "Font":
+        "Return a font sharing this registry's face for path. See Font for the parameters."
+        self.face(path, face_index, warm_up=warm_up)
+        return Font(
+            path,
+            em_size,
+            dpi=dpi,
+            features=features,
+            language=language,
+            shape_cache_size=shape_cache_size,
+            face_index=face_index,
+            registry=self,
+        )
+
+    def __len__(self) -> int:
+        "Return the number of faces loaded."
+        return len(self._faces)
+
+    def clear(self):
+        "Forget all loaded faces. Fonts already created keep their faces."
+        with self._lock:
+            self._faces.clear()
+
+
+class GlyphRun:
+    """
+    Sequence of glyphs resulting from shaping text. Glyph properties are held in parallel typed
+    arrays indexed by glyph. Clusters are recorded as the code point index of the start of the
+    cluster within text and cluster text is only resolved when Glyph instances are requested.
+
+    Iterating or indexing yields Glyph instances. GlyphRuns may be shared via the shaping cache
+    and so should not be modified once created.
+
+    """
+
+    __slots__ = (
+        "text",
+        "indices",
+        "clusters",
+        "x_advances",
+        "y_advances",
+        "x_offsets",
+        "y_offsets",
+        "unsafe_to_break",
+        "_total_advance",
+        "_grapheme_starts",
+    )
+
+    def __init__(self, text: str):
+        self.text = text
+        self.indices = array.array("I")
+        self.clusters = array.array("I")
+
+        # {x,y}_{advances,offsets} are in device units
+        self.x_advances = array.array("d")
+        self.y_advances = array.array("d")
+        self.x_offsets = array.array("d")
+        self.y_offsets = array.array("d")
+
+        self.unsafe_to_break = array.array("B")
+        self._total_advance: typing.Optional[float] = None
+        self._grapheme_starts: typing.Optional[list[int]] = None
+
+    @property
+    def total_advance(self) -> float:
+        "Sum of x advances of all glyphs."
+        # Advances are summed in order rather than with sum(), which may compensate for rounding
+        # error, so that running sums of advances agree exactly with the total.
+        if self._total_advance is None:
+            self._total_advance = functools.reduce(operator.add, self.x_advances, 0.0)
+        return self._total_advance
+
+    def cluster_text(self, glyph_idx: int) -> str:
+        "Return the grapheme cluster of text which starts at the given glyph's cluster."
+        if self._grapheme_starts is None:
+            import uniseg.graphemecluster
+
+            self._grapheme_starts = list(
+                itertools.accumulate(
+                    (len(c) for c in uniseg.graphemecluster.grapheme_clusters(self.text)),
+                    initial=0,
+                )
             )
+        start = self.clusters[glyph_idx]
+        end_idx = bisect.bisect_right(self._grapheme_starts, start)
+        end = self._grapheme_starts[end_idx] if end_idx < len(self._grapheme_starts) else None
+        return self.text[start:end]
+
+    def cluster_slice(self, start: int, end: int) -> "GlyphRun":
+        "Return a GlyphRun of the glyphs whose clusters start within text[start:end]."
+        glyph_run = GlyphRun(self.text)
+        for glyph_idx, cluster in enumerate(self.clusters):
+            if start <= cluster < end:
+                glyph_run.indices.append(self.indices[glyph_idx])
+                glyph_run.clusters.append(cluster)
+                glyph_run.x_advances.append(self.x_advances[glyph_idx])
+                glyph_run.y_advances.append(self.y_advances[glyph_idx])
+                glyph_run.x_offsets.append(self.x_offsets[glyph_idx])
+                glyph_run.y_offsets.append(self.y_offsets[glyph_idx])
+                glyph_run.unsafe_to_break.append(self.unsafe_to_break[glyph_idx])
+        return glyph_run
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def __getitem__(self, glyph_idx: int) -> "Glyph":
+        if glyph_idx < 0:
+            glyph_idx += len(self)
+        if glyph_idx < 0 or glyph_idx >= len(self):
+            raise IndexError("glyph index out of range")
+        return Glyph(
+            index=self.indices[glyph_idx],
+            cluster=self.cluster_text(glyph_idx),
+            cluster_code_point_index=self.clusters[glyph_idx],
+            x_advance=self.x_advances[glyph_idx],
+            y_advance=self.y_advances[glyph_idx],
+            x_offset=self.x_offsets[glyph_idx],
+            y_offset=self.y_offsets[glyph_idx],
+            unsafe_to_break=bool(self.unsafe_to_break[glyph_idx]),
+        )
+
+    def __iter__(self) -> Iterator["Glyph"]:
+        for glyph_idx in range(len(self)):
+            yield self[glyph_idx]
 
 
 @dataclasses.dataclass(frozen=True)
@@ -73,3 +320,6 @@ class Glyph:
     y_advance: float
     x_offset: float
     y_offset: float
+
+    # Set if re-shaping text broken at the start of this glyph's cluster could change it.
+    unsafe_to_break: bool = False
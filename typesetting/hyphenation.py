@@ -1,18 +1,344 @@
-import hyphen
-import uniseg.wordbreak
+import array
+import bisect
+import functools
+import hashlib
+import mmap
+from typing import Optional, Sequence, Union
 
-__all__ = ["hyphenate"]
+from ._lru import LRUCache, LRUCacheInfo
+
+__all__ = ["hyphenate", "Hyphenator", "HyphenationPatterns"]
 
 SOFT_HYPHEN = "\N{SOFT HYPHEN}"
 
+# Number of hyphenated words cached for all hyphenators.
+DEFAULT_CACHE_SIZE = 65536
 
-def hyphenate(text: str):
-    hyphenator = hyphen.Hyphenator()
-    words = []
-    for word in uniseg.wordbreak.words(text):
-        syllables = hyphenator.syllables(word) if len(word) < 100 else [word]
-        if "".join(syllables) == word:
-            words.append(SOFT_HYPHEN.join(syllables))
+# Number of hyphenators kept by Hyphenator.for_language().
+LANGUAGE_CACHE_SIZE = 8
+
+# Hyphenated words keyed by the cache_key of the hyphenator and the word. The cache holds no
+# references to hyphenators and words are shared by hyphenators with the same patterns.
+_hyphenated_words: LRUCache[str] = LRUCache(DEFAULT_CACHE_SIZE)
+
+_language_hyphenators: LRUCache["Hyphenator"] = LRUCache(LANGUAGE_CACHE_SIZE)
+
+
+def hyphenate(text: str, language: str = "en_US"):
+    return Hyphenator.for_language(language).hyphenate(text)
+
+
+class Hyphenator:
+    """
+    Hyphenator for a single language. The hyphenation dictionary is loaded once when the
+    hyphenator is created and hyphenated words are kept in a bounded least recently used cache
+    shared by all hyphenators.
+
+    By default the dictionary is loaded via pyhyphen. If patterns is passed, hyphenation uses
+    those precompiled patterns instead.
+
+    """
+
+    def __init__(
+        self,
+        language: str = "en_US",
+        *,
+        patterns: Optional["HyphenationPatterns"] = None,
+    ):
+        # Imported here so that importing this module does not load pyhyphen or uniseg's data.
+        import uniseg.wordbreak
+
+        self.language = language
+        self._patterns = patterns
+        self._words = uniseg.wordbreak.words
+        if patterns is not None:
+            self._syllables = patterns.syllables
+            patterns_digest = patterns.digest()
         else:
-            words.append(word)
-    return "".join(words)
+            import hyphen
+
+            self._syllables = hyphen.Hyphenator(language).syllables
+            patterns_digest = _pyhyphen_patterns_version()
+        self._cache_key = f"{language}:{patterns_digest}"
+
+    def __reduce__(self):
+        return (functools.partial(Hyphenator, patterns=self._patterns), (self.language,))
+
+    @staticmethod
+    def for_language(language: str) -> "Hyphenator":
+        """
+        Return a hyphenator for language shared with other callers. Hyphenators for the
+        LANGUAGE_CACHE_SIZE most recently used languages are kept.
+
+        """
+        hyphenator = _language_hyphenators.get(language)
+        if hyphenator is None:
+            hyphenator = Hyphenator(language)
+            _language_hyphenators.put(language, hyphenator)
+        return hyphenator
+
+    @property
+    def cache_key(self) -> str:
+        "String identifying the language and patterns, and so the hyphenation, of this hyphenator."
+        return self._cache_key
+
+    @staticmethod
+    def language_cache_key(language: str) -> str:
+        "Return the cache_key of Hyphenator(language) without loading its dictionary."
+        return f"{language}:{_pyhyphen_patterns_version()}"
+
+    def syllables(self, word: str) -> list[str]:
+        return self._syllables(word)
+
+    def hyphenate(self, text: str) -> str:
+        "Return text with soft hyphens inserted at hyphenation points."
+        return "".join(self._hyphenate_word(word) for word in self._words(text))
+
+    @staticmethod
+    def cache_info() -> LRUCacheInfo:
+        "Return statistics for the cache of hyphenated words shared by all hyphenators."
+        return _hyphenated_words.info()
+
+    @staticmethod
+    def cache_clear():
+        "Remove all words from the cache of hyphenated words shared by all hyphenators."
+        _hyphenated_words.clear()
+
+    def _hyphenate_word(self, word: str) -> str:
+        key = (self._cache_key, word)
+        hyphenated = _hyphenated_words.get(key)
+        if hyphenated is None:
+            hyphenated = self._uncached_hyphenate_word(word)
+            _hyphenated_words.put(key, hyphenated)
+        return hyphenated
+
+    def _uncached_hyphenate_word(self, word: str) -> str:
+        syllables = self._syllables(word) if len(word) < 100 else [word]
+        if "".join(syllables) == word:
+            return SOFT_HYPHEN.join(syllables)
+        return word
+
+
+def _pyhyphen_patterns_version() -> str:
+    # pyhyphen's dictionaries are those distributed with its version.
+    import hyphen
+
+    return f"pyhyphen-{hyphen.__version__}"
+
+
+# Header of compiled pattern files: magic number, which also identifies byte order, and version.
+_PATTERNS_MAGIC = 0x4B504854
+_PATTERNS_VERSION = 1
+_PATTERNS_HEADER_LENGTH = 7
+
+_UInt32Sequence = Union[Sequence[int], memoryview]
+
+
+class HyphenationPatterns:
+    """
+    Liang hyphenation patterns compiled to a trie held in flat arrays of 32-bit integers. Patterns
+    can be compiled from a libhyphen ".dic" file, saved and then loaded from a memory-mapped file
+    without parsing.
+
+    Hyphenation follows pyhyphen's Hyphenator.syllables() for standard patterns. Non-standard
+    hyphenation patterns and compound word patterns are not supported.
+
+    """
+
+    def __init__(
+        self,
+        left_min: int,
+        right_min: int,
+        node_edge_starts: _UInt32Sequence,
+        node_edge_counts: _UInt32Sequence,
+        node_value_starts: _UInt32Sequence,
+        node_value_lengths: _UInt32Sequence,
+        edge_chars: _UInt32Sequence,
+        edge_targets: _UInt32Sequence,
+        values: _UInt32Sequence,
+    ):
+        # Minimum number of characters before the first and after the last hyphenation point.
+        self.left_min = left_min
+        self.right_min = right_min
+
+        # Node 0 is the root of the trie. The edges from each node are sorted by character.
+        self._node_edge_starts = node_edge_starts
+        self._node_edge_counts = node_edge_counts
+        self._node_value_starts = node_value_starts
+        self._node_value_lengths = node_value_lengths
+        self._edge_chars = edge_chars
+        self._edge_targets = edge_targets
+        self._values = values
+
+    def __reduce__(self):
+        # Sections may be views of a memory-mapped file and so are pickled as copies.
+        return (
+            HyphenationPatterns,
+            (
+                self.left_min,
+                self.right_min,
+                *(array.array("I", section) for section in self._sections()[1:]),
+            ),
+        )
+
+    @classmethod
+    def from_dic(
+        cls, path: str, *, left_min: int = 2, right_min: int = 2
+    ) -> "HyphenationPatterns":
+        """
+        Compile patterns from a libhyphen dictionary. As with libhyphen, left_min and right_min
+        are raised to LEFTHYPHENMIN and RIGHTHYPHENMIN if the dictionary specifies larger values.
+
+        """
+        with open(path, "rb") as f:
+            encoding = f.readline().decode("ascii").strip().removeprefix("microsoft-")
+            lines = f.read().decode(encoding).splitlines()
+
+        # Parse patterns into a trie of nested dicts. The values for a pattern are stored under
+        # the None key.
+        trie: dict = {}
+        for line in lines:
+            line = line.strip()
+            if line == "" or line.startswith("%"):
+                continue
+            keyword, _, argument = line.partition(" ")
+            if keyword == "LEFTHYPHENMIN":
+                left_min = max(left_min, int(argument))
+                continue
+            elif keyword == "RIGHTHYPHENMIN":
+                right_min = max(right_min, int(argument))
+                continue
+            elif keyword.isupper() or "/" in line:
+                # Other keywords and non-standard patterns are not supported.
+                continue
+
+            letters, values = [], [0]
+            for c in line:
+                if c.isdigit():
+                    values[-1] = int(c)
+                else:
+                    letters.append(c)
+                    values.append(0)
+            node = trie
+            for c in letters:
+                node = node.setdefault(c, {})
+            node[None] = values
+
+        # Flatten the trie in breadth-first order.
+        node_edge_starts, node_edge_counts = array.array("I"), array.array("I")
+        node_value_starts, node_value_lengths = array.array("I"), array.array("I")
+        edge_chars, edge_targets, all_values = array.array("I"), array.array("I"), array.array("I")
+        nodes = [trie]
+        for node in nodes:
+            node_values = node.get(None, [])
+            node_value_starts.append(len(all_values))
+            node_value_lengths.append(len(node_values))
+            all_values.extend(node_values)
+
+            children = sorted((c, child) for c, child in node.items() if c is not None)
+            node_edge_starts.append(len(edge_chars))
+            node_edge_counts.append(len(children))
+            for c, child in children:
+                edge_chars.append(ord(c))
+                edge_targets.append(len(nodes))
+                nodes.append(child)
+
+        return cls(
+            left_min,
+            right_min,
+            node_edge_starts,
+            node_edge_counts,
+            node_value_starts,
+            node_value_lengths,
+            edge_chars,
+            edge_targets,
+            all_values,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "HyphenationPatterns":
+        "Load patterns saved by save(). The file is memory-mapped rather than read."
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        words = memoryview(mapped).cast("I")
+        if words[0] != _PATTERNS_MAGIC or words[1] != _PATTERNS_VERSION:
+            raise ValueError(f"{path!r} is not a compiled hyphenation patterns file")
+        left_min, right_min, n_nodes, n_edges, n_values = words[2:_PATTERNS_HEADER_LENGTH]
+
+        sections, offset = [], _PATTERNS_HEADER_LENGTH
+        for length in (n_nodes, n_nodes, n_nodes, n_nodes, n_edges, n_edges, n_values):
+            sections.append(words[offset : offset + length])
+            offset += length
+        return cls(left_min, right_min, *sections)
+
+    def digest(self) -> str:
+        "Return a hex digest of the compiled patterns."
+        hash = hashlib.sha256()
+        for section in self._sections():
+            hash.update(array.array("I", section).tobytes())
+        return hash.hexdigest()
+
+    def _sections(self) -> list[_UInt32Sequence]:
+        header = array.array(
+            "I",
+            [
+                _PATTERNS_MAGIC,
+                _PATTERNS_VERSION,
+                self.left_min,
+                self.right_min,
+                len(self._node_edge_starts),
+                len(self._edge_chars),
+                len(self._values),
+            ],
+        )
+        return [
+            header,
+            self._node_edge_starts,
+            self._node_edge_counts,
+            self._node_value_starts,
+            self._node_value_lengths,
+            self._edge_chars,
+            self._edge_targets,
+            self._values,
+        ]
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            for section in self._sections():
+                f.write(array.array("I", section).tobytes())
+
+    def syllables(self, word: str) -> list[str]:
+        "Split word at hyphenation points."
+        if len(word) < 4 or "=" in word:
+            return []
+
+        # As with pyhyphen, patterns are matched against all upper case words in lower case but
+        # are otherwise matched as given.
+        match_word = "." + (word.lower() if word.isupper() else word) + "."
+
+        # Find the maximum pattern value at each inter-letter position of match_word.
+        points = [0] * (len(match_word) + 1)
+        for start in range(len(match_word)):
+            node = 0
+            for c in match_word[start:]:
+                edge_start = self._node_edge_starts[node]
+                edge_end = edge_start + self._node_edge_counts[node]
+                edge_idx = bisect.bisect_left(self._edge_chars, ord(c), edge_start, edge_end)
+                if edge_idx == edge_end or self._edge_chars[edge_idx] != ord(c):
+                    break
+                node = self._edge_targets[edge_idx]
+
+                value_start = self._node_value_starts[node]
+                for offset in range(self._node_value_lengths[node]):
+                    value = self._values[value_start + offset]
+                    if value > points[start + offset]:
+                        points[start + offset] = value
+
+        # Odd values mark hyphenation points. points[idx + 1] is the value before word[idx].
+        syllables, syllable_start = [], 0
+        for idx in range(self.left_min, len(word) - self.right_min + 1):
+            if points[idx + 1] % 2 == 1:
+                syllables.append(word[syllable_start:idx])
+                syllable_start = idx
+        syllables.append(word[syllable_start:])
+        return syllables
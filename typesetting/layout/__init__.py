@@ -1,3 +1,39 @@
-from ._greedy import *  # noqa: F401, F403
-from ._optimal import *  # noqa: F401, F403
-from ._types import *  # noqa: F401, F403
+from typing import TYPE_CHECKING
+
+from .._lazy import lazy_exports
+
+# Submodules are imported on first access to one of their names.
+__all__, __getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "_greedy": ["greedy_line_breaks", "greedy_line_breaks_batch"],
+        "_incremental": ["IncrementalParagraph"],
+        "_line_layout": ["Line", "LineLayout", "greedy_line_layout", "optimal_line_layout"],
+        "_memo": ["LineBreakCache", "LineBreakCacheInfo"],
+        "_monotone": ["MonotoneLineBreaks", "monotone_line_breaks"],
+        "_optimal": [
+            "BreakStats",
+            "BreakTraceEntry",
+            "OptimiserParameters",
+            "PreparedParagraph",
+            "line_adjustment_ratios",
+            "optimal_line_breaks",
+        ],
+        "_types": [
+            "ParagraphItemType",
+            "ParagraphItem",
+            "ParagraphItems",
+            "text_to_paragraph_items",
+            "MAX_PENALTY",
+        ],
+    },
+)
+
+if TYPE_CHECKING:
+    from ._greedy import *  # noqa: F401, F403
+    from ._incremental import *  # noqa: F401, F403
+    from ._line_layout import *  # noqa: F401, F403
+    from ._memo import *  # noqa: F401, F403
+    from ._monotone import *  # noqa: F401, F403
+    from ._optimal import *  # noqa: F401, F403
+    from ._types import *  # noqa: F401, F403
@@ -1,41 +1,235 @@
-from typing import Generator, Iterable
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Generator,
+    Iterable,
+    Optional,
+    Sequence,
+    Union,
+)
 
-from ._types import MAX_PENALTY, ParagraphItem, ParagraphItemType
+from ._optimal import BreakPoint, OptimiserParameters, PreparedParagraph
+from ._types import (
+    MAX_PENALTY,
+    ParagraphItem,
+    ParagraphItems,
+    ParagraphItemType,
+    as_paragraph_items,
+)
 
-__all__ = ["greedy_line_breaks"]
+if TYPE_CHECKING:
+    from ._line_layout import Line
+
+__all__ = ["greedy_line_breaks", "greedy_line_breaks_batch"]
 
 
 def greedy_line_breaks(
-    para_items: Iterable[ParagraphItem], width: float
+    para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+    width: float,
+    *,
+    streaming: bool = False,
+    vectorized: bool = False,
+    lines: Optional[list["Line"]] = None,
+    params: Optional[OptimiserParameters] = None,
+) -> Generator[int, None, None]:
+    """
+    Return sequence of indices in para_items for line breaks.
+
+    If streaming is True, para_items is consumed in a single pass and each break is yielded as
+    soon as the following potential break is seen. Memory use does not grow with the length of
+    para_items which may be unbounded.
+
+    If vectorized is True, the end of each line is found by a binary search over running widths
+    computed with NumPy. This is faster for long paragraphs. See also greedy_line_breaks_batch().
+
+    If lines is a list, a Line describing how each line is set is appended to it as the line is
+    broken. params are only used to score those lines. Overfull lines are scored as if their
+    adjustment ratio were -1. Lines are not supported by the streaming or vectorized engines.
+
+    """
+    # Arguments are checked here, rather than in the generator, so that errors are raised when
+    # greedy_line_breaks() is called.
+    if streaming and vectorized:
+        raise ValueError("streaming and vectorized cannot be used together")
+    if lines is not None and (streaming or vectorized):
+        raise ValueError("lines are not supported by the streaming or vectorized engines")
+    return _greedy_line_breaks(para_items, width, streaming, vectorized, lines, params)
+
+
+def _greedy_line_breaks(
+    para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+    width: float,
+    streaming: bool,
+    vectorized: bool,
+    lines: Optional[list["Line"]],
+    params: Optional[OptimiserParameters],
 ) -> Generator[int, None, None]:
-    "Return sequence of indices in para_items for line breaks."
-    feasible_break_idx_and_items = []
+    if lines is not None:
+        from ._line_layout import GreedyLineRecorder
+
+        if not isinstance(para_items, PreparedParagraph):
+            para_items = PreparedParagraph(para_items)
+        recorder = GreedyLineRecorder(
+            para_items.items,
+            width,
+            params if params is not None else OptimiserParameters(),
+            lines,
+        )
+        yield from _prepared_greedy_line_breaks(para_items, width, recorder.add)
+        return
+    if isinstance(para_items, PreparedParagraph):
+        if streaming or vectorized:
+            para_items = para_items.items
+        else:
+            yield from _prepared_greedy_line_breaks(para_items, width)
+            return
+    if streaming:
+        yield from _streaming_greedy_line_breaks(para_items, width)
+        return
+    if vectorized:
+        from ._greedy_numpy import vectorized_greedy_line_breaks
+
+        yield from vectorized_greedy_line_breaks([as_paragraph_items(para_items)], [width])[0]
+        return
+
+    items = as_paragraph_items(para_items)
+    glue, penalty = ParagraphItemType.GLUE.value, ParagraphItemType.PENALTY.value
+    box = ParagraphItemType.BOX.value
+
+    feasible_break_idxs = []
     prev_was_box = False
     sum_widths = [0.0]
-    for item_idx, item in enumerate(para_items):
-        if item.item_type != ParagraphItemType.PENALTY:
-            sum_widths.append(sum_widths[-1] + item.width)
+    for item_idx, (item_type, item_width, item_penalty) in enumerate(
+        zip(items.item_types, items.widths, items.penalties)
+    ):
+        if item_type != penalty:
+            sum_widths.append(sum_widths[-1] + item_width)
         else:
             sum_widths.append(sum_widths[-1])
 
-        if item.item_type == ParagraphItemType.PENALTY and item.penalty < MAX_PENALTY:
-            feasible_break_idx_and_items.append((item_idx, item))
-        elif item.item_type == ParagraphItemType.GLUE and prev_was_box:
-            feasible_break_idx_and_items.append((item_idx, item))
+        if item_type == penalty and item_penalty < MAX_PENALTY:
+            feasible_break_idxs.append(item_idx)
+        elif item_type == glue and prev_was_box:
+            feasible_break_idxs.append(item_idx)
 
-        prev_was_box = item.item_type == ParagraphItemType.BOX
+        prev_was_box = item_type == box
 
     current_start_idx = 0
-    for break_idx, (item_idx, item) in enumerate(feasible_break_idx_and_items):
-        if item.penalty <= -MAX_PENALTY:
+    for break_idx, item_idx in enumerate(feasible_break_idxs):
+        if items.penalties[item_idx] <= -MAX_PENALTY:
             # forced break
             yield item_idx
             current_start_idx = item_idx + 1
-        elif break_idx < len(feasible_break_idx_and_items) - 1:
-            next_item_idx, next_item = feasible_break_idx_and_items[break_idx + 1]
+        elif break_idx < len(feasible_break_idxs) - 1:
+            next_item_idx = feasible_break_idxs[break_idx + 1]
             natural_width = sum_widths[next_item_idx] - sum_widths[current_start_idx]
-            if next_item.item_type == ParagraphItemType.PENALTY:
-                natural_width += next_item.width
+            if items.item_types[next_item_idx] == penalty:
+                natural_width += items.widths[next_item_idx]
             if natural_width > width:
                 yield item_idx
                 current_start_idx = item_idx + 1
+
+
+def _prepared_greedy_line_breaks(
+    prepared: PreparedParagraph,
+    width: float,
+    on_break: Optional[Callable[[BreakPoint], None]] = None,
+) -> Generator[int, None, None]:
+    # As greedy_line_breaks() but reading break points and running widths from prepared. If
+    # on_break is given, it is called with the break point of each break before it is yielded.
+    break_item_idxs, penalties = prepared.break_item_idxs, prepared.items.penalties
+    running_widths, break_widths = prepared.running_widths, prepared.break_widths
+
+    current_start_width = 0.0
+    n_breaks = len(break_item_idxs)
+    for break_idx, item_idx in enumerate(break_item_idxs):
+        if penalties[item_idx] <= -MAX_PENALTY:
+            # forced break
+            if on_break is not None:
+                on_break(prepared.break_points[break_idx])
+            yield item_idx
+            current_start_width = prepared.running_widths_after[break_idx]
+        elif break_idx < n_breaks - 1:
+            natural_width = (
+                running_widths[break_idx + 1] - current_start_width + break_widths[break_idx + 1]
+            )
+            if natural_width > width:
+                if on_break is not None:
+                    on_break(prepared.break_points[break_idx])
+                yield item_idx
+                current_start_width = prepared.running_widths_after[break_idx]
+
+
+def _streaming_greedy_line_breaks(
+    para_items: Iterable[ParagraphItem], width: float
+) -> Generator[int, None, None]:
+    # As greedy_line_breaks() but deciding whether to break at each potential break once the
+    # next is seen rather than finding all potential breaks first.
+    glue, penalty = ParagraphItemType.GLUE.value, ParagraphItemType.PENALTY.value
+    box = ParagraphItemType.BOX.value
+    if isinstance(para_items, ParagraphItems):
+        fields: Iterable[tuple[int, float, float]] = zip(
+            para_items.item_types, para_items.widths, para_items.penalties
+        )
+    else:
+        fields = ((item.item_type.value, item.width, item.penalty) for item in para_items)
+
+    # Running width before the current item, at the start of the current line and after the
+    # last potential break, which is yet to be decided.
+    sum_width = current_start_width = pending_width_after = 0.0
+    pending_item_idx = None
+    prev_was_box = False
+    for item_idx, (item_type, item_width, item_penalty) in enumerate(fields):
+        is_break = (item_type == penalty and item_penalty < MAX_PENALTY) or (
+            item_type == glue and prev_was_box
+        )
+        sum_width_after = sum_width + item_width if item_type != penalty else sum_width
+
+        if is_break:
+            if pending_item_idx is not None:
+                natural_width = sum_width - current_start_width
+                if item_type == penalty:
+                    natural_width += item_width
+                if natural_width > width:
+                    yield pending_item_idx
+                    current_start_width = pending_width_after
+                pending_item_idx = None
+
+            if item_penalty <= -MAX_PENALTY:
+                # forced break
+                yield item_idx
+                current_start_width = sum_width_after
+            else:
+                pending_item_idx, pending_width_after = item_idx, sum_width_after
+
+        sum_width = sum_width_after
+        prev_was_box = item_type == box
+
+
+def greedy_line_breaks_batch(
+    paragraphs: Sequence[Union[Iterable[ParagraphItem], PreparedParagraph]],
+    widths: Union[float, Sequence[float]],
+) -> list[list[int]]:
+    """
+    Return the line breaks found by greedy_line_breaks() for each of paragraphs broken at the
+    corresponding width in widths, or at widths if it is a single width. The lines of all
+    paragraphs are found together using NumPy. To break one paragraph at many widths, repeat
+    the paragraph. Its running widths are then only computed once.
+
+    """
+    if isinstance(widths, (int, float)):
+        widths = [widths] * len(paragraphs)
+    elif len(widths) != len(paragraphs):
+        raise ValueError("widths must be a single width or one width per paragraph")
+
+    from ._greedy_numpy import vectorized_greedy_line_breaks
+
+    items_by_id: dict[int, ParagraphItems] = {}
+    for para_items in paragraphs:
+        if id(para_items) not in items_by_id:
+            items_by_id[id(para_items)] = as_paragraph_items(
+                para_items.items if isinstance(para_items, PreparedParagraph) else para_items
+            )
+    return vectorized_greedy_line_breaks(
+        [items_by_id[id(para_items)] for para_items in paragraphs], widths
+    )
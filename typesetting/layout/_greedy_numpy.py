@@ -0,0 +1,236 @@
+"""
+Vectorised greedy line breaking for greedy_line_breaks() and greedy_line_breaks_batch().
+
+For each paragraph, the running width before each potential break and the width the line would
+have if it ended there are computed with NumPy. Each line then ends before the first potential
+break at which it would be too wide, which is found with a binary search over the running
+maximum of those widths. The lines of all paragraphs are found in lockstep so that a batch of
+paragraphs and widths takes one binary search per line number rather than one per line. A single
+paragraph is searched line by line instead.
+
+The binary search only gives a first guess as its arithmetic differs from greedy_line_breaks().
+Each guess is checked with the same arithmetic as greedy_line_breaks() and corrected by a linear
+scan if needed so that both produce the same breaks.
+
+"""
+import bisect
+from typing import NamedTuple, Sequence, Union
+
+import numpy as np
+
+from ._types import MAX_PENALTY, ParagraphItems, ParagraphItemType
+
+
+class _Candidates(NamedTuple):
+    "Potential breaks of a paragraph as greedy_line_breaks() finds them."
+    # Item index of each potential break.
+    item_idxs: np.ndarray
+
+    # Running width before the item and width added by breaking at the item, i.e. the width of
+    # a hyphen at a penalty item.
+    running_widths: np.ndarray
+    break_widths: np.ndarray
+
+    # Running width after the item, from which a line following a break at the item starts.
+    running_widths_after: np.ndarray
+
+    # Index of the first forced break at or after each potential break, or the number of
+    # potential breaks if there is none.
+    next_forced: np.ndarray
+
+    # Running maximum of running_widths + break_widths.
+    max_line_ends: np.ndarray
+
+
+def _candidates(items: ParagraphItems) -> _Candidates:
+    item_types = np.frombuffer(items.item_types, dtype=np.uint8)
+    widths = np.frombuffer(items.widths, dtype=np.float64)
+    penalties = np.frombuffer(items.penalties, dtype=np.float64)
+    is_penalty = item_types == ParagraphItemType.PENALTY.value
+    is_box = item_types == ParagraphItemType.BOX.value
+
+    # Penalty items add nothing to running widths. Accumulation is sequential and so matches the
+    # running sums in greedy_line_breaks() exactly.
+    sum_widths = np.zeros(len(items) + 1)
+    np.cumsum(np.where(is_penalty, 0.0, widths), out=sum_widths[1:])
+
+    prev_is_box = np.zeros_like(is_box)
+    prev_is_box[1:] = is_box[:-1]
+    is_candidate = (is_penalty & (penalties < MAX_PENALTY)) | (
+        (item_types == ParagraphItemType.GLUE.value) & prev_is_box
+    )
+    item_idxs = np.flatnonzero(is_candidate)
+
+    running_widths = sum_widths[item_idxs]
+    break_widths = np.where(is_penalty[item_idxs], widths[item_idxs], 0.0)
+
+    n_candidates = item_idxs.shape[0]
+    forced_or_end = np.where(
+        penalties[item_idxs] <= -MAX_PENALTY, np.arange(n_candidates), n_candidates
+    )
+    next_forced = np.minimum.accumulate(forced_or_end[::-1])[::-1]
+
+    return _Candidates(
+        item_idxs=item_idxs,
+        running_widths=running_widths,
+        break_widths=break_widths,
+        running_widths_after=sum_widths[item_idxs + 1],
+        next_forced=next_forced,
+        max_line_ends=np.maximum.accumulate(running_widths + break_widths),
+    )
+
+
+def vectorized_greedy_line_breaks(
+    paragraphs: Sequence[ParagraphItems], widths: Sequence[float]
+) -> list[list[int]]:
+    "Return the greedy breaks for each paragraph broken at the corresponding width."
+    if len(paragraphs) == 0:
+        return []
+    elif len(paragraphs) == 1:
+        return [_single_greedy_line_breaks(_candidates(paragraphs[0]), widths[0])]
+
+    # Candidates are computed once for each distinct paragraph.
+    candidates_by_id: dict[int, tuple[int, _Candidates]] = {}
+    for items in paragraphs:
+        if id(items) not in candidates_by_id:
+            candidates_by_id[id(items)] = (len(candidates_by_id), _candidates(items))
+    all_candidates = [candidates for _, candidates in candidates_by_id.values()]
+
+    # Concatenate the candidates of all paragraphs. The running maxima are shifted so that they
+    # increase from one paragraph to the next and a single binary search can be made for all
+    # lines.
+    counts = np.array([c.item_idxs.shape[0] for c in all_candidates], dtype=np.int64)
+    bases = np.zeros(len(all_candidates), dtype=np.int64)
+    np.cumsum(counts[:-1], out=bases[1:])
+    shifts = np.zeros(len(all_candidates))
+    shifted_max_line_ends = []
+    shift = 0.0
+    for para_idx, candidates in enumerate(all_candidates):
+        if candidates.max_line_ends.shape[0] > 0:
+            shift -= candidates.max_line_ends[0]
+            shifts[para_idx] = shift
+            shifted_max_line_ends.append(candidates.max_line_ends + shift)
+            shift = shifted_max_line_ends[-1][-1] + 1.0
+    max_line_ends = np.concatenate(shifted_max_line_ends) if shifted_max_line_ends else np.zeros(0)
+    running_widths = np.concatenate([c.running_widths for c in all_candidates])
+    break_widths = np.concatenate([c.break_widths for c in all_candidates])
+    running_widths_after = np.concatenate([c.running_widths_after for c in all_candidates])
+    next_forced = np.concatenate([c.next_forced for c in all_candidates])
+    item_idxs = np.concatenate([c.item_idxs for c in all_candidates])
+
+    # State of each job: the paragraph, the running width at the start of the current line and
+    # the index of the first potential break not yet considered.
+    job_paras = np.array([candidates_by_id[id(items)][0] for items in paragraphs], dtype=np.int64)
+    job_widths = np.asarray(widths, dtype=np.float64)
+    job_bases, job_counts = bases[job_paras], counts[job_paras]
+    job_starts = np.zeros(len(paragraphs))
+    job_next = np.zeros(len(paragraphs), dtype=np.int64)
+
+    break_jobs, break_item_idxs = [], []
+    active = np.flatnonzero(job_counts > 0)
+    while active.shape[0] > 0:
+        bases_, counts_, line_widths = job_bases[active], job_counts[active], job_widths[active]
+        starts, first = job_starts[active], job_next[active]
+
+        # Guess the first potential break after the first one not yet considered at which the
+        # line would be too wide.
+        limits = starts + line_widths + shifts[job_paras[active]]
+        overflows = np.searchsorted(max_line_ends, limits, side="right") - bases_
+        overflows = np.clip(overflows, first + 1, counts_)
+
+        # Check guesses with the arithmetic of greedy_line_breaks() and correct them if needed.
+        global_overflows = bases_ + np.minimum(overflows, counts_ - 1)
+        is_too_wide = (running_widths[global_overflows] - starts) + break_widths[
+            global_overflows
+        ] > line_widths
+        global_prev = bases_ + np.maximum(overflows - 1, 0)
+        is_prev_too_wide = (running_widths[global_prev] - starts) + break_widths[
+            global_prev
+        ] > line_widths
+        is_wrong = ((overflows < counts_) & ~is_too_wide) | (
+            (overflows > first + 1) & is_prev_too_wide
+        )
+        for job_idx in np.flatnonzero(is_wrong):
+            overflows[job_idx] = _first_overflow(
+                running_widths[bases_[job_idx] : bases_[job_idx] + counts_[job_idx]],
+                break_widths[bases_[job_idx] : bases_[job_idx] + counts_[job_idx]],
+                starts[job_idx],
+                line_widths[job_idx],
+                first[job_idx] + 1,
+            )
+
+        # Break before the overflowing break point unless there is an earlier forced break.
+        breaks = np.where(overflows < counts_, overflows - 1, counts_)
+        breaks = np.minimum(breaks, next_forced[bases_ + first])
+        has_break = breaks < counts_
+        active, breaks, bases_ = active[has_break], breaks[has_break], bases_[has_break]
+
+        break_jobs.append(active)
+        break_item_idxs.append(item_idxs[bases_ + breaks])
+        job_starts[active] = running_widths_after[bases_ + breaks]
+        job_next[active] = breaks + 1
+        active = active[job_next[active] < job_counts[active]]
+
+    # Group breaks by job. Breaks for each job were found in order and the sort is stable.
+    all_jobs = np.concatenate(break_jobs) if break_jobs else np.zeros(0, dtype=np.int64)
+    all_item_idxs = (
+        np.concatenate(break_item_idxs) if break_item_idxs else np.zeros(0, dtype=np.int64)
+    )
+    order = np.argsort(all_jobs, kind="stable")
+    ends = np.searchsorted(all_jobs[order], np.arange(len(paragraphs)), side="right")
+    return [
+        all_item_idxs[order[start:end]].tolist()
+        for start, end in zip(np.concatenate(([0], ends[:-1])), ends)
+    ]
+
+
+def _single_greedy_line_breaks(candidates: _Candidates, width: float) -> list[int]:
+    # As vectorized_greedy_line_breaks() for a single paragraph. Per-line NumPy calls would cost
+    # more than the search itself and so the candidates are searched as lists.
+    item_idxs = candidates.item_idxs.tolist()
+    running_widths = candidates.running_widths.tolist()
+    break_widths = candidates.break_widths.tolist()
+    running_widths_after = candidates.running_widths_after.tolist()
+    next_forced = candidates.next_forced.tolist()
+    max_line_ends = candidates.max_line_ends.tolist()
+    n_candidates = len(item_idxs)
+
+    def is_too_wide(idx: int) -> bool:
+        return (running_widths[idx] - start) + break_widths[idx] > width
+
+    break_idxs = []
+    start, first = 0.0, 0
+    while first < n_candidates:
+        # Guess the first overflowing break point and check it as vectorized_greedy_line_breaks()
+        # does.
+        overflow = bisect.bisect_right(max_line_ends, start + width, first + 1)
+        if (overflow < n_candidates and not is_too_wide(overflow)) or (
+            overflow > first + 1 and is_too_wide(overflow - 1)
+        ):
+            overflow = _first_overflow(running_widths, break_widths, start, width, first + 1)
+
+        break_idx = min(
+            overflow - 1 if overflow < n_candidates else n_candidates, next_forced[first]
+        )
+        if break_idx == n_candidates:
+            break
+        break_idxs.append(item_idxs[break_idx])
+        start, first = running_widths_after[break_idx], break_idx + 1
+
+    return break_idxs
+
+
+def _first_overflow(
+    running_widths: Union[Sequence[float], np.ndarray],
+    break_widths: Union[Sequence[float], np.ndarray],
+    start: float,
+    width: float,
+    first: int,
+) -> int:
+    # Return the index of the first potential break from first at which a line starting at
+    # start would be too wide or the number of potential breaks if there is none. The widths may
+    # be lists or slices of the candidates' arrays.
+    for idx in range(first, len(running_widths)):
+        if (running_widths[idx] - start) + break_widths[idx] > width:
+            return idx
+    return len(running_widths)
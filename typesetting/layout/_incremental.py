@@ -0,0 +1,300 @@
+import bisect
+import itertools
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+import uniseg.linebreak
+
+from ..hyphenation import SOFT_HYPHEN
+from ._optimal import (
+    NodeArena,
+    NodeKey,
+    OptimiserParameters,
+    RunningSum,
+    add_break_point,
+    initial_active_nodes,
+    optimal_break_idxs,
+    potential_breaks,
+)
+from ._types import (
+    MAX_PENALTY,
+    MAX_STRETCH,
+    ParagraphItems,
+    ParagraphItemType,
+    _break_item_fields,
+    _prefix_widths,
+    _text_width,
+)
+
+if TYPE_CHECKING:
+    from ..font import Font
+
+__all__ = ["IncrementalParagraph"]
+
+# Number of characters after an edit which are initially re-segmented into line break units.
+_RESEGMENT_MARGIN = 64
+
+
+class _Snapshot(NamedTuple):
+    "Active nodes after considering all break points before a given item."
+    item_idx: int
+    running_sum: RunningSum
+    active_nodes: dict[NodeKey, int]
+
+
+def _stem(lb_item: str) -> str:
+    return lb_item.rstrip(f" {SOFT_HYPHEN}\n")
+
+
+class IncrementalParagraph:
+    """
+    A paragraph of text which is kept broken into lines as it is edited. After an edit, only the
+    line break units around the edit are re-segmented, only paragraph items from the edit to the
+    end of its run of unbreakable text are regenerated and the search for optimal breaks resumes
+    from the last snapshot of active nodes taken before the edit.
+
+    The breaks are the same as those from optimal_line_breaks() applied to the result of
+    text_to_paragraph_items() for the edited text.
+
+    """
+
+    def __init__(
+        self,
+        text: str,
+        font: "Font",
+        width: float,
+        params: Optional[OptimiserParameters] = None,
+        *,
+        snapshot_interval: int = 16,
+    ):
+        self.font = font
+        self.width = width
+        self.params = params if params is not None else OptimiserParameters()
+
+        # Number of break points considered between snapshots of the active nodes.
+        self.snapshot_interval = snapshot_interval
+
+        self._space_width = _text_width(" ", font)
+        self._hyphen_width = _text_width("-", font)
+
+        self._text = text
+        self._units: list[str] = list(uniseg.linebreak.line_break_units(text))
+
+        # Number of items generated by each line break unit and the width of the unit's run of
+        # unbreakable text up to and including it. The items for the final glue and forced break
+        # follow those for the units.
+        self._unit_item_counts: list[int] = []
+        self._unit_running_widths: list[float] = []
+        self._items = ParagraphItems()
+        self._generate_unit_items(0, len(self._units))
+        self._items.append(ParagraphItemType.GLUE, stretchability=MAX_STRETCH)
+        self._items.append(ParagraphItemType.PENALTY, penalty=-MAX_PENALTY, flagged=True)
+
+        # Search nodes for all snapshots. Each snapshot holds a reference to its active nodes.
+        self._arena = NodeArena()
+        self._snapshots = [_Snapshot(0, RunningSum(), initial_active_nodes(self._arena))]
+        self._break_idxs = self._resume_breaking()
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    @property
+    def items(self) -> ParagraphItems:
+        return self._items
+
+    def line_breaks(self) -> list[int]:
+        "Return indices in items of the optimal line breaks."
+        return list(self._break_idxs)
+
+    def edit(self, start: int, end: int, replacement: str) -> list[int]:
+        "Replace text[start:end] with replacement and return the new line breaks."
+        text = self._text[:start] + replacement + self._text[end:]
+        delta = len(replacement) - (end - start)
+        edit_end = start + len(replacement)
+
+        # Find the first line break unit affected by the edit. Whether there is a break at the
+        # end of the previous unit can depend on what follows it so start from that unit.
+        old_unit_ends = list(itertools.accumulate(len(unit) for unit in self._units))
+        first_unit_idx = max(
+            0, min(bisect.bisect_right(old_unit_ends, start), len(self._units)) - 1
+        )
+        segment_start = old_unit_ends[first_unit_idx - 1] if first_unit_idx > 0 else 0
+
+        new_units, last_old_unit_idx = self._resegment(
+            text, segment_start, edit_end, delta, old_unit_ends, first_unit_idx
+        )
+
+        # Units up to the next unit with an empty stem or the end of the paragraph need new items
+        # since box widths depend on the preceding text in the same run.
+        units = self._units[:first_unit_idx] + new_units + self._units[last_old_unit_idx + 1 :]
+        stop_unit_idx = first_unit_idx + len(new_units)
+        while stop_unit_idx < len(units) and len(_stem(units[stop_unit_idx])) > 0:
+            stop_unit_idx += 1
+
+        n_reused_units = len(units) - stop_unit_idx
+        n_old_units = len(self._units)
+        reused_counts = self._unit_item_counts[n_old_units - n_reused_units :]
+        reused_running_widths = self._unit_running_widths[n_old_units - n_reused_units :]
+        first_item_idx = sum(self._unit_item_counts[:first_unit_idx])
+        reused_item_idx = len(self._items) - 2 - sum(reused_counts)
+        old_items = self._items
+
+        self._text = text
+        self._units = units
+        self._items = old_items[:first_item_idx]
+        del self._unit_item_counts[first_unit_idx:]
+        del self._unit_running_widths[first_unit_idx:]
+        self._generate_unit_items(first_unit_idx, stop_unit_idx)
+        self._items.extend(old_items[reused_item_idx:])
+        self._unit_item_counts.extend(reused_counts)
+        self._unit_running_widths.extend(reused_running_widths)
+
+        # Resume from the last snapshot which only depends on unchanged items.
+        snapshot_idx = (
+            bisect.bisect_right(
+                [snapshot.item_idx for snapshot in self._snapshots], first_item_idx
+            )
+            - 1
+        )
+        for snapshot in self._snapshots[snapshot_idx + 1 :]:
+            for node_idx in snapshot.active_nodes.values():
+                self._arena.release(node_idx)
+        del self._snapshots[snapshot_idx + 1 :]
+        self._break_idxs = self._resume_breaking()
+        return self.line_breaks()
+
+    def _resegment(
+        self,
+        text: str,
+        segment_start: int,
+        edit_end: int,
+        delta: int,
+        old_unit_ends: list[int],
+        first_unit_idx: int,
+    ) -> tuple[list[str], int]:
+        """
+        Split text from segment_start into line break units until they re-synchronise with the
+        existing units after the edit. Return the new units and the index of the last existing
+        unit they replace.
+
+        """
+        margin = _RESEGMENT_MARGIN
+        while True:
+            segment_end = min(len(text), edit_end + margin)
+            new_units, unit_end, n_matched = [], segment_start, 0
+            for unit in uniseg.linebreak.line_break_units(text[segment_start:segment_end]):
+                new_units.append(unit)
+                unit_end += len(unit)
+
+                # The segmentation is known to have re-synchronised once two consecutive units
+                # after the edit end where existing units end. Units at the end of the segment
+                # may be split differently once more text follows them.
+                if segment_end < len(text) and unit_end >= segment_end:
+                    break
+                old_unit_idx = bisect.bisect_left(old_unit_ends, unit_end - delta)
+                if (
+                    unit_end > edit_end
+                    and old_unit_idx >= first_unit_idx
+                    and old_unit_idx < len(old_unit_ends)
+                    and old_unit_ends[old_unit_idx] == unit_end - delta
+                ):
+                    n_matched += 1
+                    if n_matched == 2:
+                        return new_units, old_unit_idx
+                else:
+                    n_matched = 0
+
+            if segment_end == len(text):
+                return new_units, len(self._units) - 1
+            margin *= 2
+
+    def _generate_unit_items(self, start_unit_idx: int, stop_unit_idx: int):
+        """
+        Append items for units[start_unit_idx:stop_unit_idx]. Items for earlier units must
+        already be present and stop_unit_idx must end a run of units with non-empty stems.
+
+        """
+        unit_idx = start_unit_idx
+        while unit_idx < stop_unit_idx:
+            if len(_stem(self._units[unit_idx])) == 0:
+                fields = list(
+                    _break_item_fields(
+                        self._units[unit_idx], self._space_width, self._hyphen_width
+                    )
+                )
+                for item_fields in fields:
+                    self._items.append(*item_fields)
+                self._unit_item_counts.append(len(fields))
+                self._unit_running_widths.append(0.0)
+                unit_idx += 1
+                continue
+
+            # Widths of boxes depend on the whole run of units with non-empty stems. The run may
+            # have started before start_unit_idx.
+            run_start_idx, run_stop_idx = unit_idx, unit_idx
+            while run_start_idx > 0 and len(_stem(self._units[run_start_idx - 1])) > 0:
+                run_start_idx -= 1
+            while run_stop_idx < stop_unit_idx and len(_stem(self._units[run_stop_idx])) > 0:
+                run_stop_idx += 1
+
+            stems = [_stem(unit) for unit in self._units[run_start_idx:run_stop_idx]]
+            stem_ends = list(itertools.accumulate(len(stem) for stem in stems))
+            prefix_widths = _prefix_widths(
+                "".join(stems), stem_ends[unit_idx - run_start_idx :], self.font
+            )
+
+            running_width = (
+                self._unit_running_widths[unit_idx - 1] if unit_idx > run_start_idx else 0.0
+            )
+            for lb_item, prefix_width in zip(self._units[unit_idx:run_stop_idx], prefix_widths):
+                stem_width = prefix_width - running_width
+                running_width += stem_width
+                self._items.append(ParagraphItemType.BOX, stem_width, text=_stem(lb_item))
+                n_items = 1
+                for item_fields in _break_item_fields(
+                    lb_item, self._space_width, self._hyphen_width
+                ):
+                    self._items.append(*item_fields)
+                    n_items += 1
+                self._unit_item_counts.append(n_items)
+                self._unit_running_widths.append(running_width)
+            unit_idx = run_stop_idx
+
+    def _resume_breaking(self) -> list[int]:
+        "Continue the search for optimal breaks from the last snapshot."
+        arena, snapshot = self._arena, self._snapshots[-1]
+        active_nodes = dict(snapshot.active_nodes)
+        for node_idx in active_nodes.values():
+            arena.retain(node_idx)
+        glue, penalty = ParagraphItemType.GLUE.value, ParagraphItemType.PENALTY.value
+
+        n_break_points = 0
+        for break_point in potential_breaks(self._items, snapshot.item_idx, snapshot.running_sum):
+            add_break_point(arena, active_nodes, break_point, self.width, self.params)
+            n_break_points += 1
+            if n_break_points % self.snapshot_interval != 0:
+                continue
+
+            # Record running sums after the break point's item.
+            item_idx = break_point.item_idx
+            width, stretch, shrink = break_point.running_sum
+            item_type = self._items.item_types[item_idx]
+            if item_type != penalty:
+                width += self._items.widths[item_idx]
+            if item_type == glue:
+                stretch += self._items.stretchabilities[item_idx]
+                shrink += self._items.shrinkabilities[item_idx]
+            for node_idx in active_nodes.values():
+                arena.retain(node_idx)
+            self._snapshots.append(
+                _Snapshot(
+                    item_idx + 1,
+                    RunningSum(width=width, stretch=stretch, shrink=shrink),
+                    dict(active_nodes),
+                )
+            )
+
+        break_idxs = optimal_break_idxs(arena, active_nodes)
+        for node_idx in active_nodes.values():
+            arena.release(node_idx)
+        return break_idxs
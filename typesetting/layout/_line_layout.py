@@ -0,0 +1,261 @@
+"""
+Line breaks together with how each line is set.
+
+optimal_line_breaks() and greedy_line_breaks() record the lines they choose when passed a list
+to fill. The optimal engine reads each line from the nodes along the best path, which already
+hold the running sums, fitness class and total demerits at each break, and the greedy engine
+records each line as it breaks. Only the positions of items on each line are found by walking
+the line's items.
+
+"""
+import array
+import dataclasses
+import math
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
+
+from ._greedy import greedy_line_breaks
+from ._optimal import (
+    BreakPoint,
+    FitnessClass,
+    NodeArena,
+    OptimiserParameters,
+    PreparedParagraph,
+    RunningSum,
+    adjustment_ratio_for_line,
+    fitness_class_for_adjustment_ratio,
+    line_demerit,
+    optimal_line_breaks,
+)
+from ._types import ParagraphItem, ParagraphItems, ParagraphItemType, as_paragraph_items
+
+__all__ = ["Line", "LineLayout", "greedy_line_layout", "optimal_line_layout"]
+
+
+class Line(NamedTuple):
+    "A single line of a LineLayout."
+    # Items from start_idx up to, but not including, end_idx are set on the line. The item at
+    # end_idx is the break and adds its width to the line if it is a penalty, e.g. a hyphen. A
+    # line starts after the item at which the previous line was broken, so glue at a break is
+    # set on neither line.
+    start_idx: int
+    end_idx: int
+
+    # Adjustment ratio of the line as set. The optimal engine scores a line after a break at
+    # glue as if it started with that glue and so, in an optimal layout, fitness_class and
+    # demerits are those the search used, which may differ from the adjustment ratio's.
+    adjustment_ratio: float
+    fitness_class: FitnessClass
+    demerits: float
+
+    # Position of each item from start_idx to end_idx inclusive relative to the start of the
+    # line. Glue is stretched or shrunk by the adjustment ratio, which is limited to shrinking
+    # no more than the glue's shrinkability. Glue is set at its natural width if the ratio is
+    # infinite.
+    positions: array.array
+
+
+@dataclasses.dataclass
+class LineLayout:
+    "Lines of paragraph items broken at a given width."
+    items: ParagraphItems
+    width: float
+    lines: list[Line]
+
+    @property
+    def break_idxs(self) -> list[int]:
+        "Indices in items of the line breaks."
+        return [line.end_idx for line in self.lines]
+
+    @property
+    def demerits(self) -> float:
+        "Total demerits of all lines."
+        return sum(line.demerits for line in self.lines)
+
+    def boxes(self, line_idx: int) -> Iterator[tuple[float, str]]:
+        """
+        Yield the position and text of each box on a line and, if the line is broken at a
+        penalty with text, e.g. a hyphen, of the penalty.
+
+        """
+        line = self.lines[line_idx]
+        box, penalty = ParagraphItemType.BOX.value, ParagraphItemType.PENALTY.value
+        item_types, texts = self.items.item_types, self.items.texts
+        for item_idx, position in zip(range(line.start_idx, line.end_idx), line.positions):
+            if item_types[item_idx] == box:
+                yield position, texts[item_idx]
+        if item_types[line.end_idx] == penalty and texts[line.end_idx] != "":
+            yield line.positions[-1], texts[line.end_idx]
+
+
+def optimal_line_layout(
+    para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+    width: float,
+    params: Optional[OptimiserParameters] = None,
+) -> LineLayout:
+    "Return the layout of the breaks found by optimal_line_breaks()."
+    items = _items(para_items)
+    lines: list[Line] = []
+    for _ in optimal_line_breaks(
+        para_items if isinstance(para_items, PreparedParagraph) else items,
+        width,
+        params,
+        lines=lines,
+    ):
+        pass
+    return LineLayout(items=items, width=width, lines=lines)
+
+
+def greedy_line_layout(
+    para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+    width: float,
+    params: Optional[OptimiserParameters] = None,
+) -> LineLayout:
+    """
+    Return the layout of the breaks found by greedy_line_breaks(). params are only used to score
+    lines. Overfull lines are scored as if their adjustment ratio were -1.
+
+    """
+    items = _items(para_items)
+    lines: list[Line] = []
+    for _ in greedy_line_breaks(
+        para_items if isinstance(para_items, PreparedParagraph) else items,
+        width,
+        lines=lines,
+        params=params,
+    ):
+        pass
+    return LineLayout(items=items, width=width, lines=lines)
+
+
+def _items(para_items: Union[Iterable[ParagraphItem], PreparedParagraph]) -> ParagraphItems:
+    if isinstance(para_items, PreparedParagraph):
+        return para_items.items
+    return as_paragraph_items(para_items)
+
+
+def path_lines(items: ParagraphItems, arena: NodeArena, node_idx: int, width: float) -> list[Line]:
+    "Return the lines along the path of the optimal engine's search ending at a node."
+    glue, penalty = ParagraphItemType.GLUE.value, ParagraphItemType.PENALTY.value
+    node_idxs = arena.path_node_idxs(node_idx)
+    lines = []
+    for prev_idx, node_idx in zip(node_idxs, node_idxs[1:]):
+        # Lines start after the break ending the previous line, leaving out glue at the break.
+        prev_end_idx, end_idx = arena.item_idxs[prev_idx], arena.item_idxs[node_idx]
+        start_width, start_stretch, start_shrink = (
+            arena.widths[prev_idx],
+            arena.stretches[prev_idx],
+            arena.shrinks[prev_idx],
+        )
+        if prev_end_idx >= 0 and items.item_types[prev_end_idx] == glue:
+            start_width += items.widths[prev_end_idx]
+            start_stretch += items.stretchabilities[prev_end_idx]
+            start_shrink += items.shrinkabilities[prev_end_idx]
+
+        # Compute the adjustment ratio as adjustment_ratio_for_line() does but from the running
+        # sums held in the arena.
+        natural_width = arena.widths[node_idx] - start_width
+        if items.item_types[end_idx] == penalty:
+            natural_width += items.widths[end_idx]
+        if natural_width < width:
+            line_stretch = arena.stretches[node_idx] - start_stretch
+            adjustment_ratio = (
+                (width - natural_width) / line_stretch if line_stretch > 0 else math.inf
+            )
+        elif natural_width > width:
+            line_shrink = arena.shrinks[node_idx] - start_shrink
+            adjustment_ratio = (
+                (width - natural_width) / line_shrink if line_shrink > 0 else math.inf
+            )
+        else:
+            adjustment_ratio = 0.0
+
+        start_idx = prev_end_idx + 1
+        lines.append(
+            Line(
+                start_idx=start_idx,
+                end_idx=end_idx,
+                adjustment_ratio=adjustment_ratio,
+                fitness_class=FitnessClass(arena.fitness_classes[node_idx]),
+                demerits=arena.total_demerits[node_idx] - arena.total_demerits[prev_idx],
+                positions=_positions(items, start_idx, end_idx, adjustment_ratio),
+            )
+        )
+    return lines
+
+
+class GreedyLineRecorder:
+    """
+    Records a Line for each break chosen by the greedy engine. params are only used to score
+    lines.
+
+    """
+
+    def __init__(
+        self, items: ParagraphItems, width: float, params: OptimiserParameters, lines: list[Line]
+    ):
+        self.items, self.width, self.params, self.lines = items, width, params, lines
+
+        # Item index and break point at the start of the current line. Only the running sums of
+        # the break point are used.
+        self._start_idx, self._start = 0, BreakPoint(-1, 0.0, 0.0, False, RunningSum())
+        self._prev_break_point: Optional[BreakPoint] = None
+        self._prev_fitness_class = FitnessClass.NORMAL
+
+    def add(self, break_point: BreakPoint):
+        "Record the line ending at break_point."
+        items, start_idx, end_idx = self.items, self._start_idx, break_point.item_idx
+        adjustment_ratio = adjustment_ratio_for_line(self._start, break_point, self.width)
+        fitness_class = fitness_class_for_adjustment_ratio(max(-1.0, adjustment_ratio))
+        self.lines.append(
+            Line(
+                start_idx=start_idx,
+                end_idx=end_idx,
+                adjustment_ratio=adjustment_ratio,
+                fitness_class=fitness_class,
+                demerits=line_demerit(
+                    self.params,
+                    self._prev_break_point,
+                    break_point,
+                    max(-1.0, adjustment_ratio),
+                    self._prev_fitness_class,
+                    fitness_class,
+                ),
+                positions=_positions(items, start_idx, end_idx, adjustment_ratio),
+            )
+        )
+        self._prev_break_point, self._prev_fitness_class = break_point, fitness_class
+
+        # The next line starts after the break, leaving out glue at the break.
+        running_width, running_stretch, running_shrink = break_point.running_sum
+        if items.item_types[end_idx] == ParagraphItemType.GLUE.value:
+            running_width += items.widths[end_idx]
+            running_stretch += items.stretchabilities[end_idx]
+            running_shrink += items.shrinkabilities[end_idx]
+        self._start_idx = end_idx + 1
+        self._start = self._start._replace(
+            running_sum=RunningSum(running_width, running_stretch, running_shrink)
+        )
+
+
+def _positions(
+    items: ParagraphItems, start_idx: int, end_idx: int, adjustment_ratio: float
+) -> array.array:
+    # Return the positions of items start_idx to end_idx inclusive on a line set with the given
+    # adjustment ratio. See Line.positions.
+    glue, penalty = ParagraphItemType.GLUE.value, ParagraphItemType.PENALTY.value
+    ratio = max(-1.0, adjustment_ratio) if math.isfinite(adjustment_ratio) else 0.0
+    adjustments = items.stretchabilities if ratio >= 0.0 else items.shrinkabilities
+
+    position = 0.0
+    positions = array.array("d", [position])
+    for item_type, item_width, adjustment in zip(
+        items.item_types[start_idx:end_idx],
+        items.widths[start_idx:end_idx],
+        adjustments[start_idx:end_idx],
+    ):
+        if item_type == glue:
+            position += item_width + ratio * adjustment
+        elif item_type != penalty:
+            position += item_width
+        positions.append(position)
+    return positions
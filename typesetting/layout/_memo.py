@@ -0,0 +1,88 @@
+from typing import Iterable, NamedTuple, Optional, Union
+
+from .._lru import LRUCache
+from ._greedy import greedy_line_breaks
+from ._optimal import OptimiserParameters, PreparedParagraph, optimal_line_breaks
+from ._types import ParagraphItem, ParagraphItems, as_paragraph_items
+
+__all__ = ["LineBreakCache", "LineBreakCacheInfo"]
+
+# Default number of results kept by a LineBreakCache.
+DEFAULT_LINE_BREAK_CACHE_SIZE = 4096
+
+
+class LineBreakCacheInfo(NamedTuple):
+    "Statistics for a LineBreakCache."
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: int
+
+
+class LineBreakCache:
+    """
+    Bounded least recently used cache of line breaks in front of optimal_line_breaks() and
+    greedy_line_breaks(). Results are keyed by a digest of the items, the width and the
+    parameters so that repeated content, e.g. running headers or repeated table cells, is only
+    broken once. A cache can be shared by several threads.
+
+    """
+
+    def __init__(self, max_size: int = DEFAULT_LINE_BREAK_CACHE_SIZE):
+        self._entries: LRUCache[tuple[int, ...]] = LRUCache(max_size)
+
+    def optimal_line_breaks(
+        self,
+        para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+        width: float,
+        params: Optional[OptimiserParameters] = None,
+        *,
+        vectorized: bool = False,
+    ) -> list[int]:
+        "Return the breaks found by optimal_line_breaks(), from the cache if present."
+        params = params if params is not None else OptimiserParameters()
+        items, para_items = _items(para_items)
+        key = ("optimal", items.digest(), width, params)
+        break_idxs = self._entries.get(key)
+        if break_idxs is None:
+            break_idxs = tuple(
+                optimal_line_breaks(para_items, width, params, vectorized=vectorized)
+            )
+            self._entries.put(key, break_idxs)
+        return list(break_idxs)
+
+    def greedy_line_breaks(
+        self,
+        para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+        width: float,
+        *,
+        vectorized: bool = False,
+    ) -> list[int]:
+        "Return the breaks found by greedy_line_breaks(), from the cache if present."
+        items, para_items = _items(para_items)
+        key = ("greedy", items.digest(), width)
+        break_idxs = self._entries.get(key)
+        if break_idxs is None:
+            break_idxs = tuple(greedy_line_breaks(para_items, width, vectorized=vectorized))
+            self._entries.put(key, break_idxs)
+        return list(break_idxs)
+
+    def info(self) -> LineBreakCacheInfo:
+        "Return statistics for the cache."
+        return LineBreakCacheInfo(*self._entries.info())
+
+    def clear(self):
+        "Remove all entries and reset statistics."
+        self._entries.clear()
+
+
+def _items(
+    para_items: Union[Iterable[ParagraphItem], PreparedParagraph]
+) -> tuple[ParagraphItems, Union[ParagraphItems, PreparedParagraph]]:
+    # Return the items to digest and what to pass to the engine. Items are converted once so that
+    # an iterator is not consumed by the digest.
+    if isinstance(para_items, PreparedParagraph):
+        return para_items.items, para_items
+    items = as_paragraph_items(para_items)
+    return items, items
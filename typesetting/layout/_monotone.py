@@ -0,0 +1,646 @@
+"""
+Line breaking with fewer line demerit evaluations for paragraphs whose line costs are totally
+monotone.
+
+If the demerits of a line depend only on where it starts and ends, optimal line breaking is the
+least weight subsequence problem. When the matrix of line costs, indexed by the break starting a
+line and the break ending it, satisfies the quadrangle inequality, the optimal start of a line
+never moves backwards as its end moves forwards. Candidate line starts can then be kept in a queue,
+each owning a contiguous range of line ends found by binary search, as in Hirschberg and Larmore's
+algorithm. This needs O(n log n) evaluations of line demerits rather than one per break point and
+active node.
+
+The demerits for mismatched fitness classes and consecutive flagged breaks also depend on the
+previous line. As in the Knuth-Plass engine, a line start is therefore a break together with the
+fitness class of the line ending there. Lines of a given fitness class from starts of a given
+fitness class always add the same mismatch penalty and lines from flagged starts add the same
+penalty at each flagged end. Starts are therefore queued separately for each fitness class of
+the line, fitness class of the start and whether the start is flagged, and the quadrangle
+inequality is checked for each combination of penalties.
+
+The break point at which each row is deactivated is found with a single sweep over the running
+sums, as these never move backwards. Feasible ends and the quadrangle inequality are then checked
+with NumPy over bands of lines, a block of rows at a time, so the number of NumPy calls grows
+with the number of blocks rather than of rows. The arithmetic remains proportional to the number
+of lines which fit, as for the Knuth-Plass engine, but is not done in Python.
+
+"""
+import math
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional, Union
+
+from ._optimal import (
+    BreakPoint,
+    FitnessClass,
+    OptimiserParameters,
+    PreparedParagraph,
+    adjustment_ratio_for_line,
+    fitness_class_for_adjustment_ratio,
+    line_demerit,
+    optimal_line_breaks,
+    potential_breaks,
+)
+from ._types import MAX_PENALTY, ParagraphItem, as_paragraph_items
+
+__all__ = ["MonotoneLineBreaks", "monotone_line_breaks"]
+
+# Greatest number of lines examined at once with NumPy when finding feasible lines.
+_BLOCK_SIZE = 1 << 16
+
+
+class MonotoneLineBreaks(NamedTuple):
+    "Result of monotone_line_breaks()."
+    # Indices of paragraph items at line breaks.
+    break_idxs: list[int]
+
+    # Engine which found the breaks: "monotone" or "knuth-plass".
+    engine: str
+
+    # Reason for falling back to the Knuth-Plass engine. Empty if the monotone engine was used.
+    fallback_reason: str = ""
+
+
+class _NotMonotone(Exception):
+    "Raised when the line costs of a paragraph do not have the structure the engine requires."
+
+
+def monotone_line_breaks(
+    para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+    width: float,
+    params: Optional[OptimiserParameters] = None,
+) -> MonotoneLineBreaks:
+    """
+    Return optimal line breaks for para_items found with O(n log n) evaluations of line demerits
+    if the line costs allow it and by optimal_line_breaks() otherwise. The breaks have the same
+    total demerits as those from optimal_line_breaks().
+
+    The engine falls back to optimal_line_breaks() if:
+
+    * the quadrangle inequality does not hold over all feasible lines, which is usual for
+      paragraphs with many hyphenation points,
+    * the line ends of some fitness class are not contiguous or move backwards, or
+    * the Knuth-Plass engine would record a break of last resort for one of several nodes at the
+      same break, which then depends on the order in which its nodes were added.
+
+    Finding feasible lines takes O(n) steps in Python and vectorised arithmetic proportional to
+    the number of lines which fit. See the module documentation.
+
+    """
+    params = params if params is not None else OptimiserParameters()
+    if not isinstance(para_items, PreparedParagraph):
+        para_items = as_paragraph_items(para_items)
+        break_points = list(potential_breaks(para_items))
+    else:
+        break_points = para_items.break_points
+
+    try:
+        break_idxs = _monotone_break_idxs(break_points, width, params)
+    except _NotMonotone as e:
+        return MonotoneLineBreaks(
+            break_idxs=list(optimal_line_breaks(para_items, width, params)),
+            engine="knuth-plass",
+            fallback_reason=str(e),
+        )
+    return MonotoneLineBreaks(break_idxs=break_idxs, engine="monotone")
+
+
+class _Row(NamedTuple):
+    "Lines starting at a given break point."
+    # Range of non-forced break points at which the line may end.
+    lo: int
+    hi: int
+
+    # Index of the break point at which the start is deactivated. Equal to the number of break
+    # points if it never is.
+    dead: int
+
+    # Whether the line may end at the break point at which it is deactivated, which must be forced.
+    ends_at_dead: bool
+
+    # Range of non-forced break points at which the line may end for each fitness class, indexed
+    # by the class's value. Lines become tighter as they end later and so the ranges are in
+    # decreasing order of fitness class.
+    class_ranges: tuple[tuple[int, int], ...]
+
+
+class _StartQueue:
+    """
+    Queue of candidate starts of one fitness class and flag for lines of one fitness class, each
+    with the first line end for which it is the best.
+
+    """
+
+    def __init__(
+        self,
+        prev_fitness_class: int,
+        fitness_class: int,
+        ranges: list[tuple[int, int]],
+        demerits: Callable[[int, int, int], float],
+    ):
+        # ranges gives the line ends of this queue's fitness class for each row and demerits the
+        # total demerits of a line from a row and previous fitness class to a line end.
+        self.prev_fitness_class, self.fitness_class = prev_fitness_class, fitness_class
+        self._ranges, self._demerits = ranges, demerits
+        self._rows: list[int] = []
+        self._starts: list[int] = []
+        self._head = 0
+
+    def __len__(self) -> int:
+        return len(self._rows) - self._head
+
+    def _beats(self, new_row_idx: int, old_row_idx: int, col_idx: int) -> bool:
+        # Whether a line from new_row_idx is at least as good as one from old_row_idx. This is
+        # false and then true as col_idx increases.
+        if col_idx > self._ranges[old_row_idx][1]:
+            return True
+        if col_idx < self._ranges[new_row_idx][0]:
+            return False
+        prev_fitness_class = self.prev_fitness_class
+        return self._demerits(new_row_idx, prev_fitness_class, col_idx) <= self._demerits(
+            old_row_idx, prev_fitness_class, col_idx
+        )
+
+    def push(self, row_idx: int, col_idx: int):
+        "Add a row whose lines may end from col_idx onwards."
+        lo, hi = self._ranges[row_idx]
+        if lo > hi:
+            return
+        start_col_idx = max(lo, col_idx)
+        rows, starts = self._rows, self._starts
+        while len(rows) > self._head:
+            if self._beats(row_idx, rows[-1], starts[-1]):
+                rows.pop()
+                starts.pop()
+                continue
+
+            # Binary search for the first column at which the new row is best.
+            low, high = starts[-1] + 1, self._ranges[rows[-1]][1] + 1
+            while low < high:
+                mid = (low + high) // 2
+                if self._beats(row_idx, rows[-1], mid):
+                    high = mid
+                else:
+                    low = mid + 1
+            start_col_idx = low
+            break
+        if start_col_idx <= hi:
+            rows.append(row_idx)
+            starts.append(start_col_idx)
+
+    def best(self, col_idx: int) -> int:
+        """
+        Return the best row for a line ending at col_idx, or -1 if there is none. Rows whose lines
+        end before col_idx are dropped.
+
+        """
+        rows, starts = self._rows, self._starts
+        head = self._head
+        while head + 1 < len(rows) and starts[head + 1] <= col_idx:
+            head += 1
+        self._head = head
+        if head < len(rows) and starts[head] <= col_idx:
+            row_idx = rows[head]
+            lo, hi = self._ranges[row_idx]
+            if col_idx > hi:
+                # Later rows would start no later than the column after hi.
+                self._head = len(rows)
+            elif lo <= col_idx:
+                return row_idx
+        return -1
+
+    def clear(self):
+        del self._rows[self._head :], self._starts[self._head :]
+
+
+def _monotone_break_idxs(
+    break_points: list[BreakPoint], width: float, params: OptimiserParameters
+) -> list[int]:
+    is_forced = [break_point.penalty <= -MAX_PENALTY for break_point in break_points]
+
+    rows = _feasible_rows(break_points, width, params)
+    n_break_points = len(break_points)
+    n_classes = len(FitnessClass)
+
+    # Row 0 starts the paragraph and row r > 0 starts a line at break point r - 1. A start is a
+    # row together with the fitness class of the line ending there and has index
+    # row_idx * n_classes + fitness_class. Lines ending at forced break points or recorded as
+    # breaks of last resort are not part of the monotone structure and are searched directly.
+    def start(row_idx: int) -> Optional[BreakPoint]:
+        return break_points[row_idx - 1] if row_idx > 0 else None
+
+    start_demerits = [math.inf] * ((n_break_points + 1) * n_classes)
+    start_demerits[FitnessClass.NORMAL] = 0.0
+    prev_starts = [-1] * len(start_demerits)
+    row_flagged = [False] + [break_point.flagged for break_point in break_points]
+    fitness_classes = list(FitnessClass)
+
+    def line_demerits(
+        row_idx: int,
+        prev_fitness_class: int,
+        col_idx: int,
+        adjustment_ratio: Optional[float] = None,
+    ) -> float:
+        prev_break_point, break_point = start(row_idx), break_points[col_idx]
+        if adjustment_ratio is None:
+            adjustment_ratio = adjustment_ratio_for_line(prev_break_point, break_point, width)
+        demerit = line_demerit(
+            params,
+            prev_break_point,
+            break_point,
+            adjustment_ratio,
+            fitness_classes[prev_fitness_class],
+            fitness_class_for_adjustment_ratio(adjustment_ratio),
+        )
+        return demerit + start_demerits[row_idx * n_classes + prev_fitness_class]
+
+    # queues[flagged][prev_fitness_class][fitness_class] holds starts of prev_fitness_class at
+    # breaks which are flagged or not for lines of fitness_class. Only queues holding starts are
+    # examined at each break point.
+    class_ranges = [
+        [row.class_ranges[fitness_class] for row in rows] for fitness_class in range(n_classes)
+    ]
+    queues = [
+        [
+            [
+                _StartQueue(
+                    prev_fitness_class, fitness_class, class_ranges[fitness_class], line_demerits
+                )
+                for fitness_class in range(n_classes)
+            ]
+            for prev_fitness_class in range(n_classes)
+        ]
+        for _ in range(2)
+    ]
+    live_queues: dict[_StartQueue, None] = {}
+
+    def record_line(
+        col_demerits: list[float],
+        col_prev_starts: list[int],
+        fitness_class: int,
+        demerits: float,
+        start_idx: int,
+    ):
+        # Keep the best line of each fitness class ending at a break point. Ties are broken in
+        # favour of the earliest start so that the breaks do not depend on the order in which
+        # queues and candidates are examined.
+        if demerits < col_demerits[fitness_class] or (
+            demerits == col_demerits[fitness_class] and start_idx < col_prev_starts[fitness_class]
+        ):
+            col_demerits[fitness_class] = demerits
+            col_prev_starts[fitness_class] = start_idx
+
+    def add_start(row_idx: int, fitness_class: int):
+        for queue in queues[row_flagged[row_idx]][fitness_class]:
+            queue.push(row_idx, row_idx)
+            if len(queue) > 0:
+                live_queues[queue] = None
+
+    def add_row(row_idx: int, col_demerits: list[float], col_prev_starts: list[int]):
+        # Record the best line of each fitness class ending at the break point starting a row.
+        for fitness_class, demerits in enumerate(col_demerits):
+            if demerits < math.inf:
+                start_idx = row_idx * n_classes + fitness_class
+                start_demerits[start_idx] = demerits
+                prev_starts[start_idx] = col_prev_starts[fitness_class]
+                add_start(row_idx, fitness_class)
+
+    # Reachable rows by the break point at which they are deactivated and the latest such
+    # deactivation.
+    rows_by_dead: dict[int, list[int]] = {rows[0].dead: [0]}
+    max_dead = rows[0].dead
+    add_start(0, FitnessClass.NORMAL)
+
+    for col_idx in range(n_break_points):
+        col_demerits = [math.inf] * n_classes
+        col_prev_starts = [-1] * n_classes
+        if is_forced[col_idx] or max_dead <= col_idx:
+            # All active starts are deactivated here. The Knuth-Plass engine deactivates its
+            # active nodes in the order they were added. If none before the last may end a line
+            # here, it records a break of last resort, with an adjustment ratio of -1, for the
+            # last. Nodes are added as break points are reached, so that node is for the break
+            # starting the latest of the rows, and it is only known if it is the sole node for
+            # that break.
+            dying_row_idxs = rows_by_dead.pop(col_idx, [])
+            if len(dying_row_idxs) == 0:
+                raise _NotMonotone("a break of last resort is needed")
+            last_row_idx = max(dying_row_idxs)
+            candidates = [
+                (
+                    start_idx,
+                    adjustment_ratio_for_line(start(row_idx), break_points[col_idx], width),
+                )
+                for row_idx in dying_row_idxs
+                if is_forced[col_idx] and rows[row_idx].ends_at_dead
+                for start_idx in range(row_idx * n_classes, (row_idx + 1) * n_classes)
+                if start_demerits[start_idx] < math.inf
+            ]
+            if all(start_idx // n_classes == last_row_idx for start_idx, _ in candidates):
+                last_start_idxs = [
+                    start_idx
+                    for start_idx in range(
+                        last_row_idx * n_classes, (last_row_idx + 1) * n_classes
+                    )
+                    if start_demerits[start_idx] < math.inf
+                ]
+                if len(last_start_idxs) == 1:
+                    candidates = [(last_start_idxs[0], -1.0)]
+                elif len(candidates) == 0:
+                    raise _NotMonotone("a break of last resort is needed for one of several nodes")
+            for start_idx, adjustment_ratio in candidates:
+                line_fitness_class = fitness_class_for_adjustment_ratio(adjustment_ratio)
+                demerits = line_demerits(*divmod(start_idx, n_classes), col_idx, adjustment_ratio)
+                record_line(col_demerits, col_prev_starts, line_fitness_class, demerits, start_idx)
+            for queue in live_queues:
+                queue.clear()
+            live_queues.clear()
+        else:
+            for queue in list(live_queues):
+                row_idx = queue.best(col_idx)
+                if row_idx < 0:
+                    if len(queue) == 0:
+                        del live_queues[queue]
+                    continue
+                prev_fitness_class, fitness_class = queue.prev_fitness_class, queue.fitness_class
+                demerits = line_demerits(row_idx, prev_fitness_class, col_idx)
+                record_line(
+                    col_demerits,
+                    col_prev_starts,
+                    fitness_class,
+                    demerits,
+                    row_idx * n_classes + prev_fitness_class,
+                )
+
+        # The break point starts a new row if it can be reached.
+        if min(col_demerits) < math.inf:
+            row_idx = col_idx + 1
+            max_dead = max(max_dead, rows[row_idx].dead)
+            rows_by_dead.setdefault(rows[row_idx].dead, []).append(row_idx)
+            add_row(row_idx, col_demerits, col_prev_starts)
+
+    # Choose the best of the starts still active at the end of the paragraph, again preferring
+    # the earliest start on ties.
+    start_idx = min(
+        (
+            start_idx
+            for row_idx in rows_by_dead.get(n_break_points, [])
+            for start_idx in range(row_idx * n_classes, (row_idx + 1) * n_classes)
+        ),
+        key=lambda start_idx: (start_demerits[start_idx], start_idx),
+        default=-1,
+    )
+    if start_idx < 0 or start_demerits[start_idx] == math.inf:
+        raise _NotMonotone("a break of last resort is needed")
+    path: list[BreakPoint] = []
+    while start_idx >= n_classes:
+        path.append(break_points[start_idx // n_classes - 1])
+        start_idx = prev_starts[start_idx]
+    path.reverse()
+    return [break_point.item_idx for break_point in path]
+
+
+def _dead_col_idxs(break_points: list[BreakPoint], width: float) -> list[int]:
+    """
+    Return the break point at which each row is deactivated, i.e. the first forced break or the
+    first at which a line from the row would have to shrink by more than it can, or the number
+    of break points if there is none.
+
+    A line from a later row to the same break point is no wider and can shrink no more, so
+    provided that items are no narrower than they can shrink, rows are deactivated in order and
+    one sweep over the break points finds them all. _feasible_rows() checks this.
+
+    """
+    dead_col_idxs = []
+    col_idx = 0
+    for row_idx in range(len(break_points) + 1):
+        prev_break_point = break_points[row_idx - 1] if row_idx > 0 else None
+        col_idx = max(col_idx, row_idx)
+        while col_idx < len(break_points):
+            break_point = break_points[col_idx]
+            if (
+                break_point.penalty <= -MAX_PENALTY
+                or adjustment_ratio_for_line(prev_break_point, break_point, width) < -1.0
+            ):
+                break
+            col_idx += 1
+        dead_col_idxs.append(col_idx)
+    return dead_col_idxs
+
+
+def _blocks(lengths: list[int]) -> Iterator[tuple[int, int, int]]:
+    """
+    Yield the start, stop and greatest length of consecutive blocks of bands of the given
+    lengths such that padding each band to the greatest length takes at most _BLOCK_SIZE cells.
+
+    """
+    start, block_length = 0, 0
+    for idx, length in enumerate(lengths):
+        if idx > start and (idx - start + 1) * max(block_length, length) > _BLOCK_SIZE:
+            yield start, idx, block_length
+            start, block_length = idx, 0
+        block_length = max(block_length, length)
+    if start < len(lengths):
+        yield start, len(lengths), block_length
+
+
+def _feasible_rows(
+    break_points: list[BreakPoint], width: float, params: OptimiserParameters
+) -> list[_Row]:
+    """
+    Return the range of feasible line ends, overall and for each fitness class, for each row and
+    check that the matrix of line demerits, excluding lines ending at forced breaks, satisfies
+    the quadrangle inequality for each mismatch penalty which may be added to a line, both with
+    and without the penalty for consecutive flagged breaks.
+
+    """
+    import numpy as np
+
+    n_break_points = len(break_points)
+    n_classes = len(FitnessClass)
+    col_widths = np.array([bp.running_sum.width for bp in break_points], dtype=np.float64)
+    col_stretches = np.array([bp.running_sum.stretch for bp in break_points], dtype=np.float64)
+    col_shrinks = np.array([bp.running_sum.shrink for bp in break_points], dtype=np.float64)
+    col_break_widths = np.array([bp.width for bp in break_points], dtype=np.float64)
+    col_penalties = np.array([bp.penalty for bp in break_points], dtype=np.float64)
+    col_flagged = np.array([bp.flagged for bp in break_points], dtype=np.bool_)
+    col_is_forced = col_penalties <= -MAX_PENALTY
+    row_widths = np.concatenate(([0.0], col_widths))
+    row_stretches = np.concatenate(([0.0], col_stretches))
+    row_shrinks = np.concatenate(([0.0], col_shrinks))
+
+    # Penalties added to a line for each difference in fitness class from the previous line and
+    # for ending at a flagged break after a line which does, for each combination along the
+    # first axis.
+    mismatch_penalties = sorted(
+        {params.mismatched_fitness_penalty * difference for difference in range(n_classes)}
+    )
+    flag_penalties = sorted({0.0, params.extra_flag_penalty if np.any(col_flagged) else 0.0})
+    combination_mismatch_penalties, combination_flag_penalties = (
+        np.array(penalties, dtype=np.float64)[:, np.newaxis, np.newaxis]
+        for penalties in zip(
+            *(
+                (mismatch_penalty, flag_penalty)
+                for mismatch_penalty in mismatch_penalties
+                for flag_penalty in flag_penalties
+            )
+        )
+    )
+
+    def adjustment_ratios(row_idxs: np.ndarray, col_idxs: np.ndarray) -> np.ndarray:
+        # As adjustment_ratio_for_line() for lines from row_idxs ending at col_idxs.
+        natural_widths = col_widths[col_idxs] - row_widths[row_idxs] + col_break_widths[col_idxs]
+        slack = width - natural_widths
+        ratios = np.zeros(natural_widths.shape)
+        for mask, line_adjustments in (
+            (natural_widths < width, col_stretches[col_idxs] - row_stretches[row_idxs]),
+            (natural_widths > width, col_shrinks[col_idxs] - row_shrinks[row_idxs]),
+        ):
+            can_adjust = line_adjustments > 0
+            np.divide(slack, line_adjustments, out=ratios, where=mask & can_adjust)
+            ratios[mask & ~can_adjust] = math.inf
+        return ratios
+
+    def demerits(row_idxs: np.ndarray, col_idxs: np.ndarray) -> np.ndarray:
+        # As line_demerit() for lines from row_idxs ending at non-forced col_idxs, for each
+        # combination of mismatch and flag penalties along the first axis.
+        penalties = (
+            col_penalties[col_idxs]
+            + np.where(col_flagged[col_idxs], combination_flag_penalties, 0.0)
+            + combination_mismatch_penalties
+            + params.line_penalty
+        )
+        abs_ratios = np.abs(adjustment_ratios(row_idxs, col_idxs))
+        badnesses = 1.0 + 100.0 * (abs_ratios * abs_ratios * abs_ratios)
+        return np.where(
+            penalties >= 0.0,
+            (badnesses + penalties) * (badnesses + penalties),
+            badnesses * badnesses - penalties * penalties,
+        )
+
+    # Lines from each row are examined up to the break point at which the row is deactivated in
+    # bands of consecutive columns, a block of rows at a time.
+    dead_col_idxs = _dead_col_idxs(break_points, width)
+    row_lengths = [
+        min(dead_col_idx, n_break_points - 1) - row_idx + 1
+        for row_idx, dead_col_idx in enumerate(dead_col_idxs)
+    ]
+    row_dead_col_idxs = np.array(dead_col_idxs)
+    row_ends_at_dead = np.zeros(n_break_points + 1, dtype=np.bool_)
+    row_los = np.zeros(n_break_points + 1, dtype=np.int64)
+    row_class_counts = np.zeros((n_break_points + 1, n_classes), dtype=np.int64)
+    for start, stop, length in _blocks(row_lengths):
+        if length == 0:
+            continue
+        row_idxs = np.arange(start, stop)[:, np.newaxis]
+        col_idxs = np.minimum(row_idxs + np.arange(length), n_break_points - 1)
+        in_band = col_idxs - row_idxs < np.array(row_lengths[start:stop])[:, np.newaxis]
+        ratios = adjustment_ratios(row_idxs, col_idxs)
+        before_dead = in_band & (col_idxs < row_dead_col_idxs[start:stop, np.newaxis])
+        if (before_dead & (ratios < -1.0)).any():
+            raise _NotMonotone("line ends at which rows are deactivated move backwards")
+        feasible = (ratios >= -1.0) & (ratios < params.upper_adjustment_ratio)
+        at_dead = in_band & ~before_dead & col_is_forced[col_idxs]
+        row_ends_at_dead[start:stop] = (at_dead & feasible).any(axis=1)
+
+        # Feasible ends before the row is deactivated must be contiguous.
+        feasible &= before_dead
+        counts = feasible.sum(axis=1)
+        los = feasible.argmax(axis=1)
+        if ((counts > 0) & (length - feasible[:, ::-1].argmax(axis=1) - los != counts)).any():
+            raise _NotMonotone("feasible line ends are not contiguous")
+        row_los[start:stop] = row_idxs[:, 0] + los
+
+        # Ends of each fitness class must also be contiguous. Classes are found as by
+        # fitness_class_for_adjustment_ratio().
+        fitness_classes = (ratios >= -0.5).astype(np.int64) + (ratios >= 0.5) + (ratios >= 1.0)
+        if (
+            feasible[:, :-1] & feasible[:, 1:] & (fitness_classes[:, 1:] > fitness_classes[:, :-1])
+        ).any():
+            raise _NotMonotone("line ends of each fitness class are not contiguous")
+        for fitness_class in range(n_classes):
+            row_class_counts[start:stop, fitness_class] = (
+                feasible & (fitness_classes == fitness_class)
+            ).sum(axis=1)
+
+    rows = []
+    prev_row_idx, prev_lo, prev_hi = -1, -1, -1
+    prev_class_ranges: list[Optional[tuple[int, int]]] = [None] * n_classes
+    # Pairs of consecutive rows with feasible ends whose ranges of feasible ends overlap in at
+    # least two columns, with the first column of the overlap.
+    overlaps: list[tuple[int, int, int]] = []
+    for row_idx, (dead, ends_at_dead, lo, class_counts) in enumerate(
+        zip(
+            dead_col_idxs,
+            row_ends_at_dead.tolist(),
+            row_los.tolist(),
+            row_class_counts.tolist(),
+        )
+    ):
+        if sum(class_counts) == 0:
+            empty = (dead, dead - 1)
+            rows.append(
+                _Row(
+                    lo=dead,
+                    hi=dead - 1,
+                    dead=dead,
+                    ends_at_dead=ends_at_dead,
+                    class_ranges=(empty,) * n_classes,
+                )
+            )
+            continue
+        hi = lo + sum(class_counts) - 1
+
+        # Lines become tighter as they end later and so the ranges of each fitness class are in
+        # decreasing order of fitness class. As for all feasible ends, they must never move
+        # backwards.
+        class_ranges = []
+        class_lo = lo
+        for fitness_class in reversed(range(n_classes)):
+            class_hi = class_lo + class_counts[fitness_class] - 1
+            if class_lo <= class_hi:
+                prev_range = prev_class_ranges[fitness_class]
+                if prev_range is not None and (
+                    class_lo < prev_range[0] or class_hi < prev_range[1]
+                ):
+                    raise _NotMonotone("line ends of a fitness class move backwards")
+                prev_class_ranges[fitness_class] = (class_lo, class_hi)
+            class_ranges.append((class_lo, class_hi))
+            class_lo = class_hi + 1
+        class_ranges.reverse()
+        rows.append(
+            _Row(
+                lo=lo,
+                hi=hi,
+                dead=dead,
+                ends_at_dead=ends_at_dead,
+                class_ranges=tuple(class_ranges),
+            )
+        )
+
+        if prev_hi >= 0:
+            if lo < prev_lo or hi < prev_hi:
+                raise _NotMonotone("feasible line ends move backwards")
+            if lo < prev_hi:
+                overlaps.append((prev_row_idx, row_idx, lo))
+        prev_row_idx, prev_lo, prev_hi = row_idx, lo, hi
+
+    # Check the quadrangle inequality for each pair of rows over adjacent columns in which both
+    # rows have feasible ends. Together with the ranges of feasible ends never moving backwards,
+    # this is sufficient.
+    overlap_lengths = [rows[prev_row_idx].hi - lo for prev_row_idx, _, lo in overlaps]
+    for start, stop, length in _blocks(overlap_lengths):
+        prev_row_idxs, row_idxs, los = (
+            np.array(column)[:, np.newaxis] for column in zip(*overlaps[start:stop])
+        )
+        offsets = np.arange(length)
+        in_overlap = offsets < np.array(overlap_lengths[start:stop])[:, np.newaxis]
+        col_idxs = np.minimum(los + offsets, n_break_points - 2)
+        next_col_idxs = col_idxs + 1
+        if (
+            in_overlap
+            & (
+                demerits(prev_row_idxs, col_idxs) + demerits(row_idxs, next_col_idxs)
+                > demerits(prev_row_idxs, next_col_idxs) + demerits(row_idxs, col_idxs)
+            )
+        ).any():
+            raise _NotMonotone("line demerits do not satisfy the quadrangle inequality")
+
+    return rows
@@ -1,10 +1,36 @@
+import array
+import bisect
+import dataclasses
 import enum
+import heapq
 import math
-from typing import Generator, Iterable, NamedTuple, Optional
+import time
+from typing import TYPE_CHECKING, Generator, Iterable, NamedTuple, Optional, Union
 
-from ._types import MAX_PENALTY, ParagraphItem, ParagraphItemType
+from ._types import (
+    MAX_PENALTY,
+    ParagraphItem,
+    ParagraphItems,
+    ParagraphItemType,
+    as_paragraph_items,
+)
 
-__all__ = ["OptimiserParameters", "optimal_line_breaks"]
+if TYPE_CHECKING:
+    from ._line_layout import Line
+
+__all__ = [
+    "BreakStats",
+    "BreakTraceEntry",
+    "OptimiserParameters",
+    "PreparedParagraph",
+    "line_adjustment_ratios",
+    "optimal_line_breaks",
+]
+
+
+# Maximum number of break points considered in streaming mode before checking whether the
+# active nodes share an ancestor.
+_SETTLED_CHECK_INTERVAL = 32
 
 
 class FitnessClass(enum.IntEnum):
@@ -23,20 +49,30 @@ class RunningSum(NamedTuple):
 
 class BreakPoint(NamedTuple):
     "Record of a break point."
-    # Index of paragraph item at break point and the item itself. An index of -1 and an item of
-    # None corresponds to the start of the paragraph.
+    # Index of paragraph item at break point.
     item_idx: int
-    item: ParagraphItem
+
+    # Width added to the line by breaking here. This is only non-zero for penalty items, e.g. the
+    # width of the hyphen added when breaking at a soft hyphen.
+    width: float
+
+    # Penalty and flag of the item at the break point.
+    penalty: float
+    flagged: bool
 
     # Running sums up to this break point.
     running_sum: RunningSum
 
 
 class NodeKey(NamedTuple):
-    "Unique key for search node."
+    """
+    Unique key for search node.
+
+    Lines all have the same width and so the cost of later lines depends only on where a line
+    breaks and its fitness class, not on how many lines precede it. Paths reaching the same break
+    with the same fitness class therefore share a node which keeps the best of them.
 
-    # Index of line this break appears on. -1 == start of para
-    line_idx: int = -1
+    """
 
     # Index of para item corresponding to this line break. None == start of para
     item_idx: Optional[int] = None
@@ -45,20 +81,6 @@ class NodeKey(NamedTuple):
     fitness_class: FitnessClass = FitnessClass.NORMAL
 
 
-class NodeData(NamedTuple):
-    "Data associated with a particular path to a search node."
-
-    # The break point itself. If None, this node represents a virtual break which starts the
-    # paragraph.
-    break_point: Optional[BreakPoint] = None
-
-    # Total demerits along this path.
-    total_demerits: float = 0.0
-
-    # Previous node key and data along the path.
-    previous: Optional[tuple[NodeKey, "NodeData"]] = None
-
-
 class OptimiserParameters(NamedTuple):
     "Parameters for optimisation algorithm."
 
@@ -75,15 +97,223 @@ class OptimiserParameters(NamedTuple):
     mismatched_fitness_penalty: float = 10
 
 
+class BreakTraceEntry(NamedTuple):
+    "Record of the search at a single break point."
+    # Index of the paragraph within those recorded by the BreakStats.
+    paragraph_idx: int
+
+    # Index of paragraph item at break point.
+    item_idx: int
+
+    # Number of active nodes considered, active nodes created for feasible breaks and active
+    # nodes deactivated.
+    active_nodes: int
+    feasible_breaks: int
+    deactivations: int
+
+
+@dataclasses.dataclass
+class BreakStats:
+    """
+    Counters describing the search for optimal line breaks. Pass an instance to
+    optimal_line_breaks() to have it updated. Passing the same instance when breaking every
+    paragraph in a document gives totals for the document.
+
+    If trace is a list, a BreakTraceEntry is appended to it for each break point considered.
+
+    """
+
+    # Number of paragraphs broken.
+    paragraphs: int = 0
+
+    # Number of potential break points considered.
+    candidates: int = 0
+
+    # Number of active nodes created for feasible breaks.
+    feasible_breaks: int = 0
+
+    # Number of active nodes deactivated.
+    deactivations: int = 0
+
+    # Number of "breaks of last resort" recorded when no active nodes would otherwise remain.
+    fallback_breaks: int = 0
+
+    # Largest number and total number of active nodes considered over all break points.
+    peak_active_nodes: int = 0
+    total_active_nodes: int = 0
+
+    # Number of active nodes dropped by beam search.
+    pruned_nodes: int = 0
+
+    # Total demerits of the breaks found.
+    demerits: float = 0.0
+
+    # Excess of demerits over those of the optimal breaks. When beam search drops active nodes,
+    # the optimal breaks are also found to measure this. It is None if unknown, i.e. if a search
+    # with a time or work budget dropped active nodes or ran out of budget, as finding the optimal
+    # breaks would exceed the budget. It may be negative if dropping nodes led to breaks of last
+    # resort, whose overfull lines are scored as if they fit.
+    optimality_gap: Optional[float] = 0.0
+
+    # Time in seconds spent in each phase: finding candidates, searching and recovering the path.
+    timings: dict[str, float] = dataclasses.field(default_factory=dict)
+
+    trace: Optional[list[BreakTraceEntry]] = None
+
+    @property
+    def mean_active_nodes(self) -> float:
+        "Mean number of active nodes considered per break point."
+        return self.total_active_nodes / self.candidates if self.candidates > 0 else 0.0
+
+    def add_timing(self, phase: str, seconds: float):
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def merge(self, other: "BreakStats"):
+        "Add counters, timings and trace from other to these stats."
+        paragraph_offset = self.paragraphs
+        self.paragraphs += other.paragraphs
+        self.candidates += other.candidates
+        self.feasible_breaks += other.feasible_breaks
+        self.deactivations += other.deactivations
+        self.fallback_breaks += other.fallback_breaks
+        self.peak_active_nodes = max(self.peak_active_nodes, other.peak_active_nodes)
+        self.total_active_nodes += other.total_active_nodes
+        self.pruned_nodes += other.pruned_nodes
+        self.demerits += other.demerits
+        if self.optimality_gap is not None and other.optimality_gap is not None:
+            self.optimality_gap += other.optimality_gap
+        else:
+            self.optimality_gap = None
+        for phase, seconds in other.timings.items():
+            self.add_timing(phase, seconds)
+        if self.trace is not None and other.trace is not None:
+            self.trace.extend(
+                entry._replace(paragraph_idx=entry.paragraph_idx + paragraph_offset)
+                for entry in other.trace
+            )
+
+    def as_dict(self) -> dict:
+        "Return stats as a dict suitable for serialising as JSON."
+        d = dataclasses.asdict(self)
+        d["mean_active_nodes"] = self.mean_active_nodes
+        if self.trace is not None:
+            d["trace"] = [entry._asdict() for entry in self.trace]
+        return d
+
+
+class NodeArena:
+    """
+    Search nodes held in growable typed arrays and referred to by index. For each node, the
+    arrays hold the item index, running sums and flag of the break at which its line ends, its
+    fitness class, the total demerits along its path and the index of the previous node along the
+    path. The node at the start of a path has item index and previous node -1.
+
+    Nodes are reference counted. A node is referenced by each set of active nodes holding it and
+    by each node following it. When the last reference is released, the node's entry is reused
+    and its previous node is released in turn so that only nodes on surviving paths are kept.
+
+    """
+
+    def __init__(self):
+        self.item_idxs = array.array("q")
+        self.widths = array.array("d")
+        self.stretches = array.array("d")
+        self.shrinks = array.array("d")
+        self.flags = array.array("b")
+        self.fitness_classes = array.array("b")
+        self.total_demerits = array.array("d")
+        self.previous = array.array("q")
+        self._ref_counts = array.array("q")
+
+        # Indices of entries whose nodes have been released.
+        self._free_idxs = array.array("q")
+
+    def __len__(self) -> int:
+        "Return the number of nodes which have not been released."
+        return len(self.item_idxs) - len(self._free_idxs)
+
+    def add(
+        self,
+        break_point: Optional[BreakPoint],
+        fitness_class: FitnessClass = FitnessClass.NORMAL,
+        total_demerits: float = 0.0,
+        previous: int = -1,
+    ) -> int:
+        """
+        Add a node for a line ending at break_point, or starting the paragraph if break_point is
+        None, and return its index. The new node has one reference and references previous.
+
+        """
+        if break_point is None:
+            item_idx, running_sum, flagged = -1, RunningSum(), False
+        else:
+            item_idx, _, _, flagged, running_sum = break_point
+        if previous >= 0:
+            self._ref_counts[previous] += 1
+
+        if len(self._free_idxs) > 0:
+            node_idx = self._free_idxs.pop()
+            self.item_idxs[node_idx] = item_idx
+            self.widths[node_idx] = running_sum.width
+            self.stretches[node_idx] = running_sum.stretch
+            self.shrinks[node_idx] = running_sum.shrink
+            self.flags[node_idx] = flagged
+            self.fitness_classes[node_idx] = fitness_class
+            self.total_demerits[node_idx] = total_demerits
+            self.previous[node_idx] = previous
+            self._ref_counts[node_idx] = 1
+            return node_idx
+
+        self.item_idxs.append(item_idx)
+        self.widths.append(running_sum.width)
+        self.stretches.append(running_sum.stretch)
+        self.shrinks.append(running_sum.shrink)
+        self.flags.append(flagged)
+        self.fitness_classes.append(fitness_class)
+        self.total_demerits.append(total_demerits)
+        self.previous.append(previous)
+        self._ref_counts.append(1)
+        return len(self.item_idxs) - 1
+
+    def retain(self, node_idx: int):
+        "Add a reference to a node."
+        self._ref_counts[node_idx] += 1
+
+    def release(self, node_idx: int):
+        "Remove a reference to a node, reclaiming it and its unreferenced ancestors if unused."
+        while node_idx >= 0:
+            self._ref_counts[node_idx] -= 1
+            if self._ref_counts[node_idx] > 0:
+                return
+            self._free_idxs.append(node_idx)
+            node_idx = self.previous[node_idx]
+
+    def path_item_idxs(self, node_idx: int) -> list[int]:
+        "Return item indices of the breaks along the path ending at a node."
+        # The node at the start of the path, either the start of the paragraph or a break
+        # returned by settle_breaks(), has no previous node and is not included.
+        path_item_idxs = []
+        while self.previous[node_idx] >= 0:
+            path_item_idxs.append(self.item_idxs[node_idx])
+            node_idx = self.previous[node_idx]
+        return path_item_idxs[::-1]
+
+    def path_node_idxs(self, node_idx: int) -> list[int]:
+        "Return indices of the nodes along the path ending at a node, including its start node."
+        path_node_idxs = [node_idx]
+        while self.previous[node_idx] >= 0:
+            node_idx = self.previous[node_idx]
+            path_node_idxs.append(node_idx)
+        return path_node_idxs[::-1]
+
+
 def adjustment_ratio_for_line(
     prev_break_point: Optional[BreakPoint], break_point: BreakPoint, width: float
 ) -> float:
     prev_sums = prev_break_point.running_sum if prev_break_point is not None else RunningSum()
 
     # Compute natural width of line.
-    natural_width = break_point.running_sum.width - prev_sums.width
-    if break_point.item.item_type == ParagraphItemType.PENALTY:
-        natural_width += break_point.item.width
+    natural_width = break_point.running_sum.width - prev_sums.width + break_point.width
 
     # Compute adjustment ratio implied by line.
     if natural_width < width:
@@ -96,6 +326,22 @@ def adjustment_ratio_for_line(
     return 0.0
 
 
+def line_adjustment_ratios(
+    para_items: Iterable[ParagraphItem], break_idxs: Iterable[int], width: float
+) -> list[float]:
+    "Return the adjustment ratio of each line when para_items are broken at break_idxs."
+    break_idx_set = set(break_idxs)
+    adjustment_ratios: list[float] = []
+    prev_break_point: Optional[BreakPoint] = None
+    for break_point in potential_breaks(para_items):
+        if break_point.item_idx in break_idx_set:
+            adjustment_ratios.append(
+                adjustment_ratio_for_line(prev_break_point, break_point, width)
+            )
+            prev_break_point = break_point
+    return adjustment_ratios
+
+
 def fitness_class_for_adjustment_ratio(adjustment_ratio: float) -> FitnessClass:
     if adjustment_ratio < -0.5:
         return FitnessClass.TIGHT
@@ -114,17 +360,34 @@ def line_demerit(
     adjustment_ratio: float,
     prev_fitness_class: FitnessClass,
     fitness_class: FitnessClass,
+) -> float:
+    return _line_demerit(
+        params,
+        prev_break_point is not None and prev_break_point.flagged,
+        break_point,
+        adjustment_ratio,
+        prev_fitness_class,
+        fitness_class,
+    )
+
+
+def _line_demerit(
+    params: OptimiserParameters,
+    prev_flagged: bool,
+    break_point: BreakPoint,
+    adjustment_ratio: float,
+    prev_fitness_class: FitnessClass,
+    fitness_class: FitnessClass,
 ) -> float:
     # Start with the base item penalty.
-    penalty = break_point.item.penalty
+    penalty = break_point.penalty
 
     is_forced_break = penalty <= -MAX_PENALTY
 
     # If the previous line break was flagged and this line break
     # was flagged, add an additional penalty.
-    if prev_break_point is not None:
-        if break_point.item.flagged and prev_break_point.item.flagged:
-            penalty += params.extra_flag_penalty
+    if break_point.flagged and prev_flagged:
+        penalty += params.extra_flag_penalty
 
     # If we move more than 1 step of fitness class, add penalty.
     penalty += params.mismatched_fitness_penalty * abs(fitness_class - prev_fitness_class)
@@ -132,31 +395,80 @@ def line_demerit(
     # Add a fixed penalty for breaking lines.
     penalty += params.line_penalty
 
-    # Compute demerit for this line.
+    # Compute demerit for this line. Powers are written as products so that the vectorised
+    # implementation in _optimal_numpy, which must agree exactly, can use the same arithmetic.
+    abs_ratio = abs(adjustment_ratio)
+    badness = 1.0 + 100.0 * (abs_ratio * abs_ratio * abs_ratio)
     if is_forced_break:
-        return (1.0 + 100.0 * (abs(adjustment_ratio) ** 3)) ** 2
+        return badness * badness
     elif penalty >= 0.0:
-        return (1.0 + 100.0 * (abs(adjustment_ratio) ** 3) + penalty) ** 2
+        return (badness + penalty) * (badness + penalty)
     else:
-        return (1.0 + 100.0 * (abs(adjustment_ratio) ** 3)) ** 2 - (penalty**2)
+        return badness * badness - penalty * penalty
+
+
+def potential_breaks(
+    para_items: Iterable[ParagraphItem], start_idx: int = 0, running_sum: RunningSum = RunningSum()
+) -> Generator[BreakPoint, None, None]:
+    """
+    Yield potential break points in para_items. If start_idx is non-zero, only items from
+    start_idx onwards are considered and running_sum gives the running sums before that item.
 
+    """
+    glue, penalty = ParagraphItemType.GLUE.value, ParagraphItemType.PENALTY.value
+    box = ParagraphItemType.BOX.value
 
-def potential_breaks(para_items: Iterable[ParagraphItem]) -> Generator[BreakPoint, None, None]:
-    prev_was_box = False
-    total_width, total_stretch, total_shrink = 0.0, 0.0, 0.0
+    item_fields: Iterable[tuple[int, float, float, float, float, int]]
+    if start_idx == 0 and not isinstance(para_items, ParagraphItems):
+        # Items are read as break points are needed so that streaming does not wait for them all.
+        prev_was_box = False
+        item_fields = (
+            (
+                item.item_type.value,
+                item.width,
+                item.stretchability,
+                item.shrinkability,
+                item.penalty,
+                item.flagged,
+            )
+            for item in para_items
+        )
+    else:
+        items = as_paragraph_items(para_items)
+        prev_was_box = start_idx > 0 and items.item_types[start_idx - 1] == box
+        item_fields = zip(
+            items.item_types[start_idx:],
+            items.widths[start_idx:],
+            items.stretchabilities[start_idx:],
+            items.shrinkabilities[start_idx:],
+            items.penalties[start_idx:],
+            items.flags[start_idx:],
+        )
+    total_width, total_stretch, total_shrink = running_sum
 
-    for item_idx, item in enumerate(para_items):
-        # Determine if this is a potential breakpoint.
-        is_potential_breakpoint = False
-        if item.item_type == ParagraphItemType.GLUE:
+    for item_idx, (
+        item_type,
+        item_width,
+        item_stretch,
+        item_shrink,
+        item_penalty,
+        item_flag,
+    ) in enumerate(item_fields, start_idx):
+        # Determine if this is a potential breakpoint. Breaking at a penalty adds the penalty's
+        # width to the line.
+        is_potential_breakpoint, break_width = False, 0.0
+        if item_type == glue:
             is_potential_breakpoint = prev_was_box
-        elif item.item_type == ParagraphItemType.PENALTY:
-            is_potential_breakpoint = item.penalty < MAX_PENALTY
+        elif item_type == penalty:
+            is_potential_breakpoint = item_penalty < MAX_PENALTY
+            break_width = item_width
 
         if is_potential_breakpoint:
             yield BreakPoint(
                 item_idx=item_idx,
-                item=item,
+                width=break_width,
+                penalty=item_penalty,
+                flagged=bool(item_flag),
                 running_sum=RunningSum(
                     width=total_width,
                     stretch=total_stretch,
@@ -165,87 +477,601 @@ def potential_breaks(para_items: Iterable[ParagraphItem]) -> Generator[BreakPoin
             )
 
         # Update running totals
-        if item.item_type != ParagraphItemType.PENALTY:
-            total_width += item.width
-        if item.item_type == ParagraphItemType.GLUE:
-            total_stretch += item.stretchability
-            total_shrink += item.shrinkability
+        if item_type != penalty:
+            total_width += item_width
+        if item_type == glue:
+            total_stretch += item_stretch
+            total_shrink += item_shrink
 
         # Update flag indicating if the previous item was a box.
-        prev_was_box = item.item_type == ParagraphItemType.BOX
+        prev_was_box = item_type == box
+
+
+class PreparedParagraph:
+    """
+    Paragraph items with their potential break points and the running sums at each break point
+    computed once. A PreparedParagraph can be passed to optimal_line_breaks() and
+    greedy_line_breaks() in place of the items to break the same paragraph at many widths or
+    with many parameters without repeating that work.
+
+    """
+
+    def __init__(self, para_items: Iterable[ParagraphItem]):
+        self.items = as_paragraph_items(para_items)
+        self.break_points = list(potential_breaks(self.items))
+
+        # Item index, width added by breaking, running width before and running width after the
+        # item for each break point. The greedy engine reads these rather than the break points.
+        self.break_item_idxs = array.array("q")
+        self.break_widths = array.array("d")
+        self.running_widths = array.array("d")
+        self.running_widths_after = array.array("d")
+        penalty = ParagraphItemType.PENALTY.value
+        for break_point in self.break_points:
+            running_width = break_point.running_sum.width
+            self.break_item_idxs.append(break_point.item_idx)
+            self.break_widths.append(break_point.width)
+            self.running_widths.append(running_width)
+            if self.items.item_types[break_point.item_idx] != penalty:
+                running_width += self.items.widths[break_point.item_idx]
+            self.running_widths_after.append(running_width)
+
+    def line_breaks(self, width: float, params: Optional[OptimiserParameters] = None) -> list[int]:
+        "Return indices in items of the optimal line breaks for width."
+        return list(optimal_line_breaks(self, width, params))
+
+    def line_count(self, width: float, params: Optional[OptimiserParameters] = None) -> int:
+        "Return the number of lines when optimally broken at width."
+        return len(self.line_breaks(width, params))
+
+    def natural_width(self) -> float:
+        "Return the width of the paragraph set on a single line without stretching or shrinking."
+        if len(self.break_points) == 0:
+            return 0.0
+        return self.running_widths[-1] + self.break_widths[-1]
+
+    def narrowest_width_for(
+        self,
+        n_lines: int,
+        params: Optional[OptimiserParameters] = None,
+        *,
+        tolerance: float = 0.01,
+    ) -> float:
+        """
+        Return, to within tolerance, the narrowest width at which the paragraph is optimally
+        broken into at most n_lines lines. The search bisects on width and so assumes that the
+        number of lines does not increase as the width increases.
+
+        """
+        if n_lines < 1:
+            raise ValueError("n_lines must be at least one")
+
+        low, high = 0.0, self.natural_width()
+        if self.line_count(low, params) <= n_lines:
+            return low
+        while high - low > tolerance:
+            mid = 0.5 * (low + high)
+            if self.line_count(mid, params) <= n_lines:
+                high = mid
+            else:
+                low = mid
+        return high
+
+    def shrink_to_fit(
+        self,
+        width: float,
+        params: Optional[OptimiserParameters] = None,
+        *,
+        tolerance: float = 0.01,
+    ) -> float:
+        """
+        Return, to within tolerance, the narrowest width no greater than width at which the
+        paragraph is broken into no more lines than at width. This balances the lengths of lines
+        in, e.g., headings and captions.
+
+        """
+        n_lines = self.line_count(width, params)
+        return min(width, self.narrowest_width_for(n_lines, params, tolerance=tolerance))
 
 
 def optimal_line_breaks(
-    para_items: Iterable[ParagraphItem], width: float, params: Optional[OptimiserParameters] = None
+    para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+    width: float,
+    params: Optional[OptimiserParameters] = None,
+    *,
+    vectorized: bool = False,
+    stats: Optional[BreakStats] = None,
+    streaming: bool = False,
+    beam_width: Optional[int] = None,
+    time_budget: Optional[float] = None,
+    work_budget: Optional[int] = None,
+    lines: Optional[list["Line"]] = None,
 ) -> Generator[int, None, None]:
-    params = params if params is not None else OptimiserParameters()
-    active_nodes: dict[NodeKey, NodeData] = {}
+    """
+    Return sequence of indices in para_items for optimal line breaks.
 
-    # Add an active node corresponding to the start of the paragraph.
-    active_nodes[NodeKey()] = NodeData()
+    If vectorized is True, the active nodes are evaluated as a batch using NumPy. This gives the
+    same breaks but is faster when many nodes are active, e.g. for narrow columns or large
+    values of upper_adjustment_ratio.
 
-    for break_point in potential_breaks(para_items):
-        # We have to copy active_nodes.items() since we modify the dict inside the loop.
-        for node_key, node_data in list(active_nodes.items()):
-            adjustment_ratio = adjustment_ratio_for_line(node_data.break_point, break_point, width)
-
-            # Deactivate nodes where we're considering endpoints so far away that glue would have
-            # to be shrunken too far or if this breakpoint is a forced breakpoint and so later
-            # lines could never start at the node.
-            if adjustment_ratio < -1.0 or break_point.item.penalty <= -MAX_PENALTY:
-                del active_nodes[node_key]
-
-                # If this removes all active nodes, make sure we record the next break as feasible.
-                # This is a "break of last resort" to make sure we find _some_ solution.
-                if len(active_nodes) == 0:
-                    adjustment_ratio = -1.0
-
-            # If this line is not stretched or shrunk too much, record it as a feasible breakpoint.
-            if adjustment_ratio >= -1.0 and adjustment_ratio < params.upper_adjustment_ratio:
-                fitness_class = fitness_class_for_adjustment_ratio(adjustment_ratio)
-
-                # Compute additional demerit if we were to break here.
-                demerit = line_demerit(
-                    params,
-                    node_data.break_point,
-                    break_point,
-                    adjustment_ratio,
-                    fitness_class,
-                    node_key.fitness_class,
+    If streaming is True, breaks are yielded as soon as every active node's path passes through
+    them, e.g. after forced breaks, rather than once the whole paragraph has been considered.
+    Paths before such breaks are released so memory does not grow with the length of the input.
+    Streaming is not supported by the vectorized engine.
+
+    If beam_width is passed, the search keeps at most beam_width active nodes for earlier break
+    points, in addition to those for the break point just considered. Nodes are ranked by total
+    demerits within their fitness class and kept in order of rank so that each fitness class
+    stays represented. The result may then not be optimal. The search can further be limited to
+    time_budget seconds or work_budget evaluations of active nodes. If spending runs ahead of
+    progress through the paragraph, the beam narrows so that the rest of the budget lasts the
+    rest of the paragraph. Once the budget is spent, the breaks follow the best path found so far
+    and then each line is filled until the next word would make it too wide. Beam search is not
+    supported by the vectorized or streaming engines. If stats is passed and nodes were dropped
+    without a budget, the optimal breaks are also found to measure stats.optimality_gap.
+
+    If stats is passed, it is updated with counters and timings for the search. Timings are not
+    recorded when streaming.
+
+    If lines is a list, a Line describing how each line is set is appended to it, read from the
+    nodes along the best path. Lines are not supported by the vectorized, streaming or beam
+    search engines.
+
+    """
+    # Arguments are checked here, rather than in the generator, so that errors are raised when
+    # optimal_line_breaks() is called.
+    if beam_width is None and (time_budget is not None or work_budget is not None):
+        raise ValueError("time_budget and work_budget require beam_width")
+    if beam_width is not None and beam_width < 1:
+        raise ValueError("beam_width must be at least one")
+    if beam_width is not None and (vectorized or streaming):
+        raise ValueError("beam search is not supported by the vectorized or streaming engines")
+    if streaming and vectorized:
+        raise ValueError("streaming is not supported by the vectorized engine")
+    if lines is not None and (vectorized or streaming or beam_width is not None):
+        raise ValueError(
+            "lines are not supported by the vectorized, streaming or beam search engines"
+        )
+    return _optimal_line_breaks(
+        para_items,
+        width,
+        params if params is not None else OptimiserParameters(),
+        vectorized,
+        stats,
+        streaming,
+        beam_width,
+        time_budget,
+        work_budget,
+        lines,
+    )
+
+
+def _optimal_line_breaks(
+    para_items: Union[Iterable[ParagraphItem], PreparedParagraph],
+    width: float,
+    params: OptimiserParameters,
+    vectorized: bool,
+    stats: Optional[BreakStats],
+    streaming: bool,
+    beam_width: Optional[int],
+    time_budget: Optional[float],
+    work_budget: Optional[int],
+    lines: Optional[list["Line"]],
+) -> Generator[int, None, None]:
+    break_points: Iterable[BreakPoint]
+    if isinstance(para_items, PreparedParagraph):
+        break_points = para_items.break_points
+    else:
+        if lines is not None:
+            # Items are needed again to set the lines.
+            para_items = as_paragraph_items(para_items)
+        break_points = potential_breaks(para_items)
+
+    if stats is not None:
+        # Find all candidates up front so that the time taken can be separated from the search.
+        start_time = time.perf_counter()
+        break_points = list(break_points)
+        stats.add_timing("candidates", time.perf_counter() - start_time)
+        stats.paragraphs += 1
+
+    if beam_width is not None:
+        yield from _beam_optimal_line_breaks(
+            list(break_points), width, params, stats, beam_width, time_budget, work_budget
+        )
+        return
+
+    if streaming:
+        yield from _streaming_optimal_line_breaks(break_points, width, params, stats)
+        return
+
+    if vectorized:
+        from ._optimal_numpy import vectorized_optimal_line_breaks
+
+        yield from vectorized_optimal_line_breaks(break_points, width, params, stats)
+        return
+
+    arena = NodeArena()
+    if stats is None and lines is None:
+        active_nodes = initial_active_nodes(arena)
+        for break_point in break_points:
+            add_break_point(arena, active_nodes, break_point, width, params)
+        yield from optimal_break_idxs(arena, active_nodes)
+        return
+
+    start_time = time.perf_counter()
+    active_nodes = initial_active_nodes(arena)
+    for break_point in break_points:
+        add_break_point(arena, active_nodes, break_point, width, params, stats)
+    path_start_time = time.perf_counter()
+    break_idxs = optimal_break_idxs(arena, active_nodes, stats)
+    if lines is not None:
+        from ._line_layout import path_lines
+
+        items = para_items.items if isinstance(para_items, PreparedParagraph) else para_items
+        assert isinstance(items, ParagraphItems)
+        lines.extend(path_lines(items, arena, best_active_node(arena, active_nodes), width))
+    if stats is not None:
+        stats.add_timing("search", path_start_time - start_time)
+        stats.add_timing("path", time.perf_counter() - path_start_time)
+    yield from break_idxs
+
+
+def _beam_optimal_line_breaks(
+    break_points: list[BreakPoint],
+    width: float,
+    params: OptimiserParameters,
+    stats: Optional[BreakStats],
+    beam_width: int,
+    time_budget: Optional[float],
+    work_budget: Optional[int],
+) -> list[int]:
+    start_time = time.perf_counter()
+    arena = NodeArena()
+    active_nodes = initial_active_nodes(arena)
+    limit, n_pruned, n_evaluations = beam_width, 0, 0
+    greedy_start_idx: Optional[int] = None
+    for break_point_idx, break_point in enumerate(break_points):
+        if time_budget is not None or work_budget is not None:
+            # Fractions of the budgets spent. An empty budget is spent from the start.
+            spent = 0.0
+            if time_budget is not None:
+                elapsed = time.perf_counter() - start_time
+                spent = elapsed / time_budget if time_budget > 0 else math.inf
+            if work_budget is not None:
+                spent = max(spent, n_evaluations / work_budget if work_budget > 0 else math.inf)
+            if spent >= 1.0:
+                greedy_start_idx = break_point_idx
+                break
+            limit = _beam_limit(beam_width, break_point_idx / len(break_points), spent)
+
+        n_evaluations += len(active_nodes)
+        add_break_point(arena, active_nodes, break_point, width, params, stats)
+        if len(active_nodes) > limit:
+            n_pruned += prune_active_nodes(arena, active_nodes, break_point.item_idx, limit)
+
+    path_start_time = time.perf_counter()
+    if greedy_start_idx is None:
+        best_idx = best_active_node(arena, active_nodes)
+        total_demerits = arena.total_demerits[best_idx]
+        break_idxs = arena.path_item_idxs(best_idx)
+    else:
+        # Continue greedily from the end of the best path found so far.
+        best_idx = min(active_nodes.values(), key=arena.total_demerits.__getitem__)
+        n_pruned += len(active_nodes) - 1
+        break_idxs = arena.path_item_idxs(best_idx)
+        prev_break_point = None
+        if arena.item_idxs[best_idx] >= 0:
+            greedy_start_idx = bisect.bisect_right(
+                break_points, arena.item_idxs[best_idx], key=lambda bp: bp.item_idx
+            )
+            prev_break_point = break_points[greedy_start_idx - 1]
+        else:
+            greedy_start_idx = 0
+        greedy_break_idxs, greedy_demerits = _greedy_break_idxs(
+            break_points[greedy_start_idx:],
+            prev_break_point,
+            FitnessClass(arena.fitness_classes[best_idx]),
+            width,
+            params,
+        )
+        break_idxs.extend(greedy_break_idxs)
+        total_demerits = arena.total_demerits[best_idx] + greedy_demerits
+
+    if stats is not None:
+        stats.demerits += total_demerits
+        stats.pruned_nodes += n_pruned
+        stats.add_timing("search", path_start_time - start_time)
+        stats.add_timing("path", time.perf_counter() - path_start_time)
+        if n_pruned > 0 or greedy_start_idx is not None:
+            if time_budget is None and work_budget is None and stats.optimality_gap is not None:
+                gap_start_time = time.perf_counter()
+                stats.optimality_gap += total_demerits - _optimal_demerits(
+                    break_points, width, params
                 )
+                stats.add_timing("optimality gap", time.perf_counter() - gap_start_time)
+            else:
+                stats.optimality_gap = None
+    return break_idxs
+
+
+def _optimal_demerits(
+    break_points: list[BreakPoint], width: float, params: OptimiserParameters
+) -> float:
+    "Return the total demerits of the optimal breaks, found without pruning."
+    arena = NodeArena()
+    active_nodes = initial_active_nodes(arena)
+    for break_point in break_points:
+        add_break_point(arena, active_nodes, break_point, width, params)
+    return arena.total_demerits[best_active_node(arena, active_nodes)]
+
+
+def _beam_limit(beam_width: int, progress: float, spent: float) -> int:
+    "Return the number of nodes to keep given the fractions of break points and budget used."
+    if spent <= progress:
+        return beam_width
+
+    # Work at each break point is roughly proportional to the number of active nodes.
+    return max(1, int(beam_width * (1.0 - spent) / (1.0 - progress)))
+
+
+def _greedy_break_idxs(
+    break_points: list[BreakPoint],
+    prev_break_point: Optional[BreakPoint],
+    prev_fitness_class: FitnessClass,
+    width: float,
+    params: OptimiserParameters,
+) -> tuple[list[int], float]:
+    """
+    Return item indices of breaks in break_points for lines following prev_break_point, each
+    filled until the next break point would make it too wide, and their total demerits.
+
+    """
+    break_idxs, total_demerits = [], 0.0
+    for break_point_idx, break_point in enumerate(break_points):
+        if break_point.penalty > -MAX_PENALTY:
+            # Only break if the line would otherwise be too wide at the next break point.
+            if break_point_idx == len(break_points) - 1:
+                continue
+            next_break_point = break_points[break_point_idx + 1]
+            prev_width = (
+                prev_break_point.running_sum.width if prev_break_point is not None else 0.0
+            )
+            natural_width = (
+                next_break_point.running_sum.width - prev_width + next_break_point.width
+            )
+            if natural_width <= width:
+                continue
+
+        # Overfull lines are scored as breaks of last resort are.
+        adjustment_ratio = max(
+            -1.0, adjustment_ratio_for_line(prev_break_point, break_point, width)
+        )
+        fitness_class = fitness_class_for_adjustment_ratio(adjustment_ratio)
+        total_demerits += line_demerit(
+            params,
+            prev_break_point,
+            break_point,
+            adjustment_ratio,
+            fitness_class,
+            prev_fitness_class,
+        )
+        break_idxs.append(break_point.item_idx)
+        prev_break_point, prev_fitness_class = break_point, fitness_class
+
+    return break_idxs, total_demerits
 
-                # Compute total demerits from breaking here.
-                total_demerits = demerit + node_data.total_demerits
 
-                break_node_key = NodeKey(
-                    line_idx=node_key.line_idx + 1,
-                    item_idx=break_point.item_idx,
-                    fitness_class=fitness_class,
+def prune_active_nodes(
+    arena: NodeArena, active_nodes: dict[NodeKey, int], item_idx: int, limit: int
+) -> int:
+    """
+    Release all but limit of the active nodes for breaks before item_idx and return the number
+    released. Nodes are ranked by total demerits within their fitness class and the best ranked
+    are kept, taking ties between fitness classes in order of total demerits.
+
+    Nodes for the break at item_idx are always kept so that lines can start there.
+
+    """
+    total_demerits, fitness_classes = arena.total_demerits, arena.fitness_classes
+    by_fitness_class: list[list[tuple[float, int, NodeKey]]] = [[] for _ in FitnessClass]
+    for node_key, node_idx in active_nodes.items():
+        if node_key.item_idx != item_idx:
+            by_fitness_class[fitness_classes[node_idx]].append(
+                (total_demerits[node_idx], node_idx, node_key)
+            )
+
+    ranked_nodes: list[tuple[int, float, int, NodeKey]] = []
+    for class_nodes in by_fitness_class:
+        class_nodes.sort()
+        ranked_nodes.extend((rank, *node) for rank, node in enumerate(class_nodes))
+    if len(ranked_nodes) <= limit:
+        return 0
+
+    ranked_nodes.sort()
+    for _, _, node_idx, node_key in ranked_nodes[limit:]:
+        del active_nodes[node_key]
+        arena.release(node_idx)
+    return len(ranked_nodes) - limit
+
+
+def _streaming_optimal_line_breaks(
+    break_points: Iterable[BreakPoint],
+    width: float,
+    params: OptimiserParameters,
+    stats: Optional[BreakStats],
+) -> Generator[int, None, None]:
+    arena = NodeArena()
+    active_nodes = initial_active_nodes(arena)
+    n_unchecked = 0
+    for break_point in break_points:
+        add_break_point(arena, active_nodes, break_point, width, params, stats)
+
+        # Active nodes are likely to share an ancestor after a forced break or if only one remains.
+        n_unchecked += 1
+        if (
+            break_point.penalty <= -MAX_PENALTY
+            or len(active_nodes) == 1
+            or n_unchecked >= _SETTLED_CHECK_INTERVAL
+        ):
+            n_unchecked = 0
+            yield from settle_breaks(arena, active_nodes)
+
+    yield from optimal_break_idxs(arena, active_nodes, stats)
+
+
+def settle_breaks(arena: NodeArena, active_nodes: dict[NodeKey, int]) -> list[int]:
+    """
+    Return item indices of breaks which all paths through active_nodes share and which have not
+    been returned before. The paths are truncated at the latest such break which then has no
+    previous node.
+
+    """
+    item_idxs, previous = arena.item_idxs, arena.previous
+
+    # Step back along paths from the node with the latest break until all paths meet.
+    node_idxs = set(active_nodes.values())
+    heap = [(-item_idxs[node_idx], node_idx) for node_idx in node_idxs]
+    heapq.heapify(heap)
+    while len(node_idxs) > 1:
+        _, node_idx = heapq.heappop(heap)
+        node_idxs.remove(node_idx)
+        prev_idx = previous[node_idx]
+        if prev_idx < 0:
+            return []
+        if prev_idx not in node_idxs:
+            node_idxs.add(prev_idx)
+            heapq.heappush(heap, (-item_idxs[prev_idx], prev_idx))
+
+    (ancestor_idx,) = node_idxs
+    prev_idx = previous[ancestor_idx]
+    if prev_idx < 0:
+        return []
+    settled_idxs = arena.path_item_idxs(ancestor_idx)
+
+    # Truncate paths at the shared ancestor so that earlier nodes are reclaimed.
+    previous[ancestor_idx] = -1
+    arena.release(prev_idx)
+    return settled_idxs
+
+
+def initial_active_nodes(arena: NodeArena) -> dict[NodeKey, int]:
+    "Return the active nodes, as indices in arena, before any break point is considered."
+    # Add an active node corresponding to the start of the paragraph.
+    return {NodeKey(): arena.add(None)}
+
+
+def add_break_point(
+    arena: NodeArena,
+    active_nodes: dict[NodeKey, int],
+    break_point: BreakPoint,
+    width: float,
+    params: OptimiserParameters,
+    stats: Optional[BreakStats] = None,
+):
+    "Update active_nodes, adding nodes to arena, in place to consider breaking at break_point."
+    if stats is not None:
+        n_active_nodes = len(active_nodes)
+        n_feasible_breaks, n_deactivations = stats.feasible_breaks, stats.deactivations
+        stats.candidates += 1
+        stats.total_active_nodes += n_active_nodes
+        stats.peak_active_nodes = max(stats.peak_active_nodes, n_active_nodes)
+
+    widths, stretches, shrinks = arena.widths, arena.stretches, arena.shrinks
+    flags, fitness_classes = arena.flags, arena.fitness_classes
+    node_demerits = arena.total_demerits
+    running_width, running_stretch, running_shrink = break_point.running_sum
+    break_width = break_point.width
+
+    # We have to copy active_nodes.items() since we modify the dict inside the loop.
+    for node_key, node_idx in list(active_nodes.items()):
+        # Compute the adjustment ratio as adjustment_ratio_for_line() does but from the running
+        # sums held in the arena.
+        natural_width = running_width - widths[node_idx] + break_width
+        if natural_width < width:
+            line_stretch = running_stretch - stretches[node_idx]
+            adjustment_ratio = (
+                (width - natural_width) / line_stretch if line_stretch > 0 else math.inf
+            )
+        elif natural_width > width:
+            line_shrink = running_shrink - shrinks[node_idx]
+            adjustment_ratio = (
+                (width - natural_width) / line_shrink if line_shrink > 0 else math.inf
+            )
+        else:
+            adjustment_ratio = 0.0
+
+        # Deactivate nodes where we're considering endpoints so far away that glue would have
+        # to be shrunken too far or if this breakpoint is a forced breakpoint and so later
+        # lines could never start at the node. The node is released once any break from it has
+        # been recorded.
+        is_deactivated = adjustment_ratio < -1.0 or break_point.penalty <= -MAX_PENALTY
+        if is_deactivated:
+            del active_nodes[node_key]
+            if stats is not None:
+                stats.deactivations += 1
+
+            # If this removes all active nodes, make sure we record the next break as feasible.
+            # This is a "break of last resort" to make sure we find _some_ solution.
+            if len(active_nodes) == 0:
+                adjustment_ratio = -1.0
+                if stats is not None:
+                    stats.fallback_breaks += 1
+
+        # If this line is not stretched or shrunk too much, record it as a feasible breakpoint.
+        if adjustment_ratio >= -1.0 and adjustment_ratio < params.upper_adjustment_ratio:
+            fitness_class = fitness_class_for_adjustment_ratio(adjustment_ratio)
+
+            # Compute additional demerit if we were to break here.
+            demerit = _line_demerit(
+                params,
+                flags[node_idx],
+                break_point,
+                adjustment_ratio,
+                fitness_class,
+                fitness_classes[node_idx],
+            )
+
+            # Compute total demerits from breaking here.
+            total_demerits = demerit + node_demerits[node_idx]
+
+            break_node_key = NodeKey(item_idx=break_point.item_idx, fitness_class=fitness_class)
+
+            existing_idx = active_nodes.get(break_node_key)
+            if existing_idx is None or node_demerits[existing_idx] > total_demerits:
+                active_nodes[break_node_key] = arena.add(
+                    break_point, fitness_class, total_demerits, node_idx
                 )
+                if existing_idx is not None:
+                    arena.release(existing_idx)
+                elif stats is not None:
+                    stats.feasible_breaks += 1
+
+        if is_deactivated:
+            arena.release(node_idx)
+
+    if stats is not None and stats.trace is not None:
+        stats.trace.append(
+            BreakTraceEntry(
+                paragraph_idx=stats.paragraphs - 1,
+                item_idx=break_point.item_idx,
+                active_nodes=n_active_nodes,
+                feasible_breaks=stats.feasible_breaks - n_feasible_breaks,
+                deactivations=stats.deactivations - n_deactivations,
+            )
+        )
+
+
+def optimal_break_idxs(
+    arena: NodeArena, active_nodes: dict[NodeKey, int], stats: Optional[BreakStats] = None
+) -> list[int]:
+    "Return the item indices of the breaks along the best path through the active nodes."
+    best_idx = best_active_node(arena, active_nodes)
+    if stats is not None:
+        stats.demerits += arena.total_demerits[best_idx]
+    return arena.path_item_idxs(best_idx)
 
-                existing_data = active_nodes.get(break_node_key)
-                if existing_data is None or existing_data.total_demerits > total_demerits:
-                    break_node_data = NodeData(
-                        break_point=break_point,
-                        total_demerits=total_demerits,
-                        previous=(node_key, node_data),
-                    )
-                    active_nodes[break_node_key] = break_node_data
 
-    # Find the optimal remaining active node.
+def best_active_node(arena: NodeArena, active_nodes: dict[NodeKey, int]) -> int:
+    "Return the index of the active node with the lowest total demerits."
     assert len(active_nodes) > 0
-    node: Optional[tuple[NodeKey, NodeData]] = None
-    for nk, nd in active_nodes.items():
-        if node is None or nd.total_demerits < node[1].total_demerits:
-            node = (nk, nd)
-    assert node is not None
-
-    # Find best path.
-    optimal_line_break_idxs = []
-    while node is not None:
-        nk, nd = node
-        if nk.item_idx is not None:
-            optimal_line_break_idxs.append(nk.item_idx)
-        node = nd.previous
-
-    yield from reversed(optimal_line_break_idxs)
+    return min(active_nodes.values(), key=arena.total_demerits.__getitem__)
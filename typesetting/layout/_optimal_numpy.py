@@ -0,0 +1,194 @@
+"""
+Vectorised evaluation of the active node set for optimal_line_breaks().
+
+The active nodes are held in parallel NumPy arrays rather than a dict of NodeKey to node index so
+that, for each potential break point, adjustment ratios, fitness classes, demerits and the
+deactivation mask can be computed for the whole active set at once. The arithmetic and the order
+in which nodes are considered mirror the scalar implementation in _optimal exactly so that both
+produce the same breaks.
+
+"""
+import math
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+from ._optimal import BreakPoint, BreakStats, BreakTraceEntry, OptimiserParameters
+from ._types import MAX_PENALTY
+
+# Upper bounds of the TIGHT, NORMAL and LOOSE fitness classes. See
+# fitness_class_for_adjustment_ratio().
+_FITNESS_CLASS_BOUNDS = np.array([-0.5, 0.5, 1.0])
+
+
+def vectorized_optimal_line_breaks(
+    break_points: Iterable[BreakPoint],
+    width: float,
+    params: OptimiserParameters,
+    stats: Optional[BreakStats] = None,
+) -> list[int]:
+    start_time = time.perf_counter()
+
+    # Running sums at the break point which starts the line for each active node.
+    node_widths = np.zeros(1)
+    node_stretches = np.zeros(1)
+    node_shrinks = np.zeros(1)
+
+    # Whether the break point for each node was flagged, the fitness class of the line ending at
+    # the node and the total demerits along the path.
+    node_flags = np.zeros(1, dtype=bool)
+    node_fitness_classes = np.ones(1, dtype=np.int64)
+    node_demerits = np.zeros(1)
+
+    # Paths are recorded as a list of (item index, previous path entry index) pairs. Each active
+    # node records the index of the path entry for its break.
+    path_item_idxs: list[int] = [-1]
+    path_previous: list[int] = [-1]
+    node_path_idxs = np.zeros(1, dtype=np.int64)
+
+    for break_point in break_points:
+        n_nodes = node_widths.shape[0]
+        running_sum = break_point.running_sum
+
+        # Compute adjustment ratios. See adjustment_ratio_for_line().
+        natural_widths = running_sum.width - node_widths + break_point.width
+        slack = width - natural_widths
+        line_stretches = running_sum.stretch - node_stretches
+        line_shrinks = running_sum.shrink - node_shrinks
+        adjustment_ratios = np.zeros(n_nodes)
+        for mask, line_adjustments in (
+            (natural_widths < width, line_stretches),
+            (natural_widths > width, line_shrinks),
+        ):
+            can_adjust = line_adjustments > 0
+            np.divide(slack, line_adjustments, out=adjustment_ratios, where=mask & can_adjust)
+            adjustment_ratios[mask & ~can_adjust] = math.inf
+
+        # Determine which nodes are deactivated and which record a feasible break.
+        is_forced_break = break_point.penalty <= -MAX_PENALTY
+        if is_forced_break:
+            deactivated = np.ones(n_nodes, dtype=bool)
+        else:
+            deactivated = adjustment_ratios < -1.0
+        feasible = (adjustment_ratios >= -1.0) & (
+            adjustment_ratios < params.upper_adjustment_ratio
+        )
+
+        # The scalar implementation records a "break of last resort" from the final node if
+        # deactivating it would leave no active nodes. This happens only if every node is
+        # deactivated and no earlier node recorded a feasible break.
+        is_fallback_break = bool(deactivated.all() and not feasible[:-1].any())
+        if is_fallback_break:
+            adjustment_ratios[-1] = -1.0
+            feasible[-1] = -1.0 < params.upper_adjustment_ratio
+
+        feasible_idxs = np.flatnonzero(feasible)
+        if feasible_idxs.shape[0] > 0:
+            ratios = adjustment_ratios[feasible_idxs]
+            prev_fitness_classes = node_fitness_classes[feasible_idxs]
+            fitness_classes = np.searchsorted(_FITNESS_CLASS_BOUNDS, ratios, side="right")
+
+            # Compute demerits. See line_demerit().
+            penalties = np.full(ratios.shape, break_point.penalty, dtype=np.float64)
+            if break_point.flagged:
+                penalties[node_flags[feasible_idxs]] += params.extra_flag_penalty
+            penalties += params.mismatched_fitness_penalty * np.abs(
+                fitness_classes - prev_fitness_classes
+            )
+            penalties += params.line_penalty
+
+            abs_ratios = np.abs(ratios)
+            badnesses = 1.0 + 100.0 * (abs_ratios * abs_ratios * abs_ratios)
+            if is_forced_break:
+                demerits = badnesses * badnesses
+            else:
+                demerits = np.where(
+                    penalties >= 0.0,
+                    (badnesses + penalties) * (badnesses + penalties),
+                    badnesses * badnesses - penalties * penalties,
+                )
+            total_demerits = demerits + node_demerits[feasible_idxs]
+
+            # New nodes are keyed by fitness class since they all share this break point's item
+            # index. For each key keep the first node with the lowest total demerits and order new
+            # nodes by where their key first appears, as the dict in the scalar implementation
+            # does.
+            keys = fitness_classes
+            order = np.lexsort((total_demerits, keys))
+            is_group_start = np.ones(order.shape, dtype=bool)
+            is_group_start[1:] = keys[order[1:]] != keys[order[:-1]]
+            best = order[is_group_start]
+            _, first_seen = np.unique(keys, return_index=True)
+            best = best[np.argsort(first_seen, kind="stable")]
+
+            # Record paths for the new nodes.
+            new_path_idxs = np.arange(len(path_item_idxs), len(path_item_idxs) + best.shape[0])
+            path_item_idxs.extend([break_point.item_idx] * best.shape[0])
+            path_previous.extend(node_path_idxs[feasible_idxs[best]].tolist())
+        else:
+            best = new_path_idxs = np.zeros(0, dtype=np.int64)
+
+        # Form the new active set from the surviving nodes followed by the new nodes.
+        kept = ~deactivated
+        n_new = best.shape[0]
+        if stats is not None:
+            _update_stats(stats, break_point, n_nodes, n_new, deactivated, is_fallback_break)
+        node_widths = np.concatenate((node_widths[kept], np.full(n_new, running_sum.width)))
+        node_stretches = np.concatenate(
+            (node_stretches[kept], np.full(n_new, running_sum.stretch))
+        )
+        node_shrinks = np.concatenate((node_shrinks[kept], np.full(n_new, running_sum.shrink)))
+        node_flags = np.concatenate((node_flags[kept], np.full(n_new, break_point.flagged)))
+        node_path_idxs = np.concatenate((node_path_idxs[kept], new_path_idxs))
+        if n_new > 0:
+            node_fitness_classes = np.concatenate(
+                (node_fitness_classes[kept], fitness_classes[best])
+            )
+            node_demerits = np.concatenate((node_demerits[kept], total_demerits[best]))
+        else:
+            node_fitness_classes = node_fitness_classes[kept]
+            node_demerits = node_demerits[kept]
+
+    # Find the optimal remaining active node and walk back along its path.
+    path_start_time = time.perf_counter()
+    assert node_demerits.shape[0] > 0
+    best_node = np.argmin(node_demerits)
+    path_idx = int(node_path_idxs[best_node])
+    optimal_line_break_idxs = []
+    while path_idx > 0:
+        optimal_line_break_idxs.append(path_item_idxs[path_idx])
+        path_idx = path_previous[path_idx]
+
+    if stats is not None:
+        stats.demerits += float(node_demerits[best_node])
+        stats.add_timing("search", path_start_time - start_time)
+        stats.add_timing("path", time.perf_counter() - path_start_time)
+    return optimal_line_break_idxs[::-1]
+
+
+def _update_stats(
+    stats: BreakStats,
+    break_point: BreakPoint,
+    n_nodes: int,
+    n_new: int,
+    deactivated: np.ndarray,
+    is_fallback_break: bool,
+):
+    n_deactivated = int(np.count_nonzero(deactivated))
+    stats.candidates += 1
+    stats.total_active_nodes += n_nodes
+    stats.peak_active_nodes = max(stats.peak_active_nodes, n_nodes)
+    stats.feasible_breaks += n_new
+    stats.deactivations += n_deactivated
+    stats.fallback_breaks += int(is_fallback_break)
+    if stats.trace is not None:
+        stats.trace.append(
+            BreakTraceEntry(
+                paragraph_idx=stats.paragraphs - 1,
+                item_idx=break_point.item_idx,
+                active_nodes=n_nodes,
+                feasible_breaks=n_new,
+                deactivations=n_deactivated,
+            )
+        )
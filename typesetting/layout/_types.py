@@ -1,9 +1,21 @@
+import array
 import dataclasses
 import enum
+import functools
+import hashlib
+import itertools
 import math
-from typing import TYPE_CHECKING, Generator
-
-import uniseg.linebreak
+import operator
+from typing import (
+    TYPE_CHECKING,
+    Generator,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Union,
+    overload,
+)
 
 from ..hyphenation import SOFT_HYPHEN
 
@@ -13,6 +25,7 @@ if TYPE_CHECKING:
 __all__ = [
     "ParagraphItemType",
     "ParagraphItem",
+    "ParagraphItems",
     "text_to_paragraph_items",
     "MAX_PENALTY",
 ]
@@ -35,68 +48,310 @@ class ParagraphItem:
     text: str = ""
 
 
+class ParagraphItems:
+    """
+    Columnar store of paragraph items. Each field of ParagraphItem is held in a parallel typed
+    array so that the line breaking engines can read plain floats rather than looking up
+    attributes on one object per item. Item text is kept to one side in a plain list.
+
+    Indexing or iterating yields ParagraphItem instances so that a ParagraphItems can be used
+    anywhere a sequence of ParagraphItem is expected.
+
+    Items should only be added with append() or extend() and columns should not be modified in
+    place, as the digest of the items is cached.
+
+    """
+
+    __slots__ = (
+        "item_types",
+        "widths",
+        "stretchabilities",
+        "shrinkabilities",
+        "penalties",
+        "flags",
+        "texts",
+        "_digest",
+    )
+
+    def __init__(self):
+        # Item types are stored as the corresponding ParagraphItemType value.
+        self.item_types = array.array("B")
+        self.widths = array.array("d")
+        self.stretchabilities = array.array("d")
+        self.shrinkabilities = array.array("d")
+        self.penalties = array.array("d")
+        self.flags = array.array("B")
+
+        # Item text is a list unless the store is a read-only view, e.g. of a cache file.
+        self.texts: Sequence[str] = []
+        self._digest: Optional[bytes] = None
+
+    @classmethod
+    def from_items(cls, para_items: Iterable[ParagraphItem]) -> "ParagraphItems":
+        "Build a store from an iterable of ParagraphItem."
+        items = cls()
+        for item in para_items:
+            items.append(
+                item.item_type,
+                item.width,
+                item.stretchability,
+                item.shrinkability,
+                item.penalty,
+                item.flagged,
+                item.text,
+            )
+        return items
+
+    @classmethod
+    def from_text(cls, text: str, font: "Font") -> "ParagraphItems":
+        "Build a store directly from text. See text_to_paragraph_items()."
+        items = cls()
+        for fields in _paragraph_item_fields(text, font):
+            items.append(*fields)
+        return items
+
+    def append(
+        self,
+        item_type: ParagraphItemType,
+        width: float = 0.0,
+        stretchability: float = 0.0,
+        shrinkability: float = 0.0,
+        penalty: float = 0.0,
+        flagged: bool = False,
+        text: str = "",
+    ):
+        self.item_types.append(item_type.value)
+        self.widths.append(width)
+        self.stretchabilities.append(stretchability)
+        self.shrinkabilities.append(shrinkability)
+        self.penalties.append(penalty)
+        self.flags.append(flagged)
+        assert isinstance(self.texts, list)
+        self.texts.append(text)
+        self._digest = None
+
+    def extend(self, items: "ParagraphItems"):
+        "Append all items from another store."
+        self.item_types.extend(items.item_types)
+        self.widths.extend(items.widths)
+        self.stretchabilities.extend(items.stretchabilities)
+        self.shrinkabilities.extend(items.shrinkabilities)
+        self.penalties.extend(items.penalties)
+        self.flags.extend(items.flags)
+        assert isinstance(self.texts, list)
+        self.texts.extend(items.texts)
+        self._digest = None
+
+    def digest(self) -> bytes:
+        """
+        Return a digest of the fields which determine line breaks. Item text does not affect
+        line breaks and is not included. The digest is computed once and kept until items are
+        added.
+
+        """
+        if self._digest is None:
+            hash = hashlib.blake2b(digest_size=16)
+            hash.update(len(self).to_bytes(8, "little"))
+            for column in (
+                self.item_types,
+                self.widths,
+                self.stretchabilities,
+                self.shrinkabilities,
+                self.penalties,
+                self.flags,
+            ):
+                hash.update(column)
+            self._digest = hash.digest()
+        return self._digest
+
+    def __len__(self) -> int:
+        return len(self.item_types)
+
+    @overload
+    def __getitem__(self, idx: int) -> ParagraphItem:
+        ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> "ParagraphItems":
+        ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[ParagraphItem, "ParagraphItems"]:
+        if isinstance(idx, slice):
+            items = ParagraphItems()
+            items.item_types = self.item_types[idx]
+            items.widths = self.widths[idx]
+            items.stretchabilities = self.stretchabilities[idx]
+            items.shrinkabilities = self.shrinkabilities[idx]
+            items.penalties = self.penalties[idx]
+            items.flags = self.flags[idx]
+            items.texts = self.texts[idx]
+            return items
+
+        return ParagraphItem(
+            item_type=ParagraphItemType(self.item_types[idx]),
+            width=self.widths[idx],
+            stretchability=self.stretchabilities[idx],
+            shrinkability=self.shrinkabilities[idx],
+            penalty=self.penalties[idx],
+            flagged=bool(self.flags[idx]),
+            text=self.texts[idx],
+        )
+
+    def __iter__(self) -> Iterator[ParagraphItem]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+def as_paragraph_items(para_items: Iterable[ParagraphItem]) -> ParagraphItems:
+    "Return para_items as a ParagraphItems, converting only if necessary."
+    if isinstance(para_items, ParagraphItems):
+        return para_items
+    return ParagraphItems.from_items(para_items)
+
+
 SOFT_HYPHEN_PENALTY = 50
 MAX_PENALTY = math.inf  # penalties behyong this are viewed as "infinite".
 MAX_STRETCH = 100000
 
 
 def _text_width(text: str, font: "Font") -> float:
-    return sum(g.x_advance for g in font.shape(text))
+    return font.shape(text).total_advance
 
 
 def text_to_paragraph_items(text: str, font: "Font") -> Generator[ParagraphItem, None, None]:
+    for fields in _paragraph_item_fields(text, font):
+        yield ParagraphItem(*fields)
+
+
+# Fields of a single paragraph item in the order taken by ParagraphItem's constructor.
+_ItemFields = tuple[ParagraphItemType, float, float, float, float, bool, str]
+
+
+def _paragraph_item_fields(text: str, font: "Font") -> Generator[_ItemFields, None, None]:
+    # Imported here so that line breaking alone does not load uniseg's data.
+    import uniseg.linebreak
+
     space_width = _text_width(" ", font)
     hyphen_width = _text_width("-", font)
 
-    running_width: float = 0.0
-    running_stems: list[str] = []
+    # Line break units with non-empty stems are gathered into runs which are shaped as a whole.
+    # Each box's width is the increase in the width of its run when its stem is added.
+    run: list[tuple[str, str]] = []
     for lb_item in uniseg.linebreak.line_break_units(text):
         stem = lb_item.rstrip(f" {SOFT_HYPHEN}\n")
         if len(stem) > 0:
-            running_stems.append(stem)
-            stem_width = _text_width("".join(running_stems), font) - running_width
-            running_width += stem_width
-            yield ParagraphItem(
-                item_type=ParagraphItemType.BOX,
-                width=stem_width,
-                text=stem,
-            )
-        else:
-            running_stems, running_width = [], 0.0
-
-        if lb_item.endswith(SOFT_HYPHEN):
-            yield ParagraphItem(
-                item_type=ParagraphItemType.PENALTY,
-                width=hyphen_width,
-                penalty=SOFT_HYPHEN_PENALTY,
-                flagged=True,
-                text="-",
-            )
-        elif lb_item.endswith("\n"):
-            yield ParagraphItem(
-                item_type=ParagraphItemType.GLUE,
-                stretchability=MAX_STRETCH,
-            )
-            yield ParagraphItem(
-                item_type=ParagraphItemType.PENALTY,
-                penalty=-MAX_PENALTY,
-                flagged=True,
-            )
-        elif lb_item.endswith(" "):
-            yield ParagraphItem(
-                item_type=ParagraphItemType.GLUE,
-                width=space_width,
-                shrinkability=0.3 * space_width,
-                stretchability=0.5 * space_width,
-            )
+            run.append((lb_item, stem))
+            continue
+
+        yield from _run_item_fields(run, font, space_width, hyphen_width)
+        run = []
+        yield from _break_item_fields(lb_item, space_width, hyphen_width)
+    yield from _run_item_fields(run, font, space_width, hyphen_width)
 
     # Add finishing glue and forced break
-    yield ParagraphItem(
-        item_type=ParagraphItemType.GLUE,
-        stretchability=MAX_STRETCH,
-    )
-    yield ParagraphItem(
-        item_type=ParagraphItemType.PENALTY,
-        penalty=-MAX_PENALTY,
-        flagged=True,
-    )
+    yield (ParagraphItemType.GLUE, 0.0, MAX_STRETCH, 0.0, 0.0, False, "")
+    yield (ParagraphItemType.PENALTY, 0.0, 0.0, 0.0, -MAX_PENALTY, True, "")
+
+
+def _run_item_fields(
+    run: list[tuple[str, str]], font: "Font", space_width: float, hyphen_width: float
+) -> Generator[_ItemFields, None, None]:
+    "Yield items for a run of (line break unit, stem) pairs."
+    stem_ends = list(itertools.accumulate(len(stem) for _, stem in run))
+    prefix_widths = _prefix_widths("".join(stem for _, stem in run), stem_ends, font)
+
+    running_width: float = 0.0
+    for (lb_item, stem), prefix_width in zip(run, prefix_widths):
+        stem_width = prefix_width - running_width
+        running_width += stem_width
+        yield (ParagraphItemType.BOX, stem_width, 0.0, 0.0, 0.0, False, stem)
+        yield from _break_item_fields(lb_item, space_width, hyphen_width)
+
+
+def _break_item_fields(
+    lb_item: str, space_width: float, hyphen_width: float
+) -> Generator[_ItemFields, None, None]:
+    "Yield items for the break which ends a line break unit."
+    if lb_item.endswith(SOFT_HYPHEN):
+        yield (ParagraphItemType.PENALTY, hyphen_width, 0.0, 0.0, SOFT_HYPHEN_PENALTY, True, "-")
+    elif lb_item.endswith("\n"):
+        yield (ParagraphItemType.GLUE, 0.0, MAX_STRETCH, 0.0, 0.0, False, "")
+        yield (ParagraphItemType.PENALTY, 0.0, 0.0, 0.0, -MAX_PENALTY, True, "")
+    elif lb_item.endswith(" "):
+        yield (
+            ParagraphItemType.GLUE,
+            space_width,
+            0.5 * space_width,
+            0.3 * space_width,
+            0.0,
+            False,
+            "",
+        )
+
+
+def _prefix_widths(text: str, ends: list[int], font: "Font") -> list[float]:
+    """
+    Return the width of text[:end] for each end in ends as if each prefix were shaped on its own.
+    The text is shaped once and prefix widths are summed from glyph advances. Where a prefix ends
+    at a point which is not safe to break, e.g. within a ligature or between a kerned pair, only
+    the text after the last safe break point is re-shaped.
+
+    """
+    glyph_run = font.shape(text)
+    clusters = list(glyph_run.clusters)
+
+    # Glyphs of right-to-left text do not appear in logical order and so cannot be summed
+    # incrementally. Fall back to shaping each prefix.
+    if any(next_cluster < cluster for cluster, next_cluster in zip(clusters, clusters[1:])):
+        return [_text_width(text[:end], font) for end in ends]
+
+    # Running sums of advances. These are summed in the same order as GlyphRun.total_advance so
+    # that the widths match those of shaping each prefix exactly.
+    advance_sums = list(itertools.accumulate(glyph_run.x_advances, initial=0.0))
+
+    # A glyph is a safe point to break if it starts a cluster not marked as unsafe to break.
+    is_safe_to_break = [
+        not unsafe_to_break and (glyph_idx == 0 or clusters[glyph_idx - 1] != cluster)
+        for glyph_idx, (unsafe_to_break, cluster) in enumerate(
+            zip(glyph_run.unsafe_to_break, clusters)
+        )
+    ]
+    is_safe_to_break.append(True)
+    clusters.append(len(text))
+
+    # The script used for shaping is guessed from the first character with a definite script.
+    # Text which does not contain such a character may be shaped differently on its own.
+    alpha_idxs = [idx for idx, c in enumerate(text) if c.isalpha()]
+
+    widths, glyph_idx, alpha_idx = [], 0, 0
+    for end in ends:
+        while clusters[glyph_idx] < end:
+            glyph_idx += 1
+        while alpha_idx < len(alpha_idxs) and alpha_idxs[alpha_idx] < end:
+            alpha_idx += 1
+        if alpha_idx == 0:
+            widths.append(_text_width(text[:end], font))
+            continue
+
+        if clusters[glyph_idx] == end and is_safe_to_break[glyph_idx]:
+            widths.append(advance_sums[glyph_idx])
+            continue
+
+        # Find the last safe break point which leaves some text with a definite script to be
+        # re-shaped and continue the running sum from there.
+        last_alpha_idx = alpha_idxs[alpha_idx - 1]
+        start_glyph_idx = glyph_idx - 1
+        while start_glyph_idx > 0 and (
+            not is_safe_to_break[start_glyph_idx] or clusters[start_glyph_idx] > last_alpha_idx
+        ):
+            start_glyph_idx -= 1
+
+        widths.append(
+            functools.reduce(
+                operator.add,
+                font.shape(text[clusters[start_glyph_idx] : end]).x_advances,
+                advance_sums[start_glyph_idx],
+            )
+        )
+
+    return widths
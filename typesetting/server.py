@@ -0,0 +1,417 @@
+"""
+Long-running layout server which breaks paragraphs for clients over a Unix socket or TCP.
+
+Requests may only use the font files the server was started with. Fonts and hyphenators are
+loaded once per worker and kept warm between requests. Requests arriving together, from one
+client or many, are gathered into batches of up to max_batch_size requests, waiting at most
+max_batch_delay seconds for a batch to fill, and each batch is broken by a single call to a
+worker.
+
+Run a server on a Unix socket with fonts loaded up front:
+
+    python -m typesetting.server --socket /tmp/layout.sock --font EBGaramond.ttf
+
+Requests and responses are described in LayoutClient.
+
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import os
+import signal
+import statistics
+import sys
+import time
+from typing import Any, NamedTuple, Optional, Sequence
+
+from ._protocol import Message, encode_message, read_message
+from .batch import DEFAULT_WORKER_SHAPE_CACHE_SIZE, break_paragraph
+from .font import Font, FontRegistry
+from .hyphenation import Hyphenator
+from .layout import OptimiserParameters
+
+__all__ = ["LayoutServer", "LayoutServerMetrics"]
+
+# Number of most recent request latencies from which percentiles are found.
+LATENCY_WINDOW = 10000
+
+# Key for fonts loaded by workers: path, em size, features and language.
+_FontKey = tuple[str, tuple[float, float], tuple[str, ...], str]
+
+
+class LayoutServerMetrics(NamedTuple):
+    "Counters, throughput and latency percentiles for a LayoutServer. Times are in seconds."
+    requests: int
+    errors: int
+    batches: int
+    mean_batch_size: float
+    uptime: float
+
+    # Requests completed per second since the server started.
+    throughput: float
+
+    # Percentiles of the time from receiving a request to its result being ready over the most
+    # recent LATENCY_WINDOW requests.
+    latency_p50: float
+    latency_p95: float
+    latency_p99: float
+
+
+# Fonts and hyphenators used by this worker and the real paths of the font files which requests
+# may use. Set by _init_worker().
+_worker_registry: Optional[FontRegistry] = None
+_worker_fonts: dict[_FontKey, Font] = {}
+_worker_font_paths: frozenset[str] = frozenset()
+
+
+def _init_worker(font_paths: Sequence[str], em_size: float, languages: Sequence[str]):
+    global _worker_registry, _worker_font_paths
+    _worker_registry = FontRegistry()
+    _worker_fonts.clear()
+    _worker_font_paths = frozenset(os.path.realpath(path) for path in font_paths)
+    for path in _worker_font_paths:
+        _worker_font((path, (em_size, em_size), (), "en"))
+    for language in languages:
+        Hyphenator.for_language(language)
+
+
+def _worker_font(key: _FontKey) -> Font:
+    font = _worker_fonts.get(key)
+    if font is None:
+        assert _worker_registry is not None
+        path, em_size, features, language = key
+        font = _worker_fonts[key] = _worker_registry.font(
+            path,
+            em_size,
+            features=features,
+            language=language,
+            shape_cache_size=DEFAULT_WORKER_SHAPE_CACHE_SIZE,
+            warm_up=True,
+        )
+    return font
+
+
+def _break_batch(requests: list[Message]) -> list[Message]:
+    "Break the paragraph of each request and return a result or error for each."
+    results = []
+    for request in requests:
+        try:
+            results.append(_break_request(request))
+        except Exception as e:
+            results.append({"error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+def _break_request(request: Message) -> Message:
+    em_size = request.get("em_size", 12.0)
+    if isinstance(em_size, (int, float)):
+        em_size = (em_size, em_size)
+    # Only the server's fonts may be used so that clients cannot make workers open other files.
+    font_path = os.path.realpath(request["font"])
+    if font_path not in _worker_font_paths:
+        raise ValueError(f"font {request['font']!r} is not served")
+    font = _worker_font(
+        (
+            font_path,
+            (float(em_size[0]), float(em_size[1])),
+            tuple(request.get("features", ())),
+            request.get("language", "en"),
+        )
+    )
+    hyphenation_language = request.get("hyphenation_language")
+    broken = break_paragraph(
+        request["text"],
+        font,
+        float(request["width"]),
+        engine=request.get("engine", "optimal"),
+        params=OptimiserParameters(**request.get("params", {})),
+        hyphenator=(
+            Hyphenator.for_language(hyphenation_language)
+            if hyphenation_language is not None
+            else None
+        ),
+        pretolerance=request.get("pretolerance"),
+    )
+    return {"break_idxs": broken.break_idxs, "passes": broken.passes}
+
+
+class _PendingRequest(NamedTuple):
+    request: Message
+    future: "asyncio.Future[Message]"
+    received: float
+
+
+class LayoutServer:
+    """
+    Asyncio server which breaks paragraphs in a pool of worker processes. If workers is None,
+    one worker is used per CPU. If workers is 0, paragraphs are broken in a single thread of this
+    process.
+
+    Requests may only use the fonts in font_paths. Each worker loads these at em_size, and the
+    hyphenators for languages, when it starts. Fonts at other sizes or with other features and
+    other hyphenators are loaded on first use and then kept.
+
+    """
+
+    def __init__(
+        self,
+        *,
+        workers: Optional[int] = None,
+        max_batch_size: int = 32,
+        max_batch_delay: float = 0.002,
+        font_paths: Sequence[str] = (),
+        em_size: float = 12.0,
+        languages: Sequence[str] = (),
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least one")
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+
+        initargs = (tuple(font_paths), em_size, tuple(languages))
+        self._executor: concurrent.futures.Executor
+        if workers == 0:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, initializer=_init_worker, initargs=initargs
+            )
+            n_workers = 1
+        else:
+            n_workers = workers if workers is not None else os.cpu_count() or 1
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=n_workers, initializer=_init_worker, initargs=initargs
+            )
+
+        # At most two batches per worker are in flight so that requests queue, and so form
+        # larger batches, while workers are busy.
+        self._n_batch_slots = 2 * n_workers
+        self._queue: Optional[asyncio.Queue[_PendingRequest]] = None
+        self._tasks: set[asyncio.Task] = set()
+        self._servers: list[asyncio.Server] = []
+
+        self._started = time.perf_counter()
+        self._n_requests, self._n_errors, self._n_batches = 0, 0, 0
+        self._latencies: collections.deque[float] = collections.deque(maxlen=LATENCY_WINDOW)
+
+    async def start_unix(self, path: str) -> asyncio.Server:
+        "Start accepting connections on a Unix socket at path."
+        server = await asyncio.start_unix_server(self._handle_connection, path)
+        return self._add_server(server)
+
+    async def start_tcp(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        "Start accepting connections on host and port. Port 0 picks a free port."
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._add_server(server)
+
+    async def close(self):
+        """
+        Stop accepting connections, close open connections, cancel pending work and shut down
+        workers.
+
+        """
+        for server in self._servers:
+            server.close()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def metrics(self) -> LayoutServerMetrics:
+        "Return counters and latency percentiles."
+        uptime = time.perf_counter() - self._started
+        if len(self._latencies) >= 2:
+            p50, p95, p99 = (
+                statistics.quantiles(self._latencies, n=100, method="inclusive")[p - 1]
+                for p in (50, 95, 99)
+            )
+        else:
+            p50 = p95 = p99 = self._latencies[0] if self._latencies else 0.0
+        return LayoutServerMetrics(
+            requests=self._n_requests,
+            errors=self._n_errors,
+            batches=self._n_batches,
+            mean_batch_size=self._n_requests / self._n_batches if self._n_batches > 0 else 0.0,
+            uptime=uptime,
+            throughput=self._n_requests / uptime if uptime > 0 else 0.0,
+            latency_p50=p50,
+            latency_p95=p95,
+            latency_p99=p99,
+        )
+
+    def _add_server(self, server: asyncio.Server) -> asyncio.Server:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._spawn(self._batch_requests())
+        self._servers.append(server)
+        return server
+
+    def _spawn(self, coroutine: Any) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._track(task)
+        return task
+
+    def _track(self, task: asyncio.Task):
+        # Keep a reference to tasks until they are done so they can be cancelled on close.
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Connections are handled by tasks created by asyncio and are tracked so that close() can
+        # close them before the event loop is closed.
+        task = asyncio.current_task()
+        assert task is not None
+        self._track(task)
+
+        # Requests on a connection are handled concurrently and so responses may be sent out of
+        # order. Clients match them to requests by id.
+        write_lock = asyncio.Lock()
+        responses: set[asyncio.Task] = set()
+        try:
+            while True:
+                try:
+                    message = await read_message(reader)
+                except ValueError as e:
+                    message = {"type": "invalid", "error": str(e)}
+                if message is None:
+                    break
+                response = self._spawn(self._respond(message, writer, write_lock))
+                responses.add(response)
+                response.add_done_callback(responses.discard)
+                if message.get("type") == "invalid":
+                    break
+            await asyncio.gather(*responses, return_exceptions=True)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(
+        self, message: Message, writer: asyncio.StreamWriter, write_lock: asyncio.Lock
+    ):
+        message_type = message.get("type", "break")
+        result: Message
+        if message_type == "metrics":
+            result = {"metrics": self.metrics()._asdict()}
+        elif message_type == "break":
+            assert self._queue is not None
+            future = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait(_PendingRequest(message, future, time.perf_counter()))
+            result = await future
+        elif message_type == "invalid":
+            result = {"error": message["error"]}
+        else:
+            result = {"error": f"unknown request type: {message_type!r}"}
+
+        async with write_lock:
+            writer.write(encode_message({"id": message.get("id"), **result}))
+            await writer.drain()
+
+    async def _batch_requests(self):
+        # Gather queued requests into batches and hand each to a worker.
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self._n_batch_slots)
+        while True:
+            await slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_batch_delay
+            while len(batch) < self.max_batch_size:
+                if self._queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0.0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self._queue.get_nowait())
+            self._spawn(self._run_batch(batch)).add_done_callback(lambda _: slots.release())
+
+    async def _run_batch(self, batch: list[_PendingRequest]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self._executor, _break_batch, [pending.request for pending in batch]
+            )
+        except Exception as e:
+            # E.g. a worker process died.
+            results = [{"error": f"{type(e).__name__}: {e}"}] * len(batch)
+
+        finished = time.perf_counter()
+        self._n_batches += 1
+        for pending, result in zip(batch, results):
+            self._n_requests += 1
+            self._n_errors += "error" in result
+            self._latencies.append(finished - pending.received)
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+
+async def _serve(args: argparse.Namespace):
+    server = LayoutServer(
+        workers=args.workers,
+        max_batch_size=args.max_batch_size,
+        max_batch_delay=args.max_batch_delay,
+        font_paths=args.font,
+        em_size=args.em_size,
+        languages=args.language,
+    )
+    if args.socket is not None:
+        await server.start_unix(args.socket)
+        print(f"Listening on {args.socket}", file=sys.stderr)
+    else:
+        tcp_server = await server.start_tcp(args.host, args.port)
+        host, port = tcp_server.sockets[0].getsockname()[:2]
+        print(f"Listening on {host}:{port}", file=sys.stderr)
+    # Stop on SIGINT or SIGTERM so that the socket is removed.
+    stop = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(signal_number, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await server.close()
+        if args.socket is not None and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("--socket", help="listen on a Unix socket at this path")
+    parser.add_argument("--host", default="127.0.0.1", help="host to listen on with TCP")
+    parser.add_argument("--port", type=int, default=0, help="port to listen on with TCP")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--max-batch-size", type=int, default=32, help="requests per batch")
+    parser.add_argument(
+        "--max-batch-delay",
+        type=float,
+        default=0.002,
+        help="seconds to wait for a batch to fill (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--font",
+        action="append",
+        default=[],
+        help="font file which requests may use, loaded up front (repeatable)",
+    )
+    parser.add_argument("--em-size", type=float, default=12.0, help="em size of --font fonts")
+    parser.add_argument(
+        "--language",
+        action="append",
+        default=[],
+        help="language of hyphenator to load up front (repeatable)",
+    )
+    args = parser.parse_args()
+    asyncio.run(_serve(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())